@@ -1,13 +1,18 @@
 from crewai import Agent, Crew, Process, Task
-from crewai.project import CrewBase, agent, crew, task
-from crewai.agents.agent_builder.base_agent import BaseAgent
-from typing import List
+from pathlib import Path
+from typing import Any, Dict, Optional
+import copy
+import threading
+import yaml
 # No global qdrant_tool import needed - using user-specific tools
 
 # Patch Bedrock LLM to handle llama4
 from crewai import LLM as BaseLLM
+from crewai.utilities.events import LLMStreamChunkEvent, crewai_event_bus
 import os
 
+from app.services.crew_streaming import token_sink
+
 class PatchedBedrockLLM(BaseLLM):
     def call(self, prompt: str, **kwargs):
         if isinstance(prompt, str):
@@ -21,7 +26,30 @@ class PatchedBedrockLLM(BaseLLM):
             raise ValueError("Invalid prompt format passed to Bedrock model")
         kwargs.pop("prompt", None)
         kwargs["messages"] = messages
-        return super().call(**kwargs)
+        sink = token_sink.get()
+        if sink is None:
+            return super().call(**kwargs)
+        # POST /run_crew/stream: crewai's own streaming path (LLMCall events, callbacks, usage);
+        # its LLMStreamChunkEvents reach the sink through _forward_stream_chunk.
+        sink.begin_call()
+        return BaseLLM.call(self._streaming(), **kwargs)
+
+    def _streaming(self) -> "PatchedBedrockLLM":
+        """A ``stream=True`` twin, so streamed runs never flip ``stream`` on the shared LLM."""
+        twin = self.__dict__.get("_streaming_twin")
+        if twin is None:
+            twin = copy.copy(self)
+            twin.stream = True
+            self._streaming_twin = twin
+        return twin
+
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def _forward_stream_chunk(source, event: LLMStreamChunkEvent) -> None:
+    """Runs in the crew thread; ``feed`` raises ``CrewCancelled`` there once the client is gone."""
+    sink = token_sink.get()
+    if sink is not None and event.tool_call is None:
+        sink.feed(event.chunk)
 
 
 crew_llm = PatchedBedrockLLM(
@@ -31,44 +59,65 @@ crew_llm = PatchedBedrockLLM(
 )
 
 
-@CrewBase
-class ClinicalAssistantCrew():
-    """Clinical Assistant Crew for healthcare provider queries"""
+_CONFIG_DIR = Path(__file__).resolve().parent / "config"
+
+
+def _load_yaml(path: Path) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+class ClinicalCrewTemplate:
+    """
+    Clinical Assistant Crew compiled once per process.
+
+    The YAML agent/task configs are parsed and the LLM handle is created once. Agent, Task and
+    Crew objects carry per-run state (interpolated prompts, executor, task outputs), so ``build``
+    creates fresh ones from the parsed config for each request and binds only the user's tool.
+    """
 
-    agents: List[BaseAgent]
-    tasks: List[Task]  
+    def __init__(self, config_dir: Path = _CONFIG_DIR, llm: Optional[BaseLLM] = None):
+        self.agent_config = _load_yaml(config_dir / "agents.yaml")["clinical_assistant_agent"]
+        task_config = dict(_load_yaml(config_dir / "tasks.yaml")["clinical_assistant_task"])
+        task_config.pop("agent", None)  # bound to the agent instance in build()
+        self.task_config = task_config
+        self.llm = llm or crew_llm
 
-    @agent
-    def clinical_assistant_agent(self) -> Agent:
-        # Use user's specific qdrant tool if available, otherwise create a placeholder
-        user_qdrant_tool = getattr(self, 'user_qdrant_tool', None)
-        
-        # If no user tool is set, we'll update it later before crew execution
-        tools_list = [user_qdrant_tool] if user_qdrant_tool else []
-        
-        return Agent(
-            config=self.agents_config['clinical_assistant_agent'],
+    def build(self, user_qdrant_tool=None) -> Crew:
+        agent = Agent(
+            config=dict(self.agent_config),
             verbose=True,
-            tools=tools_list,
-            llm=crew_llm
+            tools=[user_qdrant_tool] if user_qdrant_tool else [],
+            llm=self.llm
         )
-    
-    @task
-    def clinical_assistant_task(self) -> Task:
-        return Task(
-            config=self.tasks_config['clinical_assistant_task'],
-            verbose=True 
+        task = Task(
+            config=dict(self.task_config),
+            agent=agent,
         )
-
-    @crew
-    def crew(self) -> Crew:
-        """Creates the Ai crew"""
-
         return Crew(
-            agents=self.agents,
-            tasks=self.tasks,
+            agents=[agent],
+            tasks=[task],
             process=Process.sequential,
             verbose=True,   # Enabled to see crew execution details
             memory=False,   # Disabled for speed (if you don't need conversation memory)
             max_rpm=None    # Remove rate limiting for maximum speed
         )
+
+
+_template: Optional[ClinicalCrewTemplate] = None
+_template_lock = threading.Lock()
+
+
+def get_crew_template() -> ClinicalCrewTemplate:
+    """Return the process-wide template, compiling it on first use."""
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                _template = ClinicalCrewTemplate()
+    return _template
+
+
+def warm_up_crew() -> None:
+    """Compile the template and build one throwaway crew so the first request skips lazy setup."""
+    get_crew_template().build()
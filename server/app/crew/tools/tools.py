@@ -1,18 +1,22 @@
 from crewai.tools import BaseTool
 from pydantic import BaseModel, Field
-import os
-import boto3
 import json
 import logging
 import traceback
 from typing import Any, Callable, Optional, Type, List
 
+from app.services.qdrant_collection_profiles import collection_search_params, verify_search_indexes
+from app.services.query_embedding_cache import embed_query
+from app.services.search_results import SEARCH_PAYLOAD_FIELDS, format_results, select_results
+from app.services.section_router import FHIR_SECTIONS, section_router
+from app.services.sparse_vectors import HYBRID_SEARCH_ENABLED, collection_has_sparse, hybrid_query
+
 logger = logging.getLogger(__name__)
 
 
 try:
     from qdrant_client import QdrantClient
-    from qdrant_client.http.models import Filter, FieldCondition, MatchValue, FilterSelector
+    from qdrant_client.http.models import Filter, FieldCondition, MatchAny, MatchValue, FilterSelector
 
     QDRANT_AVAILABLE = True
 except ImportError:
@@ -20,6 +24,7 @@ except ImportError:
     QdrantClient = Any  # type placeholder
     Filter = Any
     FieldCondition = Any
+    MatchAny = Any
     MatchValue = Any
 
 
@@ -29,21 +34,23 @@ class QdrantToolSchema(BaseModel):
         ...,
         description="The query to search retrieve relevant information from the Qdrant database. Pass only the query, not the question.",
     )
-    filter_by: Optional[str] = Field(
-        default=None,
-        description="Filter by properties. Pass only the properties, not the question.",
-    )
-    filter_value: Optional[str] = Field(
+    section_name: Optional[str] = Field(
         default=None,
-        description="Filter by value. Pass only the value, not the question.",
+        description=(
+            "Optionally restrict the search to one chart section: patient, encounters, medications, "
+            "allergies, conditions, family_history, diagnostic_reports, tasks. Leave empty to let the "
+            "tool pick sections from the query, falling back to the whole chart (always for clinical "
+            "notes and documents)."
+        ),
     )
 
 
 class QdrantVectorSearchTool(BaseTool):
     """Tool to query and filter results from a Qdrant database.
 
-    This tool enables vector similarity search on internal documents stored in Qdrant,
-    with optional filtering capabilities.
+    This tool enables vector similarity search on internal documents stored in Qdrant.
+    Every search is scoped to one patient: the tool is bound with ``for_patient`` (per crew
+    run) or ``patient_id`` at construction, and refuses to search the whole collection.
 
     Attributes:
         client: Configured QdrantClient instance
@@ -52,6 +59,7 @@ class QdrantVectorSearchTool(BaseTool):
         score_threshold: Minimum similarity score threshold
         qdrant_url: Qdrant server URL
         qdrant_api_key: Authentication key for Qdrant
+        patient_id: Patient every search is filtered on (indexed payload field)
     """
     model_config = {"arbitrary_types_allowed": True}
     client: QdrantClient = None
@@ -62,6 +70,7 @@ class QdrantVectorSearchTool(BaseTool):
     filter_by: Optional[str] = None
     filter_value: Optional[str] = None
     collection_name: str
+    patient_id: Optional[str] = None
     limit: Optional[int] = Field(default=5)
     score_threshold: float = Field(default=0.2)
     qdrant_url: str = Field(
@@ -93,21 +102,47 @@ class QdrantVectorSearchTool(BaseTool):
                 "Please install it with: uv add qdrant-client"
             )
     
+    def for_patient(self, patient_id: str) -> "QdrantVectorSearchTool":
+        """Copy of this tool bound to ``patient_id``, sharing the Qdrant client."""
+        return self.model_copy(update={"patient_id": patient_id})
+
+    def _search_filter(
+        self, section_name: Optional[str], filter_by: Optional[str], filter_value: Optional[str]
+    ) -> Optional[Filter]:
+        """Patient filter (plus section, if asked for); None when no patient is known."""
+        patient_id = self.patient_id
+        if filter_by == "patient_id" and filter_value:
+            if patient_id and filter_value != patient_id:
+                logger.warning("Ignoring patient_id filter for another patient; tool is bound to its patient")
+            patient_id = patient_id or filter_value
+        elif filter_by == "section_name" and filter_value:
+            section_name = section_name or filter_value
+        if not patient_id:
+            return None
+        if section_name:
+            return self._patient_section_filter(patient_id, section_name)
+        return Filter(must=[FieldCondition(key="patient_id", match=MatchValue(value=patient_id))])
+
     def _run(
         self,
         query: str,
+        section_name: Optional[str] = None,
         filter_by: Optional[str] = None,
         filter_value: Optional[str] = None,
     ) -> str:
-        """Execute vector similarity search on Qdrant.
+        """Execute vector similarity search on Qdrant, filtered on the bound patient.
 
         Args:
             query: Search query to vectorize and match
-            filter_by: Optional metadata field to filter on
-            filter_value: Optional value to filter by
+            section_name: Optional chart section to restrict the search to; without one,
+                sections predicted from the query are searched first (section_router)
+            filter_by: Legacy filter field (``patient_id`` or ``section_name``); a
+                patient filter cannot override the bound patient
+            filter_value: Value for ``filter_by``
 
         Returns:
-            JSON string containing search results with metadata and scores
+            Compact JSON list of {section, context, score}, deduplicated and packed to
+            SEARCH_RESULT_TOKEN_BUDGET tokens (see app/services/search_results.py)
 
         Raises:
             ImportError: If qdrant-client is not installed
@@ -121,18 +156,15 @@ class QdrantVectorSearchTool(BaseTool):
         target_collection = self.collection_name
 
         try:
-            # Create search filter if needed
-            search_filter = None
-            if filter_by and filter_value:
-                search_filter = Filter(
-                    must=[
-                        FieldCondition(key=filter_by, match=MatchValue(value=filter_value))
-                    ]
-                )
+            search_filter = self._search_filter(section_name, filter_by, filter_value)
+            if search_filter is None:
+                logger.error("Refusing unscoped search: tool is not bound to a patient")
+                return json.dumps([])
+            self._verify_indexes(target_collection)
 
             # Get query vector
             query_vector = (
-                self._vectorize_query(query, embedding_model=os.getenv("EMBEDDING_MODEL", "amazon.titan-embed-text-v2:0"))
+                self._vectorize_query(query)
                 if not self.custom_embedding_fn
                 else self.custom_embedding_fn(query)
             )
@@ -143,37 +175,94 @@ class QdrantVectorSearchTool(BaseTool):
                 return json.dumps([])
 
 
-            # Use search method instead of query_points
-            search_results = self.client.search(
-                collection_name=target_collection,
-                query_vector=query_vector,
-                query_filter=search_filter,
-                limit=100,
-                # so far providing it with more points doesnt seem to slow it down all that much
-                score_threshold=self.score_threshold,
-                with_payload=True
-            )
-
+            # Sections predicted from the query are searched first, unless the agent chose one.
+            scoped = section_name or (filter_by == "section_name" and filter_value)
+            sections = () if scoped else section_router.route(query)
+            search_results = self._routed_search(target_collection, query, query_vector, search_filter, sections)
 
-            # Process results correctly
-            results = []
-            for point in search_results:
-                # Access the point attributes directly
-                result = {
-                    "metadata": point.payload.get("metadata", {}),
-                    "context": point.payload.get("patient_text", ""),
-                    "distance": point.score,
-                    "patient_id": point.payload.get("patient_id", "")
-                }
-                results.append(result)
-
-            return json.dumps(results, indent=2)
+            # Near-duplicates dropped, MMR-ordered, packed to the context token budget
+            return format_results(select_results(search_results))
             
         except Exception as e:
             logger.error(f"Error in _run method: {e}")
             logger.debug(f"Traceback: {traceback.format_exc()}")
             return json.dumps([])
     
+    def _routed_search(
+        self, collection_name: str, query: str, query_vector: list, search_filter, sections
+    ) -> list:
+        """
+        Search ``sections`` and the clinical documents of the patient first; the whole patient
+        scope if that comes back weak.
+        """
+        if sections:
+            routed_filter = Filter(
+                must=search_filter.must,
+                should=[
+                    FieldCondition(key="section_name", match=MatchAny(any=list(sections))),
+                    # Documents are indexed under their titles: any section that is not a FHIR one.
+                    Filter(must_not=[FieldCondition(key="section_name", match=MatchAny(any=sorted(FHIR_SECTIONS)))]),
+                ],
+            )
+            results = self._search(collection_name, query, query_vector, routed_filter)
+            if HYBRID_SEARCH_ENABLED and self._has_sparse(collection_name):
+                # RRF scores are rank-based and sparse hits unthresholded: probe the dense similarity.
+                best = self._best_dense_score(collection_name, query_vector, routed_filter) if results else 0.0
+            else:
+                best = max((hit.score for hit in results), default=0.0)
+            if section_router.sufficient(results, best):
+                return results
+            logger.info(f"Routed search of {', '.join(sections)} came back weak; searching the whole chart")
+        return self._search(collection_name, query, query_vector, search_filter)
+
+    def _best_dense_score(self, collection_name: str, query_vector: list, search_filter) -> float:
+        points = self.client.query_points(
+            collection_name=collection_name, query=query_vector, query_filter=search_filter, limit=1, with_payload=False,
+            search_params=self._search_params(collection_name),
+        ).points
+        return points[0].score if points else 0.0
+
+    def _search(self, collection_name: str, query: str, query_vector: list, search_filter) -> list:
+        """Hybrid (sparse + dense, RRF-fused) search when the collection has sparse vectors, else dense."""
+        search_params = self._search_params(collection_name)
+        if HYBRID_SEARCH_ENABLED and self._has_sparse(collection_name):
+            return hybrid_query(
+                self.client, collection_name, query, query_vector, search_filter,
+                limit=100, score_threshold=self.score_threshold, with_payload=SEARCH_PAYLOAD_FIELDS,
+                search_params=search_params,
+            )
+        return self.client.search(
+            collection_name=collection_name,
+            query_vector=query_vector,
+            query_filter=search_filter,
+            limit=100,
+            # so far providing it with more points doesnt seem to slow it down all that much
+            score_threshold=self.score_threshold,
+            with_payload=SEARCH_PAYLOAD_FIELDS,
+            search_params=search_params,
+        )
+
+    def _verify_indexes(self, collection_name: str) -> None:
+        try:
+            verify_search_indexes(self.client, collection_name)
+        except Exception as e:
+            logger.warning(f"Could not verify payload indexes of {collection_name}: {e}")
+
+    def _has_sparse(self, collection_name: str) -> bool:
+        try:
+            return collection_has_sparse(self.client, collection_name)
+        except Exception as e:
+            logger.warning(f"Could not read sparse vector config of {collection_name}; searching dense only: {e}")
+            return False
+
+    def _search_params(self, collection_name: str):
+        """Rescoring params for a quantized collection; None (plain search) if they can't be read."""
+        try:
+            return collection_search_params(self.client, collection_name)
+        except Exception as e:
+            logger.warning(f"Could not read quantization config of {collection_name}; searching without rescoring: {e}")
+            return None
+
     def _patient_section_filter(self, patient_id: str, section_name: str) -> Filter:
         """Match every point belonging to one patient's section within the collection."""
         return Filter(
@@ -200,6 +289,14 @@ class QdrantVectorSearchTool(BaseTool):
 
         return None
 
+    def count_section_points(self, patient_id: str, section_name: str) -> int:
+        """Exact number of stored points for a patient's section (manifest backfill)."""
+        return self.client.count(
+            collection_name=self.collection_name,
+            count_filter=self._patient_section_filter(patient_id, section_name),
+            exact=True,
+        ).count
+
     def delete_points_by_section(self, patient_id: str, section_name: str):
         """Remove all stored points for a patient's section before re-embedding it."""
         self.client.delete(
@@ -209,41 +306,20 @@ class QdrantVectorSearchTool(BaseTool):
             ),
         )
 
-    def _vectorize_query(self, query: str, embedding_model: str) -> list[float]:
-        """Default vectorization function with Amazon Titan.
+    def _vectorize_query(self, query: str) -> list[float]:
+        """Default vectorization with Amazon Titan.
+
+        Goes through the process-wide query embedding cache, which embeds misses with the
+        shared pooled Bedrock client (model/dimensions from EMBEDDING_MODEL / EMBEDDING_DIMENSIONS).
 
         Args:
             query (str): The query to vectorize
-            embedding_model (str): The embedding model to use (e.g., "amazon.titan-embed-text-v2:0")
 
         Returns:
-            list[float]: The vectorized query
+            list[float]: The vectorized query ([] on failure)
         """
         try:
-            
-            bedrock_client = boto3.client(
-                service_name='bedrock-runtime',
-                region_name=os.getenv('AWS_REGION', 'us-west-2')
-            )
-            
-            request_body = {
-                "inputText": query,
-                "dimensions": 1024,
-                "normalize": True   
-            }
-            
-            response = bedrock_client.invoke_model(
-                modelId=embedding_model,
-                body=json.dumps(request_body),
-                contentType='application/json',
-                accept='application/json'
-            )
-            
-            response_body = json.loads(response['body'].read())
-            embedding = response_body.get('embedding', [])
-            
-            return embedding
-            
+            return embed_query(query)
         except Exception as e:
             logger.error(f"Error creating embedding: {e}")
             logger.debug(f"Traceback: {traceback.format_exc()}")
@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 load_dotenv()  # Load .env before anything else reads env vars
@@ -8,8 +9,15 @@ import uvicorn
 import warnings
 import logging
 import os
+from app.crew.crew import warm_up_crew
 from app.services.client_service import client
-from app.routes import auth, run_crew, patients, appointments, call_schedule, billing
+from app.services.auth_service import authorized_practices
+from app.services.crew_pool import crew_pool
+from app.services.embedding_service import get_embedding_service, shutdown_embedding_service
+from app.services.patient_embedder import close_patient_embedder, get_patient_embedder
+from app.services.pre_ingestion import PRE_INGEST_ENABLED, PRE_INGEST_PRACTICES, pre_ingestion_loop
+from app.services.qdrant_collection_profiles import verify_practice_search_indexes
+from app.routes import auth, run_crew, patients, appointments, call_schedule, billing, ingestion, metrics
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
@@ -26,8 +34,36 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # One Bedrock client / executor / concurrency governor and one Qdrant client per process.
+    get_embedding_service()
+    index_check = None
+    try:
+        embedder = get_patient_embedder()
+        # Every assistant search filters on patient_id: check configured practices are indexed,
+        # in the background so a slow Qdrant does not hold up startup.
+        practices = list(dict.fromkeys(authorized_practices() + PRE_INGEST_PRACTICES))
+        if practices:
+            index_check = asyncio.create_task(
+                asyncio.to_thread(verify_practice_search_indexes, embedder.qdrant_client, practices)
+            )
+    except Exception as e:
+        logging.getLogger(__name__).warning("Patient embedder init deferred: %s", e)
+    try:
+        warm_up_crew()
+    except Exception as e:
+        logging.getLogger(__name__).warning("Crew warmup skipped: %s", e)
+    pre_ingest_task = None
+    if PRE_INGEST_ENABLED and PRE_INGEST_PRACTICES:
+        pre_ingest_task = asyncio.create_task(pre_ingestion_loop())
     yield
+    if pre_ingest_task:
+        pre_ingest_task.cancel()
+    if index_check:
+        index_check.cancel()
     await client.aclose()
+    close_patient_embedder()
+    shutdown_embedding_service()
+    crew_pool.shutdown()
 
 
 def create_app():
@@ -61,10 +97,12 @@ def create_app():
 
     app.include_router(auth.router)
     app.include_router(run_crew.router)
+    app.include_router(ingestion.router)
     app.include_router(patients.router)
     app.include_router(appointments.router)
     app.include_router(call_schedule.router)
     app.include_router(billing.router)
+    app.include_router(metrics.router)
 
     @app.get("/")
     def read_root():
@@ -7,7 +7,7 @@ class SessionUser(BaseModel):
 
     username: str
     practice_url: str
-    auth_method: str = "entra"  # "entra" (MSAL access token + cached ModMed)
+    auth_method: str = "entra"  # "entra" (MSAL access token + cached ModMed) or "service" (background jobs)
     # Sign-in email derived from Microsoft Entra token claims.
     email: Optional[str] = None
     is_admin: bool = False
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.models import SessionUser
+from app.routes.auth import require_modmed_session
+from app.services.ingestion_jobs import get_practice_job, start_patient_ingestion, stream_job_events
+
+router = APIRouter(
+    prefix="/ingest",
+    tags=["ingest"],
+)
+
+
+class IngestInput(BaseModel):
+    """Body for starting a chart ingest; `id` is the ModMed patient id."""
+    id: str = Field(..., description="FHIR Patient id")
+
+
+@router.post("", status_code=202)
+async def start_ingest(req: IngestInput, current_user: SessionUser = Depends(require_modmed_session)):
+    """Start (or join the running) background ingest of a patient's chart."""
+    return start_patient_ingestion(current_user, req.id).to_dict()
+
+
+@router.get("/{job_id}")
+async def get_ingest(job_id: str, current_user: SessionUser = Depends(require_modmed_session)):
+    """Status, progress and per-section timings of an ingestion job."""
+    return get_practice_job(current_user, job_id).to_dict()
+
+
+@router.get("/{job_id}/events")
+async def stream_ingest_events(
+    job_id: str,
+    request: Request,
+    current_user: SessionUser = Depends(require_modmed_session),
+):
+    """
+    Server-Sent Events stream of an ingestion job: sections fetched, documents downloaded and
+    parsed, each section's chunks embedded / points upserted with timings, then ``done``.
+    Reconnects resume after the ``Last-Event-ID`` header.
+    """
+    job = get_practice_job(current_user, job_id)
+    last_event_id = request.headers.get("last-event-id", "")
+    start = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+    return StreamingResponse(
+        stream_job_events(job, start),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends
+
+from app.models import SessionUser
+from app.routes.auth import require_admin
+from app.services.answer_cache import answer_cache
+from app.services.crew_pool import crew_pool
+from app.services.embedding_service import get_embedding_service
+from app.services.fast_path import fast_path
+from app.services.query_embedding_cache import query_embedding_cache
+from app.services.section_router import section_router
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+)
+
+
+@router.get("")
+async def get_metrics(current_user: SessionUser = Depends(require_admin)):
+    """In-process performance counters (per worker) for ops dashboards."""
+    return {
+        "embedding": get_embedding_service().stats(),
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "crew_pool": crew_pool.stats(),
+        "fast_path": fast_path.stats(),
+        "section_routing": section_router.stats(),
+    }
@@ -1,11 +1,18 @@
 import asyncio
 import logging
+from typing import Literal, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from app.services.patient_info_service import get_patient_info
-from app.services.crew_runner import run
+from app.services.answer_cache import answer_cache, index_version
+from app.services.crew_pool import crew_pool
+from app.services.crew_runner import UNANSWERED, run
+from app.services.crew_streaming import CrewTokenStream, stream_crew_run
+from app.services.embedding_manifest_store import load_patient_manifest
+from app.services.fast_path import fast_path
+from app.services.ingestion_jobs import get_practice_job, ingestion_jobs, sse_message, start_patient_ingestion
 from app.routes.auth import require_modmed_session
 from app.models import SessionUser
 
@@ -21,26 +28,79 @@ class CrewInput(BaseModel):
     """Body for clinical assistant run; `id` is the ModMed patient id."""
     query: str = Field(..., description="User question for the assistant")
     id: str = Field(..., description="FHIR Patient id")
+    ingest_mode: Literal["wait", "indexed"] = Field(
+        default="wait",
+        description="'wait': wait for the chart ingest (up to ingest_timeout_seconds); "
+        "'indexed': answer from whatever is already indexed while the ingest continues in the background",
+    )
+    ingest_timeout_seconds: Optional[float] = Field(
+        default=None,
+        ge=0,
+        description="Deadline for 'wait'; afterwards the crew answers from what is indexed so far. Omit to wait for completion.",
+    )
+    ingest_job_id: Optional[str] = Field(
+        default=None,
+        description="Attach to an ingestion job started earlier (POST /ingest) instead of starting or joining one",
+    )
+
+def _ingest_job(req: CrewInput, current_user: SessionUser):
+    # Ingest runs as a background job; asks for the same patient share one job.
+    if req.ingest_job_id:
+        job = get_practice_job(current_user, req.ingest_job_id)
+        if job.patient_id != req.id:
+            raise HTTPException(status_code=400, detail="Ingestion job is for a different patient")
+        return job
+    return start_patient_ingestion(current_user, req.id)
+
+
+async def _wait_for_ingest(req: CrewInput, job) -> None:
+    if req.ingest_mode == "wait":
+        finished = await ingestion_jobs.wait(job, timeout=req.ingest_timeout_seconds)
+        if finished and job.status == "failed":
+            raise HTTPException(status_code=job.error_status or 500, detail=job.error or "Failed to process patient data")
+        if not finished:
+            logger.info("Chart ingest still running at deadline; answering from indexed data",
+                        extra={"patient_id": req.id, "job_id": job.job_id})
+
+
+async def _cached_answer(req: CrewInput, current_user: SessionUser, job):
+    """
+    (index version, cached answer, fast-path answer); both answers are only given against a fully
+    ingested chart. The fast path (plain lookups rendered from structured sections) is tried on a
+    cache miss.
+    """
+    if job.status != "succeeded":
+        return None, None, None
+    manifest = await asyncio.to_thread(load_patient_manifest, current_user.practice_url, req.id)
+    version = index_version(manifest)
+    cached = answer_cache.get(current_user.practice_url, req.id, version, req.query) if version else None
+    if cached is not None:
+        logger.info("Answer cache hit", extra={"patient_id": req.id, "username": current_user.username})
+        return version, cached, None
+    return version, None, fast_path.answer(current_user.practice_url, req.id, manifest, req.query)
+
 
 @router.post("")
 async def run_crew(req: CrewInput, current_user: SessionUser = Depends(require_modmed_session)):
 
-    # Prefetch and embed the patient's chart into Qdrant so the crew can query it.
-    await get_patient_info(
-        req.id,
-        modmed_token=current_user.modmed_access_token,
-        practice_url=current_user.practice_url,
-        practice_api_key=current_user.practice_api_key,
-        user_qdrant_tool=current_user.qdrant_tool,
-    )
+    job = _ingest_job(req, current_user)
+    await _wait_for_ingest(req, job)
+
+    version, cached, fast = await _cached_answer(req, current_user, job)
+    if cached is not None:
+        return {"result": cached, "ingest": {"job_id": job.job_id, "status": job.status}}
+    if fast is not None:
+        return {"result": fast, "fast_path": True, "ingest": {"job_id": job.job_id, "status": job.status}}
 
     try:
         logger.info("Starting crew execution", 
                    extra={"patient_id": req.id, "query": req.query[:50], 
                          "username": current_user.username, "practice_url": current_user.practice_url})
         
-        # CrewAI is synchronous; run off the event loop so other requests can progress.
-        result = await asyncio.to_thread(
+        # CrewAI is synchronous; run it on the bounded crew pool (429/503 when saturated).
+        result = await crew_pool.run(
+            current_user.username,
+            current_user.practice_url,
             run,
             req.query,
             req.id,
@@ -50,10 +110,90 @@ async def run_crew(req: CrewInput, current_user: SessionUser = Depends(require_m
         
         logger.info("Crew execution completed successfully", 
                    extra={"patient_id": req.id, "username": current_user.username})
+        if version and result not in UNANSWERED:
+            answer_cache.put(current_user.practice_url, req.id, version, req.query, result)
         
-        return {"result": result}
+        return {"result": result, "ingest": {"job_id": job.job_id, "status": job.status}}
+    except HTTPException:
+        raise
     except Exception:
         logger.exception("Crew execution failed", 
                         extra={"patient_id": req.id, "query": req.query[:50], 
                               "username": current_user.username, "practice_url": current_user.practice_url})
-        raise HTTPException(status_code=500, detail="Failed to process query")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to process query")
+
+
+async def _crew_events(req: CrewInput, current_user: SessionUser, job):
+    seq = 0
+
+    def event(name, data):
+        nonlocal seq
+        seq += 1
+        return sse_message(seq - 1, name, data)
+
+    def ingest():
+        return {"job_id": job.job_id, "status": job.status}
+
+    yield event("status", {"stage": "ingest", **ingest()})
+    try:
+        await _wait_for_ingest(req, job)
+    except HTTPException as e:
+        yield event("error", {"status": e.status_code, "detail": e.detail})
+        return
+
+    version, cached, fast = await _cached_answer(req, current_user, job)
+    if cached is not None:
+        yield event("done", {"result": cached, "cached": True, "ingest": ingest()})
+        return
+    if fast is not None:
+        yield event("done", {"result": fast, "cached": False, "fast_path": True, "ingest": ingest()})
+        return
+
+    yield event("status", {"stage": "thinking", **ingest()})
+    logger.info("Starting streamed crew execution",
+                extra={"patient_id": req.id, "query": req.query[:50],
+                       "username": current_user.username, "practice_url": current_user.practice_url})
+    stream = CrewTokenStream(asyncio.get_running_loop())
+    crew_run = crew_pool.run(
+        current_user.username, current_user.practice_url,
+        run, req.query, req.id, current_user.practice_url, current_user.qdrant_tool, token_stream=stream,
+    )
+    try:
+        async for name, data in stream_crew_run(crew_run, stream):
+            if name != "result":
+                yield event(name, data)
+                continue
+            result = data["text"]
+            if version and result not in UNANSWERED:
+                answer_cache.put(current_user.practice_url, req.id, version, req.query, result)
+            logger.info("Streamed crew execution completed",
+                        extra={"patient_id": req.id, "username": current_user.username})
+            yield event("done", {"result": result, "cached": False, "ingest": ingest()})
+    except asyncio.CancelledError:
+        # Client disconnected; stream_crew_run has already cancelled the crew's generation.
+        logger.info("Streamed crew execution cancelled by client", extra={"patient_id": req.id, "username": current_user.username})
+        raise
+    except HTTPException as e:
+        # Pool saturated (429/503): same status and Retry-After as POST /run_crew would return.
+        retry_after = int(e.headers["Retry-After"]) if e.headers and "Retry-After" in e.headers else None
+        yield event("error", {"status": e.status_code, "detail": e.detail, "retry_after": retry_after})
+    except Exception:
+        logger.exception("Streamed crew execution failed",
+                         extra={"patient_id": req.id, "query": req.query[:50],
+                                "username": current_user.username, "practice_url": current_user.practice_url})
+        yield event("error", {"status": 500, "detail": "Failed to process query"})
+
+
+@router.post("/stream")
+async def run_crew_stream(req: CrewInput, current_user: SessionUser = Depends(require_modmed_session)):
+    """
+    Server-Sent Events variant of ``POST /run_crew``: ``status`` events (ingest, thinking,
+    searching), the final answer as ``token`` events while Bedrock generates it, then ``done``
+    with the complete ``result`` (or ``error``). Disconnecting stops the crew's generation.
+    """
+    job = _ingest_job(req, current_user)
+    return StreamingResponse(
+        _crew_events(req, current_user, job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,108 @@
+"""
+In-process cache of clinical assistant answers.
+
+Clinicians ask the same questions about the same patient through the day ("current meds?",
+"last PSA?"); each was a full crew run. Answers are cached under
+(practice, patient_id, index version, normalized query), where the index version is the set of
+(section, section_hash) pairs in the embedding manifest. Re-embedding any section changes its
+hash and therefore the key, so a stale answer is never served, on this worker or any other
+reading the same manifest. ``get_patient_info`` also drops a patient's entries on this worker
+as soon as it re-embeds something, so they do not linger until LRU eviction.
+
+Only answers produced against a completely ingested chart are stored. Hit/miss counters are
+reported under ``GET /metrics``.
+
+Env:
+  ANSWER_CACHE_SIZE — answers kept per process (default 512; 0 disables)
+  ANSWER_CACHE_TTL_SECONDS — entry lifetime (default 43200, half a day)
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Mapping, Optional, Tuple
+
+from app.services.query_embedding_cache import normalize_query
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "43200"))
+
+IndexVersion = FrozenSet[Tuple[str, str]]
+Key = Tuple[str, str, IndexVersion, str]
+
+
+def index_version(manifest: Mapping[str, Mapping[str, Any]]) -> IndexVersion:
+    """(section, section_hash) pairs currently indexed for a patient (``load_patient_manifest``)."""
+    return frozenset((name, str(entry.get("section_hash") or "")) for name, entry in manifest.items())
+
+
+class AnswerCache:
+    """Thread-safe LRU with per-entry expiry and per-patient invalidation."""
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_SIZE,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Key, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "invalidated": 0}
+
+    @staticmethod
+    def key(practice_url: str, patient_id: str, version: IndexVersion, query: str) -> Key:
+        return (practice_url, patient_id, version, normalize_query(query))
+
+    def get(self, practice_url: str, patient_id: str, version: IndexVersion, query: str) -> Optional[str]:
+        key = self.key(practice_url, patient_id, version, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                del self._entries[key]
+                self._counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[1]
+
+    def put(self, practice_url: str, patient_id: str, version: IndexVersion, query: str, answer: str) -> None:
+        if self.max_entries <= 0 or not version or not answer:
+            return
+        key = self.key(practice_url, patient_id, version, query)
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evicted"] += 1
+
+    def invalidate_patient(self, practice_url: str, patient_id: str) -> int:
+        """Drop every cached answer for one patient; returns how many were removed."""
+        with self._lock:
+            stale = [k for k in self._entries if k[0] == practice_url and k[1] == patient_id]
+            for k in stale:
+                del self._entries[k]
+            self._counters["invalidated"] += len(stale)
+            return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+answer_cache = AnswerCache()
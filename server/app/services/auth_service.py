@@ -64,6 +64,31 @@ def _apply_token_identity(user: SessionUser, email: str, roles: list[str]) -> No
     user.billing_staff, user.billing_processor = billing_flags_from_roles(roles)
 
 
+def authorized_practices() -> list[str]:
+    """Practice names referenced by AUTHORIZED_EMAILS, in first-seen order."""
+    practices = []
+    for entry in os.getenv("AUTHORIZED_EMAILS", "").split(","):
+        if ":" in entry:
+            practice_name = entry.rsplit(":", 1)[1].strip()
+            if practice_name and practice_name not in practices:
+                practices.append(practice_name)
+    return practices
+
+
+def _practice_qdrant_tool(practice_url: str) -> Optional[QdrantVectorSearchTool]:
+    """Search tool bound to the practice's Qdrant collection, or None if unavailable."""
+    try:
+        return QdrantVectorSearchTool(
+            collection_name=practice_url,
+            limit=5,
+            qdrant_url=os.getenv("QDRANT_URL"),
+            qdrant_api_key=os.getenv("QDRANT_API_KEY"),
+        )
+    except Exception as e:
+        logger.warning("Failed to create Qdrant tool: %s", e)
+        return None
+
+
 class AuthService:
     """
     Resolves API users from Microsoft Entra access tokens and caches ModMed/Qdrant
@@ -175,15 +200,7 @@ class AuthService:
                 else:
                     logger.warning("ModMed bootstrap failed for practice %s", practice_name)
 
-            try:
-                qdrant_tool = QdrantVectorSearchTool(
-                    collection_name=practice_url,
-                    limit=5,
-                    qdrant_url=os.getenv("QDRANT_URL"),
-                    qdrant_api_key=os.getenv("QDRANT_API_KEY"),
-                )
-            except Exception as e:
-                logger.warning("Failed to create Qdrant tool: %s", e)
+            qdrant_tool = _practice_qdrant_tool(practice_url)
 
             session_user = SessionUser(
                 username=email,
@@ -217,6 +234,35 @@ class AuthService:
 
         return session_user
 
+    async def build_practice_service_user(self, practice_name: str) -> Optional[SessionUser]:
+        """
+        SessionUser for background jobs (no Entra caller) acting on one practice with its
+        PRACTICE_* ModMed credentials. None when credentials or ModMed login are missing.
+        """
+        modmed_creds = self._get_practice_modmed_credentials(practice_name)
+        if not modmed_creds:
+            logger.warning("No PRACTICE_%s credentials for background job", practice_name)
+            return None
+        fhir_username, fhir_password, practice_url, practice_api_key = modmed_creds
+        mm_tokens = await self._authenticate_with_modmed(
+            fhir_username, fhir_password, practice_url, practice_api_key
+        )
+        if not mm_tokens:
+            return None
+        now = datetime.utcnow()
+        return SessionUser(
+            username=f"service:{practice_url}",
+            practice_url=practice_url,
+            auth_method="service",
+            modmed_access_token=mm_tokens["access_token"],
+            modmed_refresh_token=mm_tokens.get("refresh_token"),
+            modmed_expires_at=now + timedelta(hours=2),
+            created_at=now,
+            expires_at=now + timedelta(hours=2),
+            practice_api_key=practice_api_key,
+            qdrant_tool=_practice_qdrant_tool(practice_url),
+        )
+
     def _start_schedule_prewarm(
         self, practice_url: str, modmed_token: str, practice_api_key: str
     ) -> None:
@@ -0,0 +1,167 @@
+"""
+Streaming narrative extraction from C-CDA XML attachments.
+
+``xmltodict`` turned a C-CDA into one nested dict of every element and attribute (template
+ids, code systems, structured entries); the whole tree was held in memory and rendered for
+embedding. ``extract_ccda_text`` walks the document with ``ElementTree.iterparse`` instead and
+keeps only the human-readable narrative (``section/text``) of clinical sections:
+
+- sections are selected by their LOINC ``code`` (``NARRATIVE_SECTIONS``: problems,
+  medications, allergies, results, vitals, procedures, notes / assessment / plan ...);
+  ``CCDA_ALL_SECTIONS=true`` keeps every section that has narrative text
+- tables become ``cell | cell`` rows, list items ``- item``, paragraphs one line each
+- structured ``entry`` elements and finished sections are cleared as soon as they end, so
+  memory is bounded by the largest single section rather than the document
+
+The result is compact text, one ``TITLE`` block per section separated by blank lines, stored
+as the document's ``content_text`` (chunked by paragraph like PDF text). Non-C-CDA XML returns
+None and callers keep the ``xmltodict`` path.
+
+Env:
+  CCDA_ALL_SECTIONS — keep every narrative section, not only NARRATIVE_SECTIONS (default false)
+"""
+from __future__ import annotations
+
+import io
+import logging
+import os
+import xml.etree.ElementTree as ET
+from typing import List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+CCDA_ALL_SECTIONS = (os.getenv("CCDA_ALL_SECTIONS") or "false").strip().lower() == "true"
+
+# LOINC section code -> heading used when the section has no <title>.
+NARRATIVE_SECTIONS = {
+    "11450-4": "Problems",
+    "11348-0": "Past Medical History",
+    "10160-0": "Medications",
+    "29549-3": "Medications Administered",
+    "48765-2": "Allergies",
+    "30954-2": "Results",
+    "8716-3": "Vital Signs",
+    "47519-4": "Procedures",
+    "46240-8": "Encounters",
+    "11369-6": "Immunizations",
+    "10157-6": "Family History",
+    "29762-2": "Social History",
+    "10164-2": "History of Present Illness",
+    "10187-3": "Review of Systems",
+    "29545-1": "Physical Exam",
+    "29299-5": "Reason for Visit",
+    "46239-0": "Chief Complaint and Reason for Visit",
+    "10154-3": "Chief Complaint",
+    "42349-1": "Reason for Referral",
+    "51848-0": "Assessment",
+    "51847-2": "Assessment and Plan",
+    "18776-5": "Plan of Treatment",
+    "61150-9": "Subjective",
+    "61149-1": "Objective",
+    "11535-2": "Hospital Discharge Diagnosis",
+    "8648-8": "Hospital Course",
+    "69730-0": "Instructions",
+}
+
+_BLOCKS = {"paragraph", "list", "table", "br"}
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _collapse(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _has_blocks(elem: ET.Element) -> bool:
+    return any(_local(c.tag) in _BLOCKS for c in elem.iter() if c is not elem)
+
+
+def _render(elem: ET.Element, lines: List[str]) -> None:
+    """Append compact lines for a narrative block (``section/text`` or one of its children)."""
+    name = _local(elem.tag)
+    if name == "table":
+        for row in elem.iter():
+            if _local(row.tag) != "tr":
+                continue
+            cells = [_collapse("".join(c.itertext())) for c in row if _local(c.tag) in ("th", "td")]
+            if any(cells):
+                lines.append(" | ".join(cells))
+        return
+    if name == "list":
+        for item in elem:
+            if _local(item.tag) == "item":
+                text = _collapse("".join(item.itertext()))
+                if text:
+                    lines.append(f"- {text}")
+        return
+    # Inline runs (text, <content>, <linkHtml> ...) form one line; blocks and <br/> break it.
+    run = [elem.text or ""]
+
+    def flush():
+        text = _collapse("".join(run))
+        if text:
+            lines.append(text)
+        run.clear()
+
+    for child in elem:
+        if _local(child.tag) in _BLOCKS or _has_blocks(child):
+            flush()
+            _render(child, lines)
+        else:
+            run.append("".join(child.itertext()))
+        run.append(child.tail or "")
+    flush()
+
+
+def extract_ccda_text(xml: Union[bytes, str], all_sections: Optional[bool] = None) -> Optional[str]:
+    """
+    Compact narrative text of a C-CDA document, or None when ``xml`` is not a C-CDA
+    (root other than ``ClinicalDocument``) or cannot be parsed.
+    """
+    all_sections = CCDA_ALL_SECTIONS if all_sections is None else all_sections
+    source = io.BytesIO(xml.encode("utf-8") if isinstance(xml, str) else xml)
+    blocks: List[str] = []
+    try:
+        events = ET.iterparse(source, events=("start", "end"))
+        event, root = next(events)
+        if _local(root.tag) != "ClinicalDocument":
+            return None
+        for event, elem in events:
+            if event != "end":
+                continue
+            name = _local(elem.tag)
+            if name == "entry":
+                elem.clear()  # structured data duplicated by the narrative
+            elif name == "section":
+                block = _section_block(elem, all_sections)
+                if block:
+                    blocks.append(block)
+                elem.clear()
+            elif name == "component":
+                elem.clear()  # its sections are already extracted
+    except ET.ParseError as e:
+        logger.warning("C-CDA parse failed: %s", e)
+        return None
+    return "\n\n".join(blocks)
+
+
+def _section_block(section: ET.Element, all_sections: bool) -> Optional[str]:
+    code = title = text = None
+    for child in section:
+        name = _local(child.tag)
+        if name == "code":
+            code = child.get("code")
+        elif name == "title":
+            title = _collapse("".join(child.itertext()))
+        elif name == "text":
+            text = child
+    if text is None or (not all_sections and code not in NARRATIVE_SECTIONS):
+        return None
+    lines: List[str] = []
+    _render(text, lines)
+    if not lines:
+        return None
+    heading = title or NARRATIVE_SECTIONS.get(code) or "Section"
+    return "\n".join([heading.upper(), *lines])
@@ -0,0 +1,211 @@
+"""
+Dedicated, bounded executor for crew runs with admission control.
+
+Crew runs used ``asyncio.to_thread`` and so shared the default executor with every other
+blocking call (DynamoDB, S3, PDF parsing); a burst of questions could starve schedule and
+billing requests. ``CrewPool`` gives them their own threads and a queue:
+
+- at most ``CREW_POOL_WORKERS`` runs execute at once; later ones wait in FIFO order
+- a user with ``CREW_MAX_PER_USER`` runs (running or queued), or a practice with
+  ``CREW_MAX_PER_PRACTICE``, gets 429 immediately
+- a full queue (``CREW_MAX_QUEUE``) or a wait longer than ``CREW_MAX_QUEUE_WAIT_SECONDS``
+  gets 503
+- both carry ``Retry-After: CREW_RETRY_AFTER_SECONDS``
+
+A slot is released when the crew thread finishes, not when the awaiting request goes away, so
+abandoned runs (client disconnects) still count against the pool until they stop. Queue depth,
+wait times and rejections are reported under ``GET /metrics``.
+
+Env:
+  CREW_POOL_WORKERS — crew threads per process (default 8)
+  CREW_MAX_QUEUE — runs allowed to wait for a thread (default 32)
+  CREW_MAX_PER_USER — running + queued runs per user (default 2)
+  CREW_MAX_PER_PRACTICE — running + queued runs per practice (default 8)
+  CREW_MAX_QUEUE_WAIT_SECONDS — longest wait for a thread before 503 (default 30)
+  CREW_RETRY_AFTER_SECONDS — Retry-After on 429/503 (default 5)
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, TypeVar
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+CREW_POOL_WORKERS = max(1, int(os.getenv("CREW_POOL_WORKERS", "8")))
+CREW_MAX_QUEUE = max(0, int(os.getenv("CREW_MAX_QUEUE", "32")))
+CREW_MAX_PER_USER = max(1, int(os.getenv("CREW_MAX_PER_USER", "2")))
+CREW_MAX_PER_PRACTICE = max(1, int(os.getenv("CREW_MAX_PER_PRACTICE", "8")))
+CREW_MAX_QUEUE_WAIT_SECONDS = float(os.getenv("CREW_MAX_QUEUE_WAIT_SECONDS", "30"))
+CREW_RETRY_AFTER_SECONDS = max(1, int(os.getenv("CREW_RETRY_AFTER_SECONDS", "5")))
+
+T = TypeVar("T")
+
+
+class CrewPool:
+    """Per-process crew executor. Admission state lives on the event loop; only the runs use threads."""
+
+    def __init__(
+        self,
+        workers: int = CREW_POOL_WORKERS,
+        max_queue: int = CREW_MAX_QUEUE,
+        max_per_user: int = CREW_MAX_PER_USER,
+        max_per_practice: int = CREW_MAX_PER_PRACTICE,
+        max_queue_wait: float = CREW_MAX_QUEUE_WAIT_SECONDS,
+        retry_after: int = CREW_RETRY_AFTER_SECONDS,
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.max_per_practice = max_per_practice
+        self.max_queue_wait = max_queue_wait
+        self.retry_after = retry_after
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._running = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._per_user: Counter = Counter()
+        self._per_practice: Counter = Counter()
+        self._counters = {
+            "admitted": 0, "started": 0, "completed": 0, "failed": 0,
+            "rejected_user": 0, "rejected_practice": 0, "rejected_queue_full": 0, "queue_timeouts": 0,
+        }
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="crew")
+        return self._executor
+
+    def _reject(self, status_code: int, reason: str, detail: str) -> HTTPException:
+        self._counters[reason] += 1
+        logger.warning("Crew run rejected (%s)", reason)
+        return HTTPException(
+            status_code=status_code, detail=detail, headers={"Retry-After": str(self.retry_after)}
+        )
+
+    def _admit(self, user_key: str, practice_key: str) -> None:
+        if self._per_user[user_key] >= self.max_per_user:
+            raise self._reject(429, "rejected_user", "Too many questions in progress; try again shortly")
+        if self._per_practice[practice_key] >= self.max_per_practice:
+            raise self._reject(429, "rejected_practice", "Too many questions in progress for this practice")
+        if self._running >= self.workers and len(self._waiters) >= self.max_queue:
+            raise self._reject(503, "rejected_queue_full", "Assistant is busy; try again shortly")
+        self._per_user[user_key] += 1
+        self._per_practice[practice_key] += 1
+        self._counters["admitted"] += 1
+
+    def _leave(self, user_key: str, practice_key: str) -> None:
+        for counts, key in ((self._per_user, user_key), (self._per_practice, practice_key)):
+            counts[key] -= 1
+            if counts[key] <= 0:
+                del counts[key]
+
+    async def _acquire(self) -> None:
+        if self._running < self.workers and not self._waiters:
+            self._running += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=self.max_queue_wait)
+        except asyncio.TimeoutError:
+            raise self._reject(503, "queue_timeouts", "Assistant is busy; try again shortly") from None
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # slot was handed over just as we were cancelled
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _release(self) -> None:
+        """Hand the slot to the oldest live waiter, else free it."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._running -= 1
+
+    async def run(self, user_key: str, practice_key: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run ``fn`` on a crew thread once admitted (like ``asyncio.to_thread``, context included).
+        Raises HTTPException 429/503 with Retry-After when over a cap or saturated.
+        """
+        self._admit(user_key, practice_key)
+        queued_at = time.monotonic()
+        try:
+            await self._acquire()
+        except BaseException:
+            self._leave(user_key, practice_key)
+            raise
+        waited = time.monotonic() - queued_at
+        self._counters["started"] += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+
+        def finished(future) -> None:
+            self._counters["failed" if future.cancelled() or future.exception() else "completed"] += 1
+            self._run_total += time.monotonic() - started
+            self._release()
+            self._leave(user_key, practice_key)
+
+        try:
+            ctx = contextvars.copy_context()
+            future = self._get_executor().submit(functools.partial(ctx.run, fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            self._leave(user_key, practice_key)
+            raise
+
+        def on_done(f) -> None:
+            try:
+                loop.call_soon_threadsafe(finished, f)
+            except RuntimeError:
+                pass  # event loop already closed (shutdown); nothing left to account for
+
+        # Free the slot when the thread is done, even if the caller stopped waiting.
+        future.add_done_callback(on_done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        started = self._counters["started"]
+        finished = self._counters["completed"] + self._counters["failed"]
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "queued": sum(1 for w in self._waiters if not w.done()),
+            "max_queue": self.max_queue,
+            "max_per_user": self.max_per_user,
+            "max_per_practice": self.max_per_practice,
+            **self._counters,
+            "avg_queue_wait_ms": round(self._wait_total / started * 1000, 1) if started else 0.0,
+            "max_queue_wait_ms": round(self._wait_max * 1000, 1),
+            "avg_run_s": round(self._run_total / finished, 3) if finished else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+crew_pool = CrewPool()
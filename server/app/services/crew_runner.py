@@ -3,31 +3,49 @@
 Living here (instead of in app.main) lets route modules import `run` directly
 without creating an import cycle through the application entrypoint.
 """
-from app.crew.crew import ClinicalAssistantCrew
+from app.crew.crew import get_crew_template
+from app.services.crew_streaming import CrewTokenStream, token_sink
 
 # The crew task whose raw output is the user-facing answer.
 _FINAL_ANSWER_AGENT = "Clinical Assistant Specialist"
-
-
-def run(query: str, patient_id: str, practice_url: str | None = None, user_qdrant_tool=None):
+_NO_TASK_ANSWER = "No final answer found."
+_NO_AGENT_ANSWER = f"No relevant output found from {_FINAL_ANSWER_AGENT}."
+# Fallback replies that are not answers (never cached).
+UNANSWERED = frozenset({_NO_TASK_ANSWER, _NO_AGENT_ANSWER})
+
+
+def run(
+    query: str,
+    patient_id: str,
+    practice_url: str | None = None,
+    user_qdrant_tool=None,
+    token_stream: CrewTokenStream | None = None,
+):
     """
     Execute the CrewAI clinical assistant synchronously.
 
     This is blocking/CPU-bound, so callers should invoke it via
     ``asyncio.to_thread`` from async request handlers. Exceptions propagate to
     the caller with their original traceback intact.
+
+    With ``token_stream`` the LLM streams its completions through it (and stops
+    with ``CrewCancelled`` once the stream is cancelled).
     """
     inputs = {"query": query, "id": patient_id, "practice_url": practice_url}
 
-    crew_instance = ClinicalAssistantCrew()
-    if user_qdrant_tool:
-        crew_instance.user_qdrant_tool = user_qdrant_tool
-
-    result = crew_instance.crew().kickoff(inputs=inputs)
+    # Config and LLM are compiled once per process; only the user's tool is bound here,
+    # to this patient, so every search is filtered on patient_id whatever the agent passes.
+    tool = user_qdrant_tool.for_patient(patient_id) if user_qdrant_tool is not None else None
+    crew = get_crew_template().build(tool)
+    reset = token_sink.set(token_stream)
+    try:
+        result = crew.kickoff(inputs=inputs)
+    finally:
+        token_sink.reset(reset)
     result_dict = result.model_dump()
 
     for task in result_dict.get("tasks_output", []):
         if task.get("agent", "").strip() == _FINAL_ANSWER_AGENT:
-            return task.get("raw", "No final answer found.")
+            return task.get("raw", _NO_TASK_ANSWER)
 
-    return f"No relevant output found from {_FINAL_ANSWER_AGENT}."
+    return _NO_AGENT_ANSWER
@@ -0,0 +1,117 @@
+"""
+Token streaming for the clinical assistant crew (``POST /run_crew/stream``).
+
+``/run_crew`` returns only after ``kickoff`` has finished, so the clinician waits for the whole
+generation. For the streaming variant the route runs the crew with a ``CrewTokenStream`` set in
+the ``token_sink`` context variable (``asyncio.to_thread`` carries it into the crew thread).
+``PatchedBedrockLLM`` sees the sink and runs the call through crewai's streaming path (so the
+usual LLM call events and callbacks still fire); each ``LLMStreamChunkEvent`` is fed to the sink:
+
+- the agent's ReAct reasoning is not forwarded; the first ``Action:`` produces a
+  ``status`` event (``stage: searching``) while the search tool runs
+- text after ``Final Answer:`` is forwarded as ``token`` events as Bedrock produces it
+- ``cancel()`` (client disconnected) makes the next chunk raise ``CrewCancelled`` inside the
+  crew thread, which stops generation and abandons the run
+
+``stream_crew_run`` turns the sink into an async iterator of ``(event, data)`` pairs for the route.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional, Tuple
+
+_FINAL_ANSWER_MARKER = "Final Answer:"
+_ACTION_MARKER = "Action:"
+
+
+class CrewCancelled(BaseException):
+    """
+    Raised in the crew thread once the streaming client has gone away. Like
+    ``asyncio.CancelledError`` it is not an ``Exception``: crewai's event bus and streaming loop
+    catch those (and would return the partial completion), which must not keep the run going.
+    """
+
+
+class CrewTokenStream:
+    """Bridge from the (synchronous) crew thread to the event loop serving the SSE response."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self.queue: "asyncio.Queue[Tuple[str, Dict[str, Any]]]" = asyncio.Queue()
+        self._cancelled = threading.Event()
+        self._call_text = ""
+        self._answering = False
+        self._leading = True
+        self._searching = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def check(self) -> None:
+        if self._cancelled.is_set():
+            raise CrewCancelled()
+
+    def emit(self, event: str, **data: Any) -> None:
+        self._loop.call_soon_threadsafe(self.queue.put_nowait, (event, data))
+
+    def begin_call(self) -> None:
+        """A new LLM call starts; its text is scanned for the final-answer marker from scratch."""
+        self.check()
+        self._call_text = ""
+        self._answering = False
+        self._leading = True
+
+    def feed(self, text: str) -> None:
+        """One streamed chunk of the current LLM call."""
+        self.check()
+        if not self._answering:
+            self._call_text += text
+            at = self._call_text.find(_FINAL_ANSWER_MARKER)
+            if at < 0:
+                if not self._searching and _ACTION_MARKER in self._call_text:
+                    self._searching = True
+                    self.emit("status", stage="searching")
+                return
+            self._answering = True
+            text = self._call_text[at + len(_FINAL_ANSWER_MARKER):]
+        if self._leading:
+            text = text.lstrip()
+            self._leading = not text
+        if text:
+            self.emit("token", text=text)
+
+
+token_sink: ContextVar[Optional[CrewTokenStream]] = ContextVar("crew_token_sink", default=None)
+
+
+async def stream_crew_run(run: Awaitable[str], stream: CrewTokenStream) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yield ``status`` / ``token`` events while ``run`` (the crew on a pool thread) executes,
+    then ``("result", {"text": ...})``. Exceptions from the crew propagate. Closing the iterator
+    early (client disconnect) cancels the stream so the crew thread stops at its next chunk.
+    """
+    task = asyncio.ensure_future(run)
+    try:
+        while True:
+            getter = asyncio.ensure_future(stream.queue.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                break
+            yield getter.result()
+        # Chunks are queued before the thread's result is delivered, so nothing is left behind.
+        while not stream.queue.empty():
+            yield stream.queue.get_nowait()
+        yield "result", {"text": task.result()}
+    finally:
+        stream.cancel()
+        if not task.done():
+            # Abandoned run: a queued one leaves the queue, a running one stops at its next chunk.
+            task.cancel()
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
@@ -0,0 +1,202 @@
+"""
+Cross-request embedding micro-batcher.
+
+Collects chunk texts from every concurrent ``chunk_and_embed`` caller for up to
+``max_wait_ms`` (or until ``max_batch_items`` are queued), de-duplicates identical texts
+across callers, sends the batch through a backend and resolves each caller's future.
+
+Backends implement ``embed_batch(texts) -> list[list[float]]`` (same order, ``[]`` for a
+failed text). Titan v2 ``invoke_model`` takes one text and Bedrock batch inference is an
+asynchronous S3 job (minutes), so the production backend is ``FanOutBackend``: a parallel
+fan-out through the shared, throttle-governed ``EmbeddingService``. A true multi-text
+backend can be dropped in without touching callers.
+
+Env:
+  EMBEDDING_BATCH_ENABLED — default true
+  EMBEDDING_BATCH_MAX_ITEMS — flush once this many texts are queued (default 64)
+  EMBEDDING_BATCH_MAX_WAIT_MS — flush this long after the first queued text (default 5)
+  EMBEDDING_BATCH_CONCURRENCY — batches dispatched at once (default 4)
+
+Trade-off: larger ``max_wait_ms`` / ``max_batch_items`` improve batching (and dedup) under
+load at the cost of up to ``max_wait_ms`` extra latency for a lone caller; see
+``scripts/bench_embedding_batcher.py``.
+
+``shutdown`` fails every caller that has not been answered yet (queued texts and batches not
+yet started) with ``BatcherClosedError``, and ``submit`` raises it afterwards, so no caller of
+``embed_many`` is left waiting when the app stops.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Protocol, Sequence
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BATCH_ENABLED = (os.getenv("EMBEDDING_BATCH_ENABLED") or "true").strip().lower() != "false"
+EMBEDDING_BATCH_MAX_ITEMS = int(os.getenv("EMBEDDING_BATCH_MAX_ITEMS", "64"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+EMBEDDING_BATCH_CONCURRENCY = int(os.getenv("EMBEDDING_BATCH_CONCURRENCY", "4"))
+
+_STOP = object()
+
+
+class BatcherClosedError(RuntimeError):
+    """The batcher was shut down before the text was embedded."""
+
+
+class EmbeddingBackend(Protocol):
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]: ...
+
+
+class FanOutBackend:
+    """Embeds a batch by fanning out single-text calls through an ``EmbeddingService``."""
+
+    def __init__(self, service, max_retries: int = 5):
+        self.service = service
+        self.max_retries = max_retries
+
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        futures = [self.service.submit(text, max_retries=self.max_retries) for text in texts]
+        return [f.result() for f in futures]
+
+
+class EmbeddingMicroBatcher:
+    """Thread-safe front door: ``submit``/``embed_many`` from any thread."""
+
+    def __init__(
+        self,
+        backend: EmbeddingBackend,
+        max_batch_items: int = EMBEDDING_BATCH_MAX_ITEMS,
+        max_wait_ms: float = EMBEDDING_BATCH_MAX_WAIT_MS,
+        max_concurrent_batches: int = EMBEDDING_BATCH_CONCURRENCY,
+    ):
+        self.backend = backend
+        self.max_batch_items = max(1, max_batch_items)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._dispatch = ThreadPoolExecutor(
+            max_workers=max(1, max_concurrent_batches), thread_name_prefix="embedding-batch"
+        )
+        self._stats_lock = threading.Lock()
+        self._counters = {"batches": 0, "items": 0, "unique_items": 0, "failed_batches": 0}
+        self._queue_wait_s = 0.0
+        self._closed = False
+        self._closed_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._collect_loop, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> "Future[List[float]]":
+        future: "Future[List[float]]" = Future()
+        with self._closed_lock:
+            if self._closed:
+                raise BatcherClosedError("Embedding batcher is shut down")
+            self._queue.put((text, future, time.monotonic()))
+        return future
+
+    def embed_many(self, texts: Sequence[str]) -> List[List[float]]:
+        futures = [self.submit(text) for text in texts]
+        return [f.result() for f in futures]
+
+    def _collect_loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait_s
+            while len(batch) < self.max_batch_items:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._dispatch_batch(batch)
+                    return
+                batch.append(item)
+            self._dispatch_batch(batch)
+
+    def _dispatch_batch(self, batch: list) -> None:
+        try:
+            dispatched = self._dispatch.submit(self._run_batch, batch)
+        except RuntimeError:  # dispatch pool already shut down
+            self._fail(batch)
+            return
+        # A batch cancelled by shutdown before it started still owes its callers an answer.
+        dispatched.add_done_callback(lambda f: self._fail(batch) if f.cancelled() else None)
+
+    @staticmethod
+    def _fail(batch: list) -> None:
+        for _, future, _ in batch:
+            try:
+                future.set_exception(BatcherClosedError("Embedding batcher shut down before this text was embedded"))
+            except InvalidStateError:
+                pass
+
+    def _run_batch(self, batch: list) -> None:
+        now = time.monotonic()
+        waiters: Dict[str, List[Future]] = {}
+        for text, future, queued_at in batch:
+            waiters.setdefault(text, []).append(future)
+            with self._stats_lock:
+                self._queue_wait_s += now - queued_at
+        unique = list(waiters)
+        try:
+            vectors = self.backend.embed_batch(unique)
+        except Exception as e:
+            logger.error("Embedding batch of %s texts failed: %s", len(unique), e)
+            vectors = [[] for _ in unique]
+            with self._stats_lock:
+                self._counters["failed_batches"] += 1
+        with self._stats_lock:
+            self._counters["batches"] += 1
+            self._counters["items"] += len(batch)
+            self._counters["unique_items"] += len(unique)
+        for text, vector in zip(unique, vectors):
+            for future in waiters[text]:
+                future.set_result(vector)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            batches = self._counters["batches"]
+            items = self._counters["items"]
+            return {
+                **self._counters,
+                "pending": self._queue.qsize(),
+                "avg_batch_size": round(items / batches, 2) if batches else 0.0,
+                "dedup_saved": items - self._counters["unique_items"],
+                "avg_queue_wait_ms": round(1000 * self._queue_wait_s / items, 2) if items else 0.0,
+                "max_batch_items": self.max_batch_items,
+                "max_wait_ms": self.max_wait_s * 1000,
+            }
+
+    def shutdown(self) -> None:
+        with self._closed_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout=1)
+        self._dispatch.shutdown(wait=False, cancel_futures=True)
+        # Texts the collector never picked up.
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                self._fail([item])
+
+
+def create_batcher(service) -> Optional[EmbeddingMicroBatcher]:
+    """Batcher in front of ``service`` per EMBEDDING_BATCH_* settings, or None when disabled."""
+    if not EMBEDDING_BATCH_ENABLED:
+        return None
+    return EmbeddingMicroBatcher(FanOutBackend(service))
@@ -0,0 +1,170 @@
+"""
+Content-addressed embedding cache: (model, dimensions, sha256(text)) -> vector.
+
+Vectors are stored as little-endian float16 BLOBs (2 bytes per dimension) in a local
+SQLite file in WAL mode, so every worker process on the host shares one cache. Titan v2
+vectors are normalized, so the float16 rounding (~1e-3) does not change cosine rankings.
+
+The cache is bounded: a hit refreshes the row's ``last_used_at``, and once a write takes the
+table past ``EMBEDDING_CACHE_MAX_ROWS`` the least recently used rows are deleted (down to 90% of
+the limit, so pruning does not run on every write).
+
+Env:
+  EMBEDDING_CACHE_ENABLED — default true; "false" disables lookups and writes
+  EMBEDDING_CACHE_SQLITE_PATH — default app/data/embedding_cache.sqlite3
+  EMBEDDING_CACHE_MAX_ROWS — vectors kept (default 250000, ~0.5 GB at 1024 dims; 0 = unbounded)
+"""
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import logging
+import os
+import sqlite3
+import struct
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+
+EMBEDDING_CACHE_ENABLED = (os.getenv("EMBEDDING_CACHE_ENABLED") or "true").strip().lower() != "false"
+EMBEDDING_CACHE_SQLITE_PATH = (
+    os.getenv("EMBEDDING_CACHE_SQLITE_PATH") or os.path.join(_DATA_DIR, "embedding_cache.sqlite3")
+).strip()
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "250000"))
+# Pruning deletes down to this share of the limit.
+_PRUNE_TO = 0.9
+
+# SQLite caps bound parameters per statement; stay well below it.
+_LOOKUP_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model TEXT NOT NULL,
+    dimensions INTEGER NOT NULL,
+    text_sha256 TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (model, dimensions, text_sha256)
+)
+"""
+_LAST_USED_INDEX = "CREATE INDEX IF NOT EXISTS embedding_cache_last_used ON embedding_cache (last_used_at)"
+
+_sqlite_ready_path: Optional[str] = None
+
+
+@contextlib.contextmanager
+def _connect():
+    """Open the cache database (schema created on first use), commit on success, always close."""
+    global _sqlite_ready_path
+    path = EMBEDDING_CACHE_SQLITE_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    try:
+        if _sqlite_ready_path != path:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(embedding_cache)")}
+            if "last_used_at" not in columns:  # cache created before eviction existed
+                conn.execute("ALTER TABLE embedding_cache ADD COLUMN last_used_at REAL NOT NULL DEFAULT 0")
+                conn.execute("UPDATE embedding_cache SET last_used_at = created_at")
+            conn.execute(_LAST_USED_INDEX)
+            _sqlite_ready_path = path
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def text_digest(text: str) -> str:
+    """sha256 hex digest of the exact text sent to the embedding model."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    """Encode a vector as little-endian float16."""
+    return struct.pack(f"<{len(vector)}e", *vector)
+
+
+def unpack_vector(blob: bytes) -> List[float]:
+    """Decode a float16 BLOB back into python floats."""
+    return list(struct.unpack(f"<{len(blob) // 2}e", blob))
+
+
+def get_cached_embeddings(model: str, dimensions: int, texts: Iterable[str]) -> Dict[str, List[float]]:
+    """
+    Returns map text_sha256 -> vector for the texts already embedded with this model/size.
+    Missing digests were never seen or were evicted (or the cache is disabled/unreadable).
+    """
+    if not EMBEDDING_CACHE_ENABLED:
+        return {}
+    digests = list({text_digest(t) for t in texts})
+    if not digests:
+        return {}
+    out: Dict[str, List[float]] = {}
+    now = time.time()
+    try:
+        with _connect() as conn:
+            for i in range(0, len(digests), _LOOKUP_BATCH):
+                batch = digests[i : i + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    "SELECT text_sha256, vector FROM embedding_cache "
+                    f"WHERE model = ? AND dimensions = ? AND text_sha256 IN ({placeholders})",
+                    (model, int(dimensions), *batch),
+                ).fetchall()
+                for digest, blob in rows:
+                    out[digest] = unpack_vector(blob)
+                if rows:
+                    conn.execute(
+                        "UPDATE embedding_cache SET last_used_at = ? "
+                        f"WHERE model = ? AND dimensions = ? AND text_sha256 IN ({placeholders})",
+                        (now, model, int(dimensions), *batch),
+                    )
+    except Exception as e:
+        logger.warning("Embedding cache read failed: %s", e)
+        return {}
+    return out
+
+
+def put_cached_embeddings(model: str, dimensions: int, vectors_by_text: Dict[str, Sequence[float]]) -> None:
+    """Store freshly created vectors keyed by the text they were computed from."""
+    if not EMBEDDING_CACHE_ENABLED or not vectors_by_text:
+        return
+    now = time.time()
+    rows = [
+        (model, int(dimensions), text_digest(text), pack_vector(vector), now, now)
+        for text, vector in vectors_by_text.items()
+        if vector
+    ]
+    try:
+        with _connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO embedding_cache "
+                "(model, dimensions, text_sha256, vector, created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            _prune(conn)
+    except Exception as e:
+        logger.warning("Embedding cache write failed: %s", e)
+
+
+def _prune(conn: sqlite3.Connection) -> None:
+    """Delete the least recently used rows once the table is over ``EMBEDDING_CACHE_MAX_ROWS``."""
+    if EMBEDDING_CACHE_MAX_ROWS <= 0:
+        return
+    count = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+    if count <= EMBEDDING_CACHE_MAX_ROWS:
+        return
+    excess = count - int(EMBEDDING_CACHE_MAX_ROWS * _PRUNE_TO)
+    conn.execute(
+        "DELETE FROM embedding_cache WHERE rowid IN "
+        "(SELECT rowid FROM embedding_cache ORDER BY last_used_at LIMIT ?)",
+        (excess,),
+    )
+    logger.info("Embedding cache pruned %s least recently used vectors", excess)
@@ -0,0 +1,107 @@
+"""
+Repair the embedding manifest against what Qdrant actually holds for a practice.
+
+Scrolls every point in the practice collection (payload only, no vectors), groups them by
+(patient_id, section_name) and rewrites manifest rows whose hash or point count drifted.
+Rows for sections with no points are removed. A section whose points carry more than one
+hash (interrupted re-embed) is recorded with an empty hash so the next ingest replaces it.
+
+``resync_practice_ingest_state`` runs after a collection is rebuilt or recreated
+(``qdrant_collection_profiles.rebuild_collection``, ``scripts/create_qdrant_collection.py``):
+points an ingest wrote while the copy ran may be missing from the new collection. Besides the
+reconcile it clears the practice's source checkpoints, since those would let the next ingest
+skip a source as unchanged without looking at the manifest.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, Tuple
+
+from app.services.embedding_manifest_store import (
+    delete_section_manifest,
+    load_practice_manifest,
+    save_section_manifest,
+)
+from app.services.source_checkpoint_store import delete_practice_checkpoints
+
+logger = logging.getLogger(__name__)
+
+_SCROLL_PAYLOAD_FIELDS = ["patient_id", "section_name", "patient_hash"]
+
+
+def scan_collection_sections(
+    qdrant_client, collection_name: str, batch_size: int = 1000
+) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Returns map (patient_id, section_name) -> {hashes: set, point_count: int}."""
+    sections: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    offset = None
+    while True:
+        points, offset = qdrant_client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=_SCROLL_PAYLOAD_FIELDS,
+            with_vectors=False,
+        )
+        for point in points:
+            payload = point.payload or {}
+            patient_id = str(payload.get("patient_id") or "")
+            section_name = str(payload.get("section_name") or "")
+            if not patient_id or not section_name:
+                continue
+            agg = sections.setdefault((patient_id, section_name), {"hashes": set(), "point_count": 0})
+            agg["point_count"] += 1
+            if payload.get("patient_hash"):
+                agg["hashes"].add(payload["patient_hash"])
+        if offset is None:
+            return sections
+
+
+def reconcile_practice_manifest(qdrant_client, practice_url: str, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Bring the manifest for one practice (collection) in line with Qdrant.
+    Returns counts: unchanged, added, updated, removed, mixed.
+    """
+    indexed = scan_collection_sections(qdrant_client, practice_url)
+    recorded = load_practice_manifest(practice_url)
+    summary = {"unchanged": 0, "added": 0, "updated": 0, "removed": 0, "mixed": 0}
+
+    for (patient_id, section_name), agg in indexed.items():
+        hashes = agg["hashes"]
+        section_hash = next(iter(hashes)) if len(hashes) == 1 else ""
+        if len(hashes) > 1:
+            summary["mixed"] += 1
+        entry = recorded.get((patient_id, section_name))
+        if entry and entry["section_hash"] == section_hash and entry["point_count"] == agg["point_count"]:
+            summary["unchanged"] += 1
+            continue
+        summary["updated" if entry else "added"] += 1
+        if not dry_run:
+            save_section_manifest(
+                practice_url,
+                patient_id,
+                section_name,
+                section_hash,
+                agg["point_count"],
+                embedded_at=entry["embedded_at"] if entry else None,
+            )
+
+    for patient_id, section_name in recorded.keys() - indexed.keys():
+        summary["removed"] += 1
+        if not dry_run:
+            delete_section_manifest(practice_url, patient_id, section_name)
+
+    logger.info("Embedding manifest reconciled", extra={"practice_url": practice_url, "dry_run": dry_run, **summary})
+    return summary
+
+
+def resync_practice_ingest_state(qdrant_client, practice_url: str) -> Dict[str, int]:
+    """
+    Make ingest trust only what the (rebuilt) collection holds: reconcile the manifest with it
+    and clear the practice's source checkpoints. Each patient's next ingest then fetches every
+    source once and re-embeds exactly the sections whose points are missing or stale.
+    """
+    summary = reconcile_practice_manifest(qdrant_client, practice_url)
+    summary["checkpoints_cleared"] = delete_practice_checkpoints(practice_url)
+    logger.info("Ingest state resynced with collection", extra={"practice_url": practice_url, **summary})
+    return summary
@@ -0,0 +1,247 @@
+"""
+Section-hash manifest: (practice_url, patient_id, section_name) -> section_hash, point_count, embedded_at.
+
+Lets chart ingest decide which sections changed without asking Qdrant for the hash
+stored on existing points. Written by ``PatientDataEmbedder.chunk_and_embed`` after a
+successful upsert; read first by ``get_patient_info``.
+
+Local SQLite by default (``EMBEDDING_MANIFEST_SQLITE_PATH``, default
+``app/data/embedding_manifest.sqlite3``). Set ``EMBEDDING_MANIFEST_DYNAMODB_TABLE`` to use
+DynamoDB instead: partition key ``EMBEDDING_MANIFEST_DYNAMODB_PK`` (default ``practice_url``),
+sort key ``EMBEDDING_MANIFEST_DYNAMODB_SK`` (default ``section_key``) holding
+``<patient_id>#<section_name>``.
+
+``DYNAMODB_REGION`` sets the AWS region for the DynamoDB client (default ``us-west-2``).
+"""
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+import sqlite3
+import time
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+
+EMBEDDING_MANIFEST_SQLITE_PATH = (
+    os.getenv("EMBEDDING_MANIFEST_SQLITE_PATH") or os.path.join(_DATA_DIR, "embedding_manifest.sqlite3")
+).strip()
+EMBEDDING_MANIFEST_DYNAMODB_TABLE = (os.getenv("EMBEDDING_MANIFEST_DYNAMODB_TABLE") or "").strip()
+_DDB_REGION = (os.getenv("DYNAMODB_REGION") or "").strip() or "us-west-2"
+EMBEDDING_MANIFEST_DYNAMODB_PK = (
+    os.getenv("EMBEDDING_MANIFEST_DYNAMODB_PK") or "practice_url"
+).strip() or "practice_url"
+EMBEDDING_MANIFEST_DYNAMODB_SK = (
+    os.getenv("EMBEDDING_MANIFEST_DYNAMODB_SK") or "section_key"
+).strip() or "section_key"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS section_manifest (
+    practice_url TEXT NOT NULL,
+    patient_id TEXT NOT NULL,
+    section_name TEXT NOT NULL,
+    section_hash TEXT NOT NULL,
+    point_count INTEGER NOT NULL DEFAULT 0,
+    embedded_at REAL NOT NULL,
+    PRIMARY KEY (practice_url, patient_id, section_name)
+)
+"""
+
+_dynamodb_table = None
+_sqlite_ready_path: Optional[str] = None
+
+
+def _get_table():
+    global _dynamodb_table
+    if not EMBEDDING_MANIFEST_DYNAMODB_TABLE:
+        return None
+    if _dynamodb_table is not None:
+        return _dynamodb_table
+    try:
+        import boto3  # type: ignore
+
+        resource = boto3.resource("dynamodb", region_name=_DDB_REGION)
+        _dynamodb_table = resource.Table(EMBEDDING_MANIFEST_DYNAMODB_TABLE)
+        return _dynamodb_table
+    except Exception as e:
+        logger.warning("Embedding manifest DynamoDB init failed: %s", e)
+        return None
+
+
+@contextlib.contextmanager
+def _connect():
+    """Open the manifest database (schema created on first use), commit on success, always close."""
+    global _sqlite_ready_path
+    path = EMBEDDING_MANIFEST_SQLITE_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    try:
+        if _sqlite_ready_path != path:
+            # WAL lets several workers read while one writes.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            _sqlite_ready_path = path
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _section_key(patient_id: str, section_name: str) -> str:
+    return f"{patient_id}#{section_name}"
+
+
+def _entry(section_hash: Any, point_count: Any, embedded_at: Any) -> Dict[str, Any]:
+    if isinstance(point_count, Decimal):
+        point_count = int(point_count)
+    if isinstance(embedded_at, Decimal):
+        embedded_at = float(embedded_at)
+    return {
+        "section_hash": str(section_hash or ""),
+        "point_count": int(point_count or 0),
+        "embedded_at": float(embedded_at or 0),
+    }
+
+
+def load_patient_manifest(practice_url: str, patient_id: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns map section_name -> {section_hash, point_count, embedded_at} for one patient.
+    An empty dict means nothing is recorded (callers fall back to Qdrant).
+    """
+    table = _get_table()
+    if table:
+        try:
+            from boto3.dynamodb.conditions import Key  # type: ignore
+
+            prefix = _section_key(patient_id, "")
+            out: Dict[str, Dict[str, Any]] = {}
+            kwargs = {
+                "KeyConditionExpression": Key(EMBEDDING_MANIFEST_DYNAMODB_PK).eq(practice_url)
+                & Key(EMBEDDING_MANIFEST_DYNAMODB_SK).begins_with(prefix),
+            }
+            while True:
+                resp = table.query(**kwargs)
+                for item in resp.get("Items", []):
+                    section_name = str(item.get(EMBEDDING_MANIFEST_DYNAMODB_SK) or "")[len(prefix):]
+                    out[section_name] = _entry(
+                        item.get("section_hash"), item.get("point_count"), item.get("embedded_at")
+                    )
+                last_key = resp.get("LastEvaluatedKey")
+                if not last_key:
+                    return out
+                kwargs["ExclusiveStartKey"] = last_key
+        except Exception as e:
+            logger.warning("Embedding manifest DynamoDB read failed for patient %s: %s", patient_id, e)
+            return {}
+
+    try:
+        with _connect() as conn:
+            rows = conn.execute(
+                "SELECT section_name, section_hash, point_count, embedded_at FROM section_manifest "
+                "WHERE practice_url = ? AND patient_id = ?",
+                (practice_url, patient_id),
+            ).fetchall()
+        return {row[0]: _entry(row[1], row[2], row[3]) for row in rows}
+    except Exception as e:
+        logger.warning("Embedding manifest read failed for patient %s: %s", patient_id, e)
+        return {}
+
+
+def load_practice_manifest(practice_url: str) -> Dict[tuple, Dict[str, Any]]:
+    """Returns map (patient_id, section_name) -> entry for a whole practice (reconciliation)."""
+    out: Dict[tuple, Dict[str, Any]] = {}
+    table = _get_table()
+    if table:
+        from boto3.dynamodb.conditions import Key  # type: ignore
+
+        kwargs = {"KeyConditionExpression": Key(EMBEDDING_MANIFEST_DYNAMODB_PK).eq(practice_url)}
+        while True:
+            resp = table.query(**kwargs)
+            for item in resp.get("Items", []):
+                patient_id, _, section_name = str(item.get(EMBEDDING_MANIFEST_DYNAMODB_SK) or "").partition("#")
+                out[(patient_id, section_name)] = _entry(
+                    item.get("section_hash"), item.get("point_count"), item.get("embedded_at")
+                )
+            last_key = resp.get("LastEvaluatedKey")
+            if not last_key:
+                return out
+            kwargs["ExclusiveStartKey"] = last_key
+
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT patient_id, section_name, section_hash, point_count, embedded_at FROM section_manifest "
+            "WHERE practice_url = ?",
+            (practice_url,),
+        ).fetchall()
+    for row in rows:
+        out[(row[0], row[1])] = _entry(row[2], row[3], row[4])
+    return out
+
+
+def save_section_manifest(
+    practice_url: str,
+    patient_id: str,
+    section_name: str,
+    section_hash: str,
+    point_count: int,
+    embedded_at: Optional[float] = None,
+) -> None:
+    """Upsert one section row; embedded_at defaults to now (epoch seconds)."""
+    embedded_at = time.time() if embedded_at is None else embedded_at
+    table = _get_table()
+    if table:
+        try:
+            table.put_item(
+                Item={
+                    EMBEDDING_MANIFEST_DYNAMODB_PK: practice_url,
+                    EMBEDDING_MANIFEST_DYNAMODB_SK: _section_key(patient_id, section_name),
+                    "section_hash": section_hash,
+                    "point_count": int(point_count),
+                    "embedded_at": Decimal(str(round(embedded_at, 3))),
+                }
+            )
+        except Exception as e:
+            logger.warning("Embedding manifest DynamoDB write failed for patient %s: %s", patient_id, e)
+        return
+
+    try:
+        with _connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO section_manifest "
+                "(practice_url, patient_id, section_name, section_hash, point_count, embedded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (practice_url, patient_id, section_name, section_hash, int(point_count), float(embedded_at)),
+            )
+    except Exception as e:
+        logger.warning("Embedding manifest write failed for patient %s: %s", patient_id, e)
+
+
+def delete_section_manifest(practice_url: str, patient_id: str, section_name: str) -> None:
+    """Drop one section row (its points were deleted or are being replaced)."""
+    table = _get_table()
+    if table:
+        try:
+            table.delete_item(
+                Key={
+                    EMBEDDING_MANIFEST_DYNAMODB_PK: practice_url,
+                    EMBEDDING_MANIFEST_DYNAMODB_SK: _section_key(patient_id, section_name),
+                }
+            )
+        except Exception as e:
+            logger.warning("Embedding manifest DynamoDB delete failed for patient %s: %s", patient_id, e)
+        return
+
+    try:
+        with _connect() as conn:
+            conn.execute(
+                "DELETE FROM section_manifest WHERE practice_url = ? AND patient_id = ? AND section_name = ?",
+                (practice_url, patient_id, section_name),
+            )
+    except Exception as e:
+        logger.warning("Embedding manifest delete failed for patient %s: %s", patient_id, e)
@@ -0,0 +1,237 @@
+"""
+Process-wide Titan embedding service: one pooled Bedrock client, one bounded executor and
+a global, throttle-adaptive cap on in-flight ``invoke_model`` calls.
+
+Created once in the app lifespan (``get_embedding_service`` lazily creates it for scripts and
+tests). Every ingest thread submits through it, so N concurrent sections no longer each
+spin up their own thread pool and burst Bedrock into throttling. ``embed_many`` goes through
+the cross-request micro-batcher (``embedding_batcher.py``) when it is enabled.
+
+Env:
+  EMBEDDING_MODEL — default amazon.titan-embed-text-v2:0
+  EMBEDDING_DIMENSIONS — default 1024
+  EMBEDDING_MAX_WORKERS — executor size and hard concurrency ceiling (default 32)
+  EMBEDDING_INITIAL_CONCURRENCY — starting in-flight limit (default 16)
+  EMBEDDING_MIN_CONCURRENCY — floor the limit never drops below on throttling (default 2)
+  AWS_REGION — Bedrock region (default us-west-2)
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import boto3
+
+from app.services.embedding_batcher import create_batcher
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "amazon.titan-embed-text-v2:0")
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1024"))
+EMBEDDING_MAX_WORKERS = int(os.getenv("EMBEDDING_MAX_WORKERS", "32"))
+EMBEDDING_INITIAL_CONCURRENCY = int(os.getenv("EMBEDDING_INITIAL_CONCURRENCY", "16"))
+EMBEDDING_MIN_CONCURRENCY = int(os.getenv("EMBEDDING_MIN_CONCURRENCY", "2"))
+
+# Bedrock error codes that mean "slow down" rather than "this request is bad".
+_THROTTLE_CODES = {"ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException"}
+
+
+def is_throttling_error(exc: BaseException) -> bool:
+    """True for botocore ClientErrors that signal Bedrock rate limiting."""
+    response = getattr(exc, "response", None) or {}
+    return (response.get("Error") or {}).get("Code") in _THROTTLE_CODES
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on concurrent calls: halve on throttling, +1 after ``increase_after``
+    consecutive successes, always within [minimum, maximum].
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, increase_after: int = 20):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.increase_after = increase_after
+        self.in_flight = 0
+        self.waiting = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> float:
+        """Block until a slot is free; returns seconds spent waiting."""
+        start = time.monotonic()
+        with self._cond:
+            self.waiting += 1
+            try:
+                while self.in_flight >= self.limit:
+                    self._cond.wait()
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+        return time.monotonic() - start
+
+    def release(self, throttled: bool = False) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.increase_after and self.limit < self.maximum:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+class EmbeddingService:
+    """Shared Bedrock Titan embedder; safe to call from any thread."""
+
+    def __init__(
+        self,
+        model: str = EMBEDDING_MODEL,
+        dimensions: int = EMBEDDING_DIMENSIONS,
+        max_workers: int = EMBEDDING_MAX_WORKERS,
+        initial_concurrency: int = EMBEDDING_INITIAL_CONCURRENCY,
+        min_concurrency: int = EMBEDDING_MIN_CONCURRENCY,
+        aws_region: Optional[str] = None,
+        bedrock_client=None,
+    ):
+        self.model = model
+        self.dimensions = dimensions
+        self.bedrock_client = bedrock_client or boto3.client(
+            service_name="bedrock-runtime",
+            region_name=aws_region or os.getenv("AWS_REGION", "us-west-2"),
+            config=boto3.session.Config(max_pool_connections=max_workers),
+        )
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embedding")
+        # Attached by get_embedding_service; None means embed_many fans out directly.
+        self.batcher = None
+        self.limiter = AdaptiveConcurrencyLimiter(initial_concurrency, min_concurrency, max_workers)
+        self._stats_lock = threading.Lock()
+        self._queued = 0
+        self._counters = {"requests": 0, "failed": 0, "throttled": 0}
+        self._wait_seconds = 0.0
+        self._call_seconds = 0.0
+
+    def _invoke(self, text: str) -> List[float]:
+        response = self.bedrock_client.invoke_model(
+            modelId=self.model,
+            body=json.dumps({"inputText": text, "dimensions": self.dimensions, "normalize": True}),
+            contentType="application/json",
+            accept="application/json",
+        )
+        return json.loads(response["body"].read()).get("embedding", [])
+
+    def embed(self, text: str, max_retries: int = 5) -> List[float]:
+        """
+        Embed one text under the global concurrency limit, retrying with exponential
+        backoff. Returns [] when every attempt fails.
+        """
+        delay_seconds = 0.1
+        for attempt in range(1, max_retries + 1):
+            waited = self.limiter.acquire()
+            throttled = False
+            started = time.monotonic()
+            try:
+                embedding = self._invoke(text)
+                if embedding:
+                    return embedding
+            except Exception as e:
+                throttled = is_throttling_error(e)
+                if not throttled:
+                    logger.error(f"Error creating embedding: {e}")
+            finally:
+                self.limiter.release(throttled=throttled)
+                with self._stats_lock:
+                    self._counters["requests"] += 1
+                    self._counters["throttled"] += int(throttled)
+                    self._wait_seconds += waited
+                    self._call_seconds += time.monotonic() - started
+            if attempt < max_retries:
+                wait_time = delay_seconds * (2 ** (attempt - 1))
+                logger.warning(
+                    "Embedding attempt %s/%s failed%s; retrying in %.2fs",
+                    attempt,
+                    max_retries,
+                    " (throttled)" if throttled else "",
+                    wait_time,
+                )
+                time.sleep(wait_time)
+        with self._stats_lock:
+            self._counters["failed"] += 1
+        return []
+
+    def submit(self, text: str, max_retries: int = 5) -> "Future[List[float]]":
+        """Queue one text on the shared executor."""
+        with self._stats_lock:
+            self._queued += 1
+
+        def run():
+            with self._stats_lock:
+                self._queued -= 1
+            return self.embed(text, max_retries=max_retries)
+
+        return self._executor.submit(run)
+
+    def embed_many(self, texts: Sequence[str], max_retries: int = 5) -> List[List[float]]:
+        """
+        Embed texts concurrently; result order matches input ([] for failures).
+        With a batcher attached, texts are merged with other callers' (retries then use
+        the batcher backend's setting).
+        """
+        if self.batcher is not None:
+            return self.batcher.embed_many(texts)
+        futures = [self.submit(text, max_retries=max_retries) for text in texts]
+        return [f.result() for f in futures]
+
+    def stats(self) -> Dict[str, Any]:
+        """Point-in-time queue depth, concurrency and call counters."""
+        with self._stats_lock:
+            requests = self._counters["requests"]
+            return {
+                "model": self.model,
+                "queue_depth": self._queued,
+                "waiting_for_slot": self.limiter.waiting,
+                "in_flight": self.limiter.in_flight,
+                "concurrency_limit": self.limiter.limit,
+                **self._counters,
+                "avg_slot_wait_ms": round(1000 * self._wait_seconds / requests, 2) if requests else 0.0,
+                "avg_call_ms": round(1000 * self._call_seconds / requests, 2) if requests else 0.0,
+                "batcher": self.batcher.stats() if self.batcher is not None else None,
+            }
+
+    def shutdown(self) -> None:
+        if self.batcher is not None:
+            self.batcher.shutdown()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Return the process-wide service, creating it on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = EmbeddingService()
+                _service.batcher = create_batcher(_service)
+    return _service
+
+
+def shutdown_embedding_service() -> None:
+    """Stop the shared executor (app shutdown)."""
+    global _service
+    with _service_lock:
+        if _service is not None:
+            _service.shutdown()
+            _service = None
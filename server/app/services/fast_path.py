@@ -0,0 +1,265 @@
+"""
+Deterministic answers for plain chart lookups, without retrieval or the LLM.
+
+"Current meds?", "allergies", "problem list", "upcoming recalls" need no reasoning: the answer
+is a list from one structured section. ``classify`` recognises these by keyword, and
+``FastPath.answer`` renders the list from the section cached by ``get_patient_info``
+(``structured_sections``) in well under a millisecond:
+
+- a question maps to one or more intents (medications, allergies, problems, recalls) when its
+  words are intent keywords or filler ("what are the patient's current ...")
+- confidence is the share of its content words that are intent keywords; anything more
+  specific ("is he on tamsulosin?", "meds for his BPH", "resolved problems") scores below
+  ``FAST_PATH_MIN_CONFIDENCE`` and goes to the crew
+- a section that is not cached on this worker, or whose hash is not the indexed one, also goes
+  to the crew
+
+Only entries in force are listed: active medication statements, allergies and problems that
+are not resolved or refuted, and recall tasks that are still open (soonest due first).
+Questions, answers and fall-back reasons are counted for ``GET /metrics``.
+
+Env:
+  FAST_PATH_ENABLED — answer plain lookups without the crew (default true)
+  FAST_PATH_MIN_CONFIDENCE — share of content words that must be intent keywords (default 0.75)
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from app.services.structured_sections import STRUCTURED_SECTIONS, StructuredSectionCache, structured_sections
+
+logger = logging.getLogger(__name__)
+
+FAST_PATH_ENABLED = (os.getenv("FAST_PATH_ENABLED") or "true").strip().lower() == "true"
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.75"))
+
+# intent -> (section, keywords)
+INTENTS: Dict[str, Tuple[str, frozenset]] = {
+    "medications": ("medications", frozenset(
+        "medications medication meds med medicines medicine prescriptions prescription rx drugs "
+        "dose doses dosage dosages dosing".split()
+    )),
+    "allergies": ("allergies", frozenset("allergies allergy allergic nkda intolerances intolerance".split())),
+    "problems": ("conditions", frozenset(
+        "problems problem conditions condition diagnoses diagnosis dx pmh comorbidities".split()
+    )),
+    "recalls": ("tasks", frozenset("recalls recall".split())),
+}
+assert {section for section, _ in INTENTS.values()} <= STRUCTURED_SECTIONS
+
+_FILLER = frozenset(
+    "a an the and or any all of on in for to is are was were be what which whats show me give tell "
+    "list lists please patient patients pt pts s his her their he she they them does do did has have "
+    "currently current active known documented recorded chart existing ongoing taking take takes "
+    "upcoming due pending open outstanding scheduled next history medical past".split()
+)
+_WORD = re.compile(r"[a-z0-9]+")
+
+_INACTIVE_MEDICATION = {"stopped", "completed", "entered-in-error", "not-taken", "cancelled", "on-hold"}
+_INACTIVE_CLINICAL = {"inactive", "resolved", "remission"}
+_REFUTED = {"refuted", "entered-in-error"}
+_CLOSED_TASK = {"completed", "cancelled", "rejected", "failed", "entered-in-error"}
+
+_TITLES = {
+    "medications": ("Active medications", "No active medications recorded."),
+    "allergies": ("Allergies", "No active allergies recorded."),
+    "problems": ("Active problems", "No active problems recorded."),
+    "recalls": ("Open recalls", "No open recalls."),
+}
+
+
+@dataclass(frozen=True)
+class Classification:
+    intents: Tuple[str, ...]
+    confidence: float
+
+
+def classify(query: str) -> Classification:
+    """Lookup intents in ``query`` (in INTENTS order) and the share of content words they explain."""
+    content = [w for w in _WORD.findall(query.lower()) if w not in _FILLER]
+    matched = [intent for intent, (_, keywords) in INTENTS.items() if any(w in keywords for w in content)]
+    if not content or not matched:
+        return Classification((), 0.0)
+    explained = sum(1 for w in content if any(w in INTENTS[i][1] for i in matched))
+    return Classification(tuple(matched), round(explained / len(content), 3))
+
+
+def _concept(value: Any) -> str:
+    """Readable text of a CodeableConcept / Coding / Reference (projected or raw FHIR)."""
+    if isinstance(value, list):
+        return next((t for t in (_concept(v) for v in value) if t), "")
+    if not isinstance(value, dict):
+        return str(value) if value else ""
+    if value.get("text"):
+        return str(value["text"])
+    if value.get("display"):
+        return str(value["display"])
+    if value.get("coding"):
+        return _concept(value["coding"])
+    return str(value.get("code") or "")
+
+
+def _status(value: Any) -> str:
+    return _concept(value).strip().lower()
+
+
+def _date(value: Any) -> str:
+    return str(value)[:10] if value else ""
+
+
+def _resources(section: Any, resource_type: str) -> List[Dict[str, Any]]:
+    entries = section.get("entry") or [] if isinstance(section, dict) else []
+    return [
+        e["resource"] for e in entries
+        if isinstance(e, dict) and isinstance(e.get("resource"), dict)
+        and e["resource"].get("resourceType") == resource_type
+    ]
+
+
+def _medication_lines(section: Any) -> List[str]:
+    lines = []
+    for med in _resources(section, "MedicationStatement"):
+        if _status(med.get("status")) in _INACTIVE_MEDICATION:
+            continue
+        name = _concept(med.get("medicationCodeableConcept")) or _concept(med.get("medicationReference"))
+        if not name:
+            continue
+        dosage = "; ".join(d.get("text", "") for d in med.get("dosage") or [] if isinstance(d, dict) and d.get("text"))
+        since = _date(med.get("effectiveDateTime") or (med.get("effectivePeriod") or {}).get("start"))
+        lines.append(name + (f" — {dosage}" if dosage else "") + (f" (since {since})" if since else ""))
+    return lines
+
+
+def _allergy_lines(section: Any) -> List[str]:
+    lines = []
+    for allergy in _resources(section, "AllergyIntolerance"):
+        if _status(allergy.get("clinicalStatus")) in _INACTIVE_CLINICAL or _status(allergy.get("verificationStatus")) in _REFUTED:
+            continue
+        substance = _concept(allergy.get("code"))
+        if not substance:
+            continue
+        reactions = [
+            _concept(m) for r in allergy.get("reaction") or [] if isinstance(r, dict) for m in r.get("manifestation") or []
+        ]
+        criticality = _status(allergy.get("criticality"))
+        detail = ", ".join(dict.fromkeys(r for r in reactions if r))
+        lines.append(
+            substance + (f": {detail}" if detail else "") + (f" ({criticality} criticality)" if criticality == "high" else "")
+        )
+    return lines
+
+
+def _problem_lines(section: Any) -> List[str]:
+    lines = []
+    for condition in _resources(section, "Condition"):
+        if (
+            _status(condition.get("clinicalStatus")) in _INACTIVE_CLINICAL
+            or _status(condition.get("verificationStatus")) in _REFUTED
+            or condition.get("abatementDateTime")
+        ):
+            continue
+        name = _concept(condition.get("code"))
+        if not name:
+            continue
+        onset = _date(condition.get("onsetDateTime") or (condition.get("onsetPeriod") or {}).get("start"))
+        lines.append(name + (f" (since {onset})" if onset else ""))
+    return lines
+
+
+def _recall_lines(section: Any) -> List[str]:
+    recalls = []
+    for task in _resources(section, "Task"):
+        if _status(task.get("status")) in _CLOSED_TASK:
+            continue
+        what = task.get("description") or _concept(task.get("reasonCode")) or _concept(task.get("code")) or "Recall"
+        due = _date(
+            (task.get("executionPeriod") or {}).get("start")
+            or ((task.get("restriction") or {}).get("period") or {}).get("end")
+        )
+        recalls.append((due or "9999", str(what) + (f" — due {due}" if due else "")))
+    return [line for _, line in sorted(recalls)]
+
+
+_RENDERERS: Dict[str, Callable[[Any], List[str]]] = {
+    "medications": _medication_lines,
+    "allergies": _allergy_lines,
+    "problems": _problem_lines,
+    "recalls": _recall_lines,
+}
+
+
+def render(intent: str, section: Any) -> str:
+    title, empty = _TITLES[intent]
+    lines = _RENDERERS[intent](section)
+    if not lines:
+        return empty
+    return f"{title} ({len(lines)}):\n" + "\n".join(f"- {line}" for line in lines)
+
+
+class FastPath:
+    """Classifier + renderers over ``structured_sections``, with hit-rate counters."""
+
+    def __init__(
+        self,
+        sections: StructuredSectionCache = structured_sections,
+        min_confidence: float = FAST_PATH_MIN_CONFIDENCE,
+        enabled: bool = FAST_PATH_ENABLED,
+    ):
+        self.sections = sections
+        self.min_confidence = min_confidence
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {"questions": 0, "answered": 0, "no_intent": 0, "low_confidence": 0, "section_unavailable": 0}
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self._counters["questions"] += 1
+            self._counters[outcome] += 1
+
+    def answer(
+        self, practice_url: str, patient_id: str, manifest: Mapping[str, Mapping[str, Any]], query: str
+    ) -> Optional[str]:
+        """
+        The rendered answer, or None when the question should go to the crew. ``manifest`` is the
+        patient's embedding manifest; a section is used only if its cached hash matches it.
+        """
+        if not self.enabled:
+            return None
+        intent = classify(query)
+        if not intent.intents:
+            self._count("no_intent")
+            return None
+        if intent.confidence < self.min_confidence:
+            self._count("low_confidence")
+            return None
+        parts = []
+        for name in intent.intents:
+            section_name = INTENTS[name][0]
+            section_hash = str((manifest.get(section_name) or {}).get("section_hash") or "")
+            section = self.sections.get(practice_url, patient_id, section_name, section_hash) if section_hash else None
+            if section is None:
+                self._count("section_unavailable")
+                return None
+            parts.append(render(name, section))
+        self._count("answered")
+        logger.info("Fast-path answer", extra={"patient_id": patient_id, "intents": list(intent.intents)})
+        return "\n\n".join(parts)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            questions = self._counters["questions"]
+            return {
+                "enabled": self.enabled,
+                "min_confidence": self.min_confidence,
+                **self._counters,
+                "hit_rate": round(self._counters["answered"] / questions, 4) if questions else 0.0,
+                "sections": self.sections.stats(),
+            }
+
+
+fast_path = FastPath()
@@ -0,0 +1,124 @@
+"""
+Pre-fetch change detection for chart sections.
+
+Before downloading a section, ``plan_skipped_sources`` asks ModMed two ``_summary=count``
+questions against the checkpoint stored after the last complete ingest
+(``source_checkpoint_store``):
+
+- ``_lastUpdated=gt<checked_since>`` — anything created or edited since then?
+- no filter — did the searchset size change (catches deletions)?
+
+Zero updates and an unchanged total skip the section (and, for ``document_references``,
+every document download). Anything else — no checkpoint, section no longer in the manifest,
+a failed or unsupported count request — fetches it as before. The decision and its reason
+are logged for every section, so a returning patient's re-ingest is a couple of count
+requests per section.
+
+``checked_since`` is the fetch start minus ``FHIR_CHECKPOINT_SKEW_SECONDS``, so edits that
+land while a chart is being fetched are seen by the next ingest.
+
+Env:
+  FHIR_PRECHECK_ENABLED — default true
+  FHIR_CHECKPOINT_SKEW_SECONDS — default 300
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+FHIR_PRECHECK_ENABLED = (os.getenv("FHIR_PRECHECK_ENABLED") or "true").strip().lower() != "false"
+FHIR_CHECKPOINT_SKEW_SECONDS = int(os.getenv("FHIR_CHECKPOINT_SKEW_SECONDS", "300"))
+
+Getter = Callable[[str, Optional[dict]], Awaitable[Any]]
+
+
+def checkpoint_since(started_at: float, skew_seconds: int = FHIR_CHECKPOINT_SKEW_SECONDS) -> str:
+    """FHIR instant (UTC) to store for a fetch that started at ``started_at``."""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(started_at - skew_seconds))
+
+
+def count_url(url: str, since: Optional[str] = None) -> str:
+    """The search as ``_summary=count``, optionally limited to ``_lastUpdated=gt<since>``."""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in ("_sort", "_count")]
+    query.append(("_summary", "count"))
+    if since:
+        query.append(("_lastUpdated", f"gt{since}"))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def source_total(body: Dict[str, Any]) -> int:
+    """Size of a fetched source: the searchset total, or 1 for a single resource."""
+    if body.get("resourceType") != "Bundle":
+        return 1
+    total = body.get("total")
+    return total if isinstance(total, int) else len(body.get("entry") or [])
+
+
+def _count(resp: Any) -> Optional[int]:
+    if isinstance(resp, Exception) or getattr(resp, "status_code", None) != 200:
+        return None
+    try:
+        total = resp.json().get("total")
+    except Exception:
+        return None
+    return total if isinstance(total, int) else None
+
+
+async def precheck_source(
+    get: Getter,
+    url: str,
+    headers: Optional[dict],
+    checkpoint: Optional[Dict[str, Any]],
+    indexed: bool,
+) -> Tuple[bool, str]:
+    """Return (skip, reason) for one source."""
+    if not FHIR_PRECHECK_ENABLED:
+        return False, "disabled"
+    if not checkpoint:
+        return False, "no_checkpoint"
+    if not indexed:
+        return False, "not_indexed"
+    updated_resp, total_resp = await asyncio.gather(
+        get(count_url(url, checkpoint["checked_since"]), headers),
+        get(count_url(url), headers),
+    )
+    updated, total = _count(updated_resp), _count(total_resp)
+    if updated is None or total is None:
+        return False, "precheck_failed"
+    if updated:
+        return False, f"updated:{updated}"
+    if total != checkpoint["total"]:
+        return False, f"count_changed:{checkpoint['total']}->{total}"
+    return True, "unchanged"
+
+
+async def plan_skipped_sources(
+    get: Getter,
+    check_urls: Dict[str, str],
+    headers: Optional[dict],
+    checkpoints: Dict[str, Dict[str, Any]],
+    indexed: Dict[str, bool],
+    patient_id: str,
+) -> Set[str]:
+    """Pre-check every source concurrently; returns the ones to skip and logs each decision."""
+    names = list(check_urls)
+    decisions = await asyncio.gather(*(
+        precheck_source(get, check_urls[name], headers, checkpoints.get(name), indexed.get(name, False))
+        for name in names
+    ))
+    skipped = set()
+    for name, (skip, reason) in zip(names, decisions):
+        if skip:
+            skipped.add(name)
+        logger.info(
+            "Section pre-check",
+            extra={"patient_id": patient_id, "section": name, "decision": "skip" if skip else "fetch", "reason": reason},
+        )
+    return skipped
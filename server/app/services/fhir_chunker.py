@@ -0,0 +1,182 @@
+"""
+Structure-aware chunking of FHIR sections for embedding.
+
+A section (``[{section_name: data}]`` as queued by ``get_patient_info``) is cut along FHIR
+resource boundaries instead of by characters:
+
+- Bundles: one unit per ``entry.resource``; small resources are packed together up to
+  ``FHIR_CHUNK_MAX_TOKENS``, so a medication or encounter is never split across chunks unless
+  it alone exceeds the budget. Bundles are fetched newest first, so packing starts from the
+  oldest entry (the end): a new record only changes the head chunk, and the other chunk ids
+  stay the same for the embedder's diff. Text within a chunk keeps bundle order.
+  A Bundle without entries yields no chunk: there is nothing to search, and the embedder
+  deletes the section's old points and records it with no points.
+- Single resources (``Patient``): one unit.
+- Documents: PDF text is packed by paragraph, parsed XML by child of the root element, each
+  chunk starting with the document's title / type / date lines for context.
+
+A unit over the budget is split on line boundaries (the resource heading repeated on each
+piece). There is no blind overlap between chunks. Token counts are whitespace words, the same
+estimate stored as ``token_count`` on points.
+
+Env:
+  FHIR_CHUNK_MAX_TOKENS — packing budget per chunk (default 350)
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Iterable, List, Sequence
+
+FHIR_CHUNK_MAX_TOKENS = int(os.getenv("FHIR_CHUNK_MAX_TOKENS", "350"))
+
+_EMPTY = (None, "", [], {})
+
+# Document fields repeated at the top of each of its chunks.
+_DOC_CONTEXT = ("title", "contentType", "creation")
+
+
+def count_tokens(text: str) -> int:
+    return len(text.split())
+
+
+def _flatten(title: str, content: Any, lines: List[str], indent: int = 0) -> None:
+    prefix = "  " * indent
+    lines.append(f"{prefix}{title.upper()}")
+    if isinstance(content, dict):
+        for k, v in content.items():
+            if v in _EMPTY:
+                continue
+            k_fmt = k.replace("_", " ").title()
+            if isinstance(v, (dict, list)):
+                _flatten(k_fmt, v, lines, indent + 1)
+            else:
+                lines.append(f"{prefix}  {k_fmt}: {v}")
+    elif isinstance(content, list):
+        for i, item in enumerate(content, 1):
+            if isinstance(item, dict):
+                _flatten(f"{title} Item {i}", item, lines, indent + 1)
+            else:
+                lines.append(f"{prefix}  - {item}")
+    else:
+        lines.append(f"{prefix}  {content}")
+
+
+def render_lines(title: str, content: Any) -> List[str]:
+    """Plain-text lines for one value, in the indented ``TITLE / Key: value`` layout."""
+    lines: List[str] = []
+    _flatten(title, content, lines)
+    return lines
+
+
+def _split_words(line: str, max_tokens: int) -> List[str]:
+    words = line.split()
+    return [" ".join(words[i:i + max_tokens]) for i in range(0, len(words), max_tokens)] or [line]
+
+
+def _split_unit(lines: List[str], max_tokens: int) -> List[str]:
+    """
+    Cut an oversized unit on line boundaries (words for over-long lines), repeating its
+    heading line on every piece when the first line is a short heading.
+    """
+    heading: List[str] = [lines[0]] if count_tokens(lines[0]) <= max_tokens // 4 else []
+    body = lines[len(heading):]
+    budget = max(1, max_tokens - count_tokens("\n".join(heading)))
+    pieces: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for line in body:
+        for part in _split_words(line, budget) if count_tokens(line) > budget else [line]:
+            n = count_tokens(part)
+            if current and current_tokens + n > budget:
+                pieces.append("\n".join([*heading, *current]))
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += n
+    if current or not pieces:
+        pieces.append("\n".join([*heading, *current]))
+    return pieces
+
+
+def pack_units(
+    units: Iterable[List[str]],
+    max_tokens: int = FHIR_CHUNK_MAX_TOKENS,
+    prefix: Sequence[str] = (),
+    from_end: bool = False,
+) -> List[str]:
+    """
+    Greedily pack rendered units (lists of lines) into chunks of at most ``max_tokens``.
+    ``prefix`` lines (e.g. a document's title) start every chunk and count toward the budget.
+    With ``from_end`` packing starts at the last unit, so chunk boundaries are anchored to the
+    end and units added at the front only change the first chunk; order is unchanged.
+    """
+    budget = max(1, max_tokens - count_tokens("\n".join(prefix)))
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append("\n".join([*prefix, *(reversed(current) if from_end else current)]))
+            current, current_tokens = [], 0
+
+    for lines in (reversed(list(units)) if from_end else units):
+        if not lines:
+            continue
+        text = "\n".join(lines)
+        n = count_tokens(text)
+        if n > budget:
+            flush()
+            pieces = ["\n".join([*prefix, piece]) for piece in _split_unit(lines, budget)]
+            chunks.extend(reversed(pieces) if from_end else pieces)
+            continue
+        if current_tokens + n > budget:
+            flush()
+        current.append(text)
+        current_tokens += n
+    flush()
+    return chunks[::-1] if from_end else chunks
+
+
+def _resources(data: Any) -> List[Any]:
+    if isinstance(data, dict) and data.get("resourceType") == "Bundle":
+        return [e["resource"] for e in data.get("entry") or [] if e.get("resource") not in _EMPTY]
+    if isinstance(data, list):
+        return [item for item in data if item not in _EMPTY]
+    return [data]
+
+
+def _document_chunks(title: str, doc: dict, max_tokens: int) -> List[str]:
+    prefix = [title.upper()] + [f"  {k.title()}: {doc[k]}" for k in _DOC_CONTEXT if doc.get(k)]
+    if doc.get("content_text"):
+        paragraphs = [p.strip() for p in doc["content_text"].split("\n\n") if p.strip()]
+        units = [["  " + line for line in p.splitlines()] for p in paragraphs]
+    elif isinstance(doc.get("content_xml"), dict):
+        units = []
+        for key, value in doc["content_xml"].items():
+            if isinstance(value, dict):
+                # Root XML element (e.g. ClinicalDocument): one unit per child element.
+                units.extend(render_lines(f"{key} {k}", v) for k, v in value.items() if v not in _EMPTY)
+            elif value not in _EMPTY:
+                units.append(render_lines(key, value))
+    else:
+        rest = {k: v for k, v in doc.items() if k not in _DOC_CONTEXT and v not in _EMPTY}
+        units = [render_lines("Content", rest)] if rest else []
+    return pack_units(units, max_tokens, prefix=prefix) or ["\n".join(prefix)]
+
+
+def chunk_section(patient_data: List[dict], max_tokens: int = FHIR_CHUNK_MAX_TOKENS) -> List[str]:
+    """Chunk texts for one queued section along FHIR resource / document boundaries."""
+    chunks: List[str] = []
+    for section in patient_data:
+        for key, value in section.items():
+            if value in _EMPTY:
+                continue
+            title = key.title()
+            if isinstance(value, dict) and ("content_text" in value or "content_xml" in value):
+                chunks.extend(_document_chunks(title, value, max_tokens))
+            else:
+                chunks.extend(
+                    pack_units((render_lines(title, r) for r in _resources(value)), max_tokens, from_end=True)
+                )
+    return chunks
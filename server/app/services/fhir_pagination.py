@@ -0,0 +1,279 @@
+"""
+Complete retrieval of paged FHIR searchsets for chart sections.
+
+ModMed returns search results as Bundles with a ``next`` link; following only the first page
+silently truncated long-standing patients. ``fetch_all_pages`` returns one merged Bundle per
+section:
+
+- Search URLs ask for ``_count=FHIR_PAGE_SIZE`` and ``_sort=-_lastUpdated`` (newest first).
+  A server that answers the first page with a client error (e.g. it does not support
+  ``_sort``) is asked once more with the caller's ``plain_url``; that searchset is unsorted, so
+  the lookback does not apply to it.
+- When the first page carries ``total`` and its ``next`` link pages by offset/page number,
+  the remaining page URLs are derived and fetched ``FHIR_PAGE_CONCURRENCY`` at a time;
+  otherwise ``next`` links are followed one by one.
+- At most ``FHIR_MAX_PAGES`` pages per section (``FHIR_SECTION_MAX_PAGES`` overrides per
+  section). A page that fails ends the section with what was fetched so far.
+- With ``FHIR_LOOKBACK_DAYS`` set, paging stops at the first page whose resources are all
+  older than the horizon (newest-first ordering makes every later page older still). List
+  sections (``LOOKBACK_EXEMPT_SECTIONS``: medications, allergies, problems, recalls) are always
+  fetched in full: their long-standing entries are still in force, and the fast path states
+  absences from them.
+- Merged entries are ordered newest first by their clinical date, so chunks and answers
+  lead with recent care.
+
+All requests go through the caller's ``get(url, headers)`` (``limited_get``), which returns
+the response or the exception raised.
+
+Env:
+  FHIR_PAGE_SIZE — ``_count`` per page (default 100; 0 leaves it to the server)
+  FHIR_MAX_PAGES — page cap per section (default 20)
+  FHIR_SECTION_MAX_PAGES — per-section caps, e.g. ``document_references=5,encounters=40``
+  FHIR_PAGE_CONCURRENCY — pages in flight per section (default 4)
+  FHIR_LOOKBACK_DAYS — stop paging past this age (default 0 = fetch everything up to the cap)
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_caps(raw: str) -> Dict[str, int]:
+    caps: Dict[str, int] = {}
+    for item in raw.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip().isdigit():
+            caps[name.strip()] = int(value)
+    return caps
+
+
+FHIR_PAGE_SIZE = int(os.getenv("FHIR_PAGE_SIZE", "100"))
+FHIR_MAX_PAGES = int(os.getenv("FHIR_MAX_PAGES", "20"))
+FHIR_PAGE_CONCURRENCY = max(1, int(os.getenv("FHIR_PAGE_CONCURRENCY", "4")))
+FHIR_LOOKBACK_DAYS = int(os.getenv("FHIR_LOOKBACK_DAYS", "0"))
+# Each DocumentReference page fans out to a download per attachment.
+FHIR_SECTION_MAX_PAGES = {"document_references": 5, **_parse_caps(os.getenv("FHIR_SECTION_MAX_PAGES", ""))}
+
+# Sections whose old entries are current (an allergy recorded in 2009); never cut by the lookback.
+LOOKBACK_EXEMPT_SECTIONS = frozenset({"medications", "allergies", "conditions", "tasks"})
+
+# Query parameters a next link may page by: offset-style, then 1-based page numbers.
+_OFFSET_PARAMS = ("_getpagesoffset", "_offset", "offset")
+_PAGE_PARAMS = ("_page", "page")
+
+# Clinical date of a resource, first match wins.
+_DATE_PATHS = (
+    ("period", "start"),
+    ("effectiveDateTime",),
+    ("effectivePeriod", "start"),
+    ("issued",),
+    ("recordedDate",),
+    ("onsetDateTime",),
+    ("authoredOn",),
+    ("dateAsserted",),
+    ("date",),
+)
+
+Getter = Callable[[str, Optional[dict]], Awaitable[Any]]
+
+# Client errors a retry without _sort/_count cannot fix.
+_NOT_PARAMETER_ERRORS = frozenset({401, 403, 404, 429})
+
+
+def max_pages_for(section: str) -> int:
+    return FHIR_SECTION_MAX_PAGES.get(section, FHIR_MAX_PAGES)
+
+
+def lookback_days_for(section: str) -> int:
+    return 0 if section in LOOKBACK_EXEMPT_SECTIONS else FHIR_LOOKBACK_DAYS
+
+
+def search_url(url: str, page_size: int = FHIR_PAGE_SIZE) -> str:
+    """Add newest-first sorting and the page size to a search URL (existing params win)."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    present = {k for k, _ in query}
+    if "_sort" not in present:
+        query.append(("_sort", "-_lastUpdated"))
+    if page_size > 0 and "_count" not in present:
+        query.append(("_count", str(page_size)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def resource_date(resource: Dict[str, Any]) -> str:
+    """ISO date/dateTime the resource is about ("" when none is recorded)."""
+    for path in _DATE_PATHS:
+        value: Any = resource
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, str) and value:
+            return value
+    return ""
+
+
+def _updated(resource: Dict[str, Any]) -> str:
+    meta = resource.get("meta")
+    return (meta.get("lastUpdated") if isinstance(meta, dict) else None) or resource_date(resource)
+
+
+def _older_than(entries: List[Dict[str, Any]], horizon: str) -> bool:
+    """True when every entry is dated and all are before ``horizon`` (YYYY-MM-DD)."""
+    dates = [_updated(e.get("resource") or {}) for e in entries]
+    return bool(dates) and all(d and d[:10] < horizon for d in dates)
+
+
+def _next_link(bundle: Dict[str, Any]) -> Optional[str]:
+    for link in bundle.get("link") or []:
+        if link.get("relation") == "next" and link.get("url"):
+            return link["url"]
+    return None
+
+
+def _page_urls(first_url: str, next_url: str, pages: int) -> Optional[List[str]]:
+    """URLs of pages 2..``pages`` derived from the next link, or None if it is not offset/page based."""
+    next_parts = urlsplit(next_url)
+    next_query = parse_qsl(next_parts.query, keep_blank_values=True)
+    first_query = dict(parse_qsl(urlsplit(first_url).query))
+    for name in (*_OFFSET_PARAMS, *_PAGE_PARAMS):
+        value = dict(next_query).get(name)
+        if value is None or not value.isdigit():
+            continue
+        start = first_query.get(name)
+        start = int(start) if start and start.isdigit() else (0 if name in _OFFSET_PARAMS else 1)
+        step = int(value) - start
+        if step <= 0:
+            return None
+        urls = []
+        for k in range(1, pages):
+            query = [(key, str(start + k * step) if key == name else v) for key, v in next_query]
+            urls.append(urlunsplit(next_parts._replace(query=urlencode(query))))
+        return urls
+    return None
+
+
+def _bundle(resp: Any) -> Optional[Dict[str, Any]]:
+    if isinstance(resp, Exception) or getattr(resp, "status_code", None) != 200:
+        return None
+    try:
+        data = resp.json()
+    except Exception:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+async def fetch_all_pages(
+    get: Getter,
+    url: str,
+    headers: Optional[dict],
+    section: str,
+    max_pages: Optional[int] = None,
+    concurrency: int = FHIR_PAGE_CONCURRENCY,
+    lookback_days: Optional[int] = None,
+    outcome: Optional[Dict[str, Any]] = None,
+    plain_url: Optional[str] = None,
+) -> Any:
+    """
+    Fetch ``url`` and, for a Bundle, every following page into one Bundle (entries newest
+    first, ``link`` dropped). A non-Bundle body (e.g. ``Patient/{id}``) is returned as is.
+    When the first request fails its response or exception is returned unchanged so the
+    caller can log it.
+
+    ``plain_url`` is the search without the parameters ``search_url`` added; it is retried once
+    when the server rejects ``url`` with a client error.
+
+    ``outcome``, when given, is filled with ``pages``, ``stopped`` (None, "horizon" or
+    "error") and ``truncated`` (page cap hit before the end of the searchset).
+    """
+    max_pages = max_pages or max_pages_for(section)
+    lookback_days = lookback_days_for(section) if lookback_days is None else lookback_days
+    first = await get(url, headers)
+    status = getattr(first, "status_code", None)
+    if (
+        plain_url and plain_url != url and isinstance(status, int)
+        and 400 <= status < 500 and status not in _NOT_PARAMETER_ERRORS
+    ):
+        logger.warning(
+            "FHIR server rejected the sorted/paged search; retrying the plain search",
+            extra={"section": section, "status_code": status},
+        )
+        url, lookback_days = plain_url, 0  # unsorted: a page of old entries says nothing about the next
+        first = await get(url, headers)
+    data = _bundle(first)
+    if data is None:
+        return first
+    if data.get("resourceType") != "Bundle":
+        if outcome is not None:
+            outcome.update(pages=1, stopped=None, truncated=False)
+        return data
+
+    horizon = (
+        (datetime.now(timezone.utc) - timedelta(days=lookback_days)).date().isoformat() if lookback_days > 0 else None
+    )
+    entries: List[Dict[str, Any]] = list(data.get("entry") or [])
+    pages = 1
+    stop = "horizon" if horizon and _older_than(entries, horizon) else None
+    next_url = None if stop else _next_link(data)
+
+    total = data.get("total")
+    urls = None
+    if next_url and isinstance(total, int) and entries:
+        urls = _page_urls(url, next_url, min(max_pages, math.ceil(total / len(entries))))
+
+    if urls is not None:
+        for start in range(0, len(urls), concurrency):
+            responses = await asyncio.gather(*(get(u, headers) for u in urls[start:start + concurrency]))
+            for resp in responses:
+                page = _bundle(resp)
+                if page is None:
+                    stop = "error"
+                    break
+                page_entries = page.get("entry") or []
+                if horizon and _older_than(page_entries, horizon):
+                    stop = "horizon"
+                    break
+                entries.extend(page_entries)
+                pages += 1
+            if stop:
+                break
+        truncated = not stop and isinstance(total, int) and len(entries) < total and pages >= max_pages
+    else:
+        seen = {url}
+        while next_url and next_url not in seen and pages < max_pages:
+            seen.add(next_url)
+            page = _bundle(await get(next_url, headers))
+            if page is None:
+                stop = "error"
+                break
+            page_entries = page.get("entry") or []
+            if horizon and _older_than(page_entries, horizon):
+                stop = "horizon"
+                break
+            entries.extend(page_entries)
+            pages += 1
+            next_url = _next_link(page)
+        truncated = not stop and bool(next_url) and pages >= max_pages
+
+    if outcome is not None:
+        outcome.update(pages=pages, stopped=stop, truncated=truncated)
+    if stop == "error":
+        logger.warning("FHIR page fetch failed; section kept partial", extra={"section": section, "pages": pages})
+    elif truncated:
+        logger.warning("FHIR section truncated at page cap", extra={"section": section, "pages": pages, "total": total})
+    if pages > 1 or stop:
+        logger.info(
+            "FHIR section paged",
+            extra={"section": section, "pages": pages, "entries": len(entries), "total": total, "stopped": stop},
+        )
+
+    # Stable: entries without a date keep server order, after the dated ones.
+    entries.sort(key=lambda e: resource_date(e.get("resource") or {}), reverse=True)
+    merged = {k: v for k, v in data.items() if k != "link"}
+    merged["entry"] = entries
+    return merged
@@ -0,0 +1,175 @@
+"""
+Projection of FHIR sections down to clinically meaningful fields before hashing and embedding.
+
+``clean_patient_resource`` only drops ``meta``/``id``/``fullUrl``/``link``; everything else
+(coding system URLs, reference strings, extensions, narrative XHTML, identifiers) used to be
+embedded. The projection keeps display text, values, dates and status:
+
+- Per resource type, ``RESOURCE_FIELDS`` lists the top-level fields kept (types not listed
+  keep every field that survives the generic rules).
+- Resource metadata (``RESOURCE_DROP_KEYS``: ``meta``, ``language``, ...) is removed from the
+  resource itself only, so nested elements of the same name (``Patient.communication.language``,
+  the patient's interpreter need) survive.
+- Generic rules apply at every depth: ``DROP_KEYS`` are removed (including attachment
+  ``data``), terminology ``system`` URIs are dropped, a Coding keeps ``display`` (``code``
+  only when there is no display), a Reference keeps ``display`` only, and the generated
+  narrative (``text.div``) is dropped.
+- Parsed CCDA XML in documents drops schema/identifier attributes (``@codeSystem``,
+  ``@root``, ``templateId`` ...) and keeps ``@displayName``/``@value``/``@unit``/``#text``.
+
+Because the projected structure is what gets hashed, enabling or changing the projection
+re-embeds each section once. ``scripts/report_projection_savings.py`` reports the token
+reduction on sample bundles.
+
+Env:
+  FHIR_PROJECTION_ENABLED — default true
+  FHIR_PROJECTION_CONFIG_PATH — optional JSON ``{"ResourceType": ["field", ...]}`` merged
+    over ``RESOURCE_FIELDS`` (an empty list keeps every field of that type)
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+FHIR_PROJECTION_ENABLED = (os.getenv("FHIR_PROJECTION_ENABLED") or "true").strip().lower() != "false"
+FHIR_PROJECTION_CONFIG_PATH = (os.getenv("FHIR_PROJECTION_CONFIG_PATH") or "").strip()
+
+# Removed from the resource root only.
+RESOURCE_DROP_KEYS = frozenset({"meta", "implicitRules", "language", "contained"})
+
+# Removed wherever they appear.
+DROP_KEYS = frozenset({
+    "id", "fullUrl", "link", "search", "request", "response",
+    "extension", "modifierExtension", "identifier",
+    "version", "userSelected", "reference", "url", "uri", "data",
+})
+
+# Top-level fields kept per resource type (resourceType itself is always kept).
+RESOURCE_FIELDS: Dict[str, List[str]] = {
+    "Patient": ["name", "gender", "birthDate", "deceasedBoolean", "deceasedDateTime", "maritalStatus",
+                "address", "telecom", "communication", "generalPractitioner", "active"],
+    "Encounter": ["status", "class", "type", "serviceType", "priority", "period", "reasonCode", "diagnosis",
+                  "participant", "location", "hospitalization", "serviceProvider"],
+    "MedicationStatement": ["status", "medicationCodeableConcept", "medicationReference", "effectiveDateTime",
+                            "effectivePeriod", "dateAsserted", "dosage", "reasonCode", "note", "statusReason"],
+    "AllergyIntolerance": ["clinicalStatus", "verificationStatus", "type", "category", "criticality", "code",
+                           "onsetDateTime", "recordedDate", "reaction", "note"],
+    "Condition": ["clinicalStatus", "verificationStatus", "category", "severity", "code", "bodySite",
+                  "onsetDateTime", "onsetPeriod", "onsetString", "abatementDateTime", "recordedDate", "stage", "note"],
+    "FamilyMemberHistory": ["status", "relationship", "sex", "ageAge", "ageString", "deceasedBoolean",
+                            "condition", "note"],
+    "DiagnosticReport": ["status", "category", "code", "effectiveDateTime", "effectivePeriod", "issued",
+                         "result", "conclusion", "conclusionCode", "presentedForm"],
+    "Observation": ["status", "category", "code", "effectiveDateTime", "effectivePeriod", "issued",
+                    "valueQuantity", "valueCodeableConcept", "valueString", "valueBoolean", "valueInteger",
+                    "valueRange", "valueRatio", "valuePeriod", "valueDateTime", "interpretation",
+                    "referenceRange", "component", "note", "bodySite"],
+    "Task": ["status", "intent", "priority", "code", "description", "authoredOn", "lastModified",
+             "executionPeriod", "restriction", "note", "businessStatus", "reasonCode"],
+}
+
+# CCDA attributes/elements that carry no clinical content.
+_XML_DROP_KEYS = frozenset({
+    "@codeSystem", "@codeSystemName", "@codeSystemVersion", "@root", "@extension", "@assigningAuthorityName",
+    "@classCode", "@moodCode", "@typeCode", "@contextConductionInd", "@contextControlCode", "@nullFlavor",
+    "@use", "@xsi:type", "@ID", "templateId", "typeId", "realmCode", "id", "reference", "sdtc:raceCode",
+})
+
+_resource_fields: Optional[Dict[str, List[str]]] = None
+
+
+def _fields_by_type() -> Dict[str, List[str]]:
+    global _resource_fields
+    if _resource_fields is None:
+        fields = dict(RESOURCE_FIELDS)
+        if FHIR_PROJECTION_CONFIG_PATH:
+            try:
+                with open(FHIR_PROJECTION_CONFIG_PATH) as f:
+                    fields.update(json.load(f))
+            except Exception as e:
+                logger.warning("FHIR projection config %s ignored: %s", FHIR_PROJECTION_CONFIG_PATH, e)
+        _resource_fields = fields
+    return _resource_fields
+
+
+def _is_empty(value: Any) -> bool:
+    return value in (None, "", [], {})
+
+
+def _project_value(value: Any) -> Any:
+    if isinstance(value, list):
+        items = [_project_value(v) for v in value]
+        return [v for v in items if not _is_empty(v)]
+    if not isinstance(value, dict):
+        return value
+    if "system" in value and "value" not in value and ("code" in value or "display" in value):
+        # Coding: the display is what a reader needs; keep the bare code only as a fallback.
+        return {"display": value["display"]} if value.get("display") else {"code": value.get("code")}
+    if isinstance(value.get("div"), str) and set(value) <= {"status", "div"}:
+        return None  # generated narrative XHTML
+    out = {}
+    for k, v in value.items():
+        if k in DROP_KEYS or (k == "system" and isinstance(v, str) and ":" in v):
+            continue
+        projected = _project_value(v)
+        if not _is_empty(projected):
+            out[k] = projected
+    return out
+
+
+def project_resource(resource: Dict[str, Any]) -> Dict[str, Any]:
+    """Clinically meaningful subset of one FHIR resource."""
+    resource_type = resource.get("resourceType")
+    keep = _fields_by_type().get(resource_type)
+    selected = {
+        k: v for k, v in resource.items() if k not in RESOURCE_DROP_KEYS and (not keep or k in keep)
+    }
+    projected = _project_value(selected) or {}
+    if resource_type:
+        projected = {"resourceType": resource_type, **projected}
+    return projected
+
+
+def _project_xml(value: Any) -> Any:
+    if isinstance(value, list):
+        items = [_project_xml(v) for v in value]
+        return [v for v in items if not _is_empty(v)]
+    if not isinstance(value, dict):
+        return value
+    out = {}
+    for k, v in value.items():
+        if k in _XML_DROP_KEYS or k.startswith("@xmlns"):
+            continue
+        projected = _project_xml(v)
+        if not _is_empty(projected):
+            out[k] = projected
+    return out
+
+
+def project_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Document entries keep title/type/date and text; parsed CCDA XML is stripped of boilerplate."""
+    if isinstance(doc.get("content_xml"), (dict, list)):
+        return {**doc, "content_xml": _project_xml(doc["content_xml"])}
+    return doc
+
+
+def project_section(section_data: Any) -> Any:
+    """Project a fetched section (Bundle, single resource or document) when enabled."""
+    if not FHIR_PROJECTION_ENABLED or not isinstance(section_data, dict):
+        return section_data
+    if "content_text" in section_data or "content_xml" in section_data:
+        return project_document(section_data)
+    if section_data.get("resourceType") == "Bundle":
+        entries = [
+            {"resource": project_resource(e["resource"])}
+            for e in section_data.get("entry") or []
+            if isinstance(e.get("resource"), dict)
+        ]
+        return {"resourceType": "Bundle", "entry": entries}
+    if section_data.get("resourceType"):
+        return project_resource(section_data)
+    return section_data
@@ -0,0 +1,223 @@
+"""
+Background chart-ingestion jobs (in-process).
+
+``get_patient_info`` runs as an asyncio task per (practice_url, patient_id). Repeated asks
+for a patient whose ingest is still queued/running attach to the same job instead of
+starting another. Each job exposes status, progress events and per-section timings so
+``/run_crew`` can answer against what is already indexed, wait with a deadline, or attach
+to a job started earlier (e.g. when the patient was opened). ``stream_job_events`` replays
+and follows a job's events as Server-Sent Events for ``GET /ingest/{job_id}/events``.
+
+Finished jobs are kept for lookup up to ``INGESTION_JOB_HISTORY`` (default 500) per process.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.models import SessionUser
+from app.services.patient_info_service import get_patient_info
+
+logger = logging.getLogger(__name__)
+
+INGESTION_JOB_HISTORY = int(os.getenv("INGESTION_JOB_HISTORY", "500"))
+INGESTION_EVENTS_HEARTBEAT_SECONDS = float(os.getenv("INGESTION_EVENTS_HEARTBEAT_SECONDS", "15"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# section_embedded counters summed into job.progress.
+_SECTION_TOTALS = ("chunks", "embedded", "cache_hits", "upserted")
+
+
+@dataclass
+class IngestionJob:
+    practice_url: str
+    patient_id: str
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"  # queued | running | succeeded | failed
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Dict[str, Any] = field(default_factory=dict)
+    section_timings: Dict[str, float] = field(default_factory=dict)
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    error: Optional[str] = None
+    error_status: Optional[int] = None
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+    changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status not in ACTIVE_STATUSES
+
+    def __call__(self, stage: str, **data: Any) -> None:
+        """Progress callback handed to get_patient_info."""
+        self.progress["stage"] = stage
+        if stage == "section_embedded":
+            self.section_timings[data["section"]] = data["seconds"]
+            self.progress["sections_done"] = self.progress.get("sections_done", 0) + 1
+            for key in _SECTION_TOTALS:
+                if key in data:
+                    self.progress[key] = self.progress.get(key, 0) + data[key]
+        else:
+            self.progress.update(data)
+        self.events.append({"stage": stage, "at": time.time(), **data})
+        self.notify()
+
+    def notify(self) -> None:
+        """Wake every stream waiting on this job (a fresh Event is armed for the next change)."""
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "patient_id": self.patient_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": dict(self.progress),
+            "section_timings": dict(self.section_timings),
+            "error": self.error,
+        }
+
+
+class IngestionJobRegistry:
+    """Event-loop-local registry; all methods must be called from the app's loop."""
+
+    def __init__(self, history: int = INGESTION_JOB_HISTORY):
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._active: Dict[Tuple[str, str], IngestionJob] = {}
+        self._history = history
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self._jobs.get(job_id)
+
+    def active_for(self, practice_url: str, patient_id: str) -> Optional[IngestionJob]:
+        return self._active.get((practice_url, patient_id))
+
+    def start(
+        self,
+        practice_url: str,
+        patient_id: str,
+        runner: Callable[[IngestionJob], Awaitable[Any]],
+    ) -> IngestionJob:
+        """Return the patient's running job, or start ``runner(job)`` as a new one."""
+        existing = self.active_for(practice_url, patient_id)
+        if existing:
+            return existing
+
+        job = IngestionJob(practice_url=practice_url, patient_id=patient_id)
+        self._jobs[job.job_id] = job
+        self._active[(practice_url, patient_id)] = job
+        self._trim()
+        job.task = asyncio.create_task(self._run(job, runner))
+        return job
+
+    async def _run(self, job: IngestionJob, runner: Callable[[IngestionJob], Awaitable[Any]]) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        job.notify()
+        try:
+            await runner(job)
+            job.status = "succeeded"
+        except HTTPException as e:
+            job.status = "failed"
+            job.error, job.error_status = str(e.detail), e.status_code
+        except Exception:
+            logger.exception("Ingestion job failed", extra={"job_id": job.job_id, "patient_id": job.patient_id})
+            job.status = "failed"
+            job.error, job.error_status = "Failed to process patient data", 500
+        finally:
+            job.finished_at = time.time()
+            self._active.pop((job.practice_url, job.patient_id), None)
+            job.notify()
+            logger.info(
+                "Ingestion job finished",
+                extra={"job_id": job.job_id, "patient_id": job.patient_id, "status": job.status,
+                       "seconds": round(job.finished_at - job.started_at, 3)},
+            )
+
+    async def wait(self, job: IngestionJob, timeout: Optional[float] = None) -> bool:
+        """Wait for the job up to ``timeout`` seconds; True when it finished."""
+        if job.done or job.task is None:
+            return job.done
+        try:
+            await asyncio.wait_for(asyncio.shield(job.task), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return job.done
+
+    def _trim(self) -> None:
+        while len(self._jobs) > self._history:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if not oldest.done:
+                break
+            self._jobs.pop(oldest_id)
+
+
+ingestion_jobs = IngestionJobRegistry()
+
+
+def start_patient_ingestion(current_user: SessionUser, patient_id: str) -> IngestionJob:
+    """Start (or join) the background chart ingest for one patient in the user's practice."""
+
+    async def runner(job: IngestionJob):
+        await get_patient_info(
+            patient_id,
+            modmed_token=current_user.modmed_access_token,
+            practice_url=current_user.practice_url,
+            practice_api_key=current_user.practice_api_key,
+            user_qdrant_tool=current_user.qdrant_tool,
+            progress=job,
+        )
+
+    return ingestion_jobs.start(current_user.practice_url, patient_id, runner)
+
+
+def sse_message(event_id: int, event: str, data: Dict[str, Any]) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_job_events(
+    job: IngestionJob,
+    start: int = 0,
+    heartbeat: float = INGESTION_EVENTS_HEARTBEAT_SECONDS,
+) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for one job: every progress event from index ``start`` on (``id`` is
+    the event index, so a reconnect with ``Last-Event-ID`` resumes), then a final ``done``
+    event carrying ``to_dict()``. Comment lines keep idle connections open.
+    """
+    cursor = max(0, start)
+    while True:
+        # Arm the waiter before reading so a change between the read and the wait is not lost.
+        changed = job.changed
+        while cursor < len(job.events):
+            yield sse_message(cursor, "progress", job.events[cursor])
+            cursor += 1
+        if job.done:
+            yield sse_message(cursor, "done", job.to_dict())
+            return
+        try:
+            await asyncio.wait_for(changed.wait(), timeout=heartbeat)
+        except asyncio.TimeoutError:
+            yield ": keep-alive\n\n"
+
+
+def get_practice_job(current_user: SessionUser, job_id: str) -> IngestionJob:
+    """Look up a job the user's practice owns, else 404."""
+    job = ingestion_jobs.get(job_id)
+    if not job or job.practice_url != current_user.practice_url:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
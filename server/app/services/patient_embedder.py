@@ -1,38 +1,54 @@
 import os
 import uuid
-import json
 import logging
+import threading
 import time
-import boto3
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.docstore.document import Document
 from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from qdrant_client.models import (
+    FieldCondition,
+    Filter,
+    MatchValue,
+    PointIdsList,
+    PointStruct,
+    SetPayload,
+    SetPayloadOperation,
+)
+
+from app.services.embedding_cache import get_cached_embeddings, put_cached_embeddings, text_digest
+from app.services.embedding_manifest_store import save_section_manifest
+from app.services.embedding_service import EmbeddingService, get_embedding_service
+from app.services.fhir_chunker import FHIR_CHUNK_MAX_TOKENS, chunk_section
+from app.services.sparse_vectors import SPARSE_VECTOR_NAME, collection_has_sparse, document_sparse_vector
 
 logger = logging.getLogger(__name__)
 
+# Namespace for deterministic chunk point ids (uuid5). Changing it orphans every stored point.
+CHUNK_ID_NAMESPACE = uuid.UUID("5d7c3f1e-8a46-4f0b-9a51-2c1e6b0d9e47")
+
+
+def chunk_point_id(patient_id: str, section_name: str, chunk_text: str) -> str:
+    """Stable point id for one chunk: the same text in the same section always maps to the same point."""
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{patient_id}:{section_name}:{text_digest(chunk_text)}"))
+
+
 class PatientDataEmbedder:
     @staticmethod
     def _count_tokens(text):
         # Simple token count: split on whitespace (for rough estimate)
         # For more accuracy, use a tokenizer for your embedding model
         return len(text.split())
-    def __init__(self, qdrant_url: str, qdrant_api_key: str = None, aws_region: str = "us-west-2"):
+    def __init__(self, qdrant_url: str, qdrant_api_key: str = None, embedding_service: EmbeddingService = None):
         """
         Initialize the patient data embedder
         
         Args:
             qdrant_url: Qdrant cluster URL
             qdrant_api_key: Qdrant API key (optional for local)
-            aws_region: AWS region for Bedrock (default: us-west-2)
+            embedding_service: Shared Bedrock embedding service (default: process-wide one)
         """
-        # Initialize AWS Bedrock client
-        self.bedrock_client = boto3.client(
-            service_name='bedrock-runtime',
-            region_name=aws_region,
-            config=boto3.session.Config(max_pool_connections=100)
-        )
+        # Bedrock client, executor and concurrency limit are shared process-wide
+        self.embedding_service = embedding_service or get_embedding_service()
         
         # Initialize Qdrant client with HTTPS/TLS enforcement
         self.qdrant_client = QdrantClient(
@@ -42,139 +58,212 @@ class PatientDataEmbedder:
             timeout=30
         )
         
-        # Initialize text splitter for JSON content
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", ", ", " "]
+        # Chunks follow FHIR resource boundaries, packed up to this many tokens
+        self.chunk_max_tokens = FHIR_CHUNK_MAX_TOKENS
+
+        self.embedding_model = self.embedding_service.model
+        self.embedding_dimensions = self.embedding_service.dimensions
+
+    def _chunk(self, patient_data):
+        """Split patient data into chunks for embedding along FHIR resource boundaries"""
+        return [
+            Document(page_content=text)
+            for text in chunk_section(patient_data, max_tokens=self.chunk_max_tokens)
+        ]
+
+    def _section_point_ids(self, collection_name: str, patient_id: str, section_name: str) -> set:
+        """Ids of every point currently stored for a patient's section (no payloads or vectors)."""
+        section_filter = Filter(
+            must=[
+                FieldCondition(key="patient_id", match=MatchValue(value=patient_id)),
+                FieldCondition(key="section_name", match=MatchValue(value=section_name)),
+            ]
         )
+        ids = set()
+        offset = None
+        while True:
+            records, offset = self.qdrant_client.scroll(
+                collection_name=collection_name,
+                scroll_filter=section_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            ids.update(str(r.id) for r in records)
+            if offset is None:
+                return ids
 
-        self.embedding_model = "amazon.titan-embed-text-v2:0"
+    def _supports_sparse(self, collection_name: str) -> bool:
+        try:
+            return collection_has_sparse(self.qdrant_client, collection_name)
+        except Exception as e:
+            logger.warning(f"Could not read sparse vector config of {collection_name}; storing dense only: {e}")
+            return False
 
-    def _json_to_text(self, patient_data):
-        """
-        Convert JSON patient data into a plain text string optimized for embedding.
+    def chunk_and_embed(self, patient_data, patient_section, patient_id, patient_hash, collection_name: str, max_retries=5, replace_existing=False, stats=None):
         """
-        lines = []
-
-        def flatten_content(title, content, indent=0):
-            prefix = "  " * indent
-            heading = f"{prefix}{title.upper()}"
-            lines.append(heading)
-
-            if isinstance(content, dict):
-                for k, v in content.items():
-                    if v not in (None, "", [], {}):
-                        k_fmt = k.replace("_", " ").title()
-                        if isinstance(v, (dict, list)):
-                            flatten_content(k_fmt, v, indent + 1)
-                        else:
-                            lines.append(f"{prefix}  {k_fmt}: {v}")
-            elif isinstance(content, list):
-                for i, item in enumerate(content, 1):
-                    if isinstance(item, dict):
-                        flatten_content(f"{title} Item {i}", item, indent + 1)
-                    else:
-                        lines.append(f"{prefix}  - {item}")
-            else:
-                lines.append(f"{prefix}  {content}")
+        Parallel chunking and embedding process with retry logic.
 
-        # flatten each section
-        for section in patient_data:
-            for key, value in section.items():
-                if value not in (None, "", [], {}):
-                    flatten_content(key.title(), value)
+        Point ids are derived from (patient, section, chunk text), so when
+        ``replace_existing`` is set the section is diffed against what Qdrant holds:
+        only new chunks are embedded and upserted, vanished chunks are deleted, and
+        unchanged chunks just get their ``patient_hash``/``chunk_index`` payload updated.
 
-        return "\n".join(lines).strip()
+        Chunks whose exact text was embedded before (by any worker) are served from the
+        embedding cache; only unseen chunks are sent to Bedrock.
 
-    def _chunk(self, patient_data):
-        """Split patient data into chunks for embedding"""
-        patient_content = self._json_to_text(patient_data)
+        After a successful write the section is recorded in the embedding manifest
+        (collection name == practice) so the next ingest can skip it without Qdrant.
+        Returns the number of points the section now has in Qdrant; 0 with ``stats["chunks"]``
+        set to 0 means the section is empty (not a failure).
 
-        doc = Document(
-            page_content=patient_content,
+        ``stats``, when given, is filled with chunk/embed/upsert counts and per-stage seconds
+        (``chunk_s``, ``embed_s``, ``upsert_s``) for progress reporting.
+        """
+        stats = {} if stats is None else stats
+        started = time.monotonic()
+        target_collection = collection_name
+        chunks = []
+        chunk_indexes = {}
+        for i, chunk in enumerate(self._chunk(patient_data)):
+            point_id = chunk_point_id(patient_id, patient_section, chunk.page_content)
+            if point_id not in chunk_indexes:
+                chunk_indexes[point_id] = i
+                chunks.append((point_id, i, chunk))
+
+        existing_ids = (
+            self._section_point_ids(target_collection, patient_id, patient_section) if replace_existing else set()
         )
+        new_chunks = [(point_id, i, chunk) for point_id, i, chunk in chunks if point_id not in existing_ids]
+        kept_ids = [point_id for point_id, _, _ in chunks if point_id in existing_ids]
+        vanished_ids = list(existing_ids - chunk_indexes.keys())
 
-        chunks = self.text_splitter.split_documents([doc])
-        
-        return chunks
+        points = []
+        stats["chunk_s"] = round(time.monotonic() - started, 3)
+        started = time.monotonic()
 
-    def _embed(self, text):
-        """
-        Create embeddings using Amazon Titan Text Embeddings v2 through AWS Bedrock
-        """
-        try:
-            request_body = {
-                "inputText": text,
-                "dimensions": 1024,  
-                "normalize": True  
-            }
-
-            response = self.bedrock_client.invoke_model(
-                modelId=self.embedding_model,
-                body=json.dumps(request_body),
-                contentType='application/json',
-                accept='application/json'
+        cached = get_cached_embeddings(
+            self.embedding_model, self.embedding_dimensions, (c.page_content for _, _, c in new_chunks)
+        )
+
+        # Collections with the sparse vector get BM25 weights next to the dense vector (hybrid search).
+        with_sparse = bool(new_chunks) and self._supports_sparse(target_collection)
+
+        def to_point(point_id, chunk, i, embedding):
+            vector = embedding
+            if with_sparse:
+                vector = {"": embedding, SPARSE_VECTOR_NAME: document_sparse_vector(chunk.page_content)}
+            return PointStruct(
+                id=point_id,
+                vector=vector,
+                payload={
+                    "patient_text": chunk.page_content,
+                    "section_name": patient_section,
+                    "patient_id": patient_id,
+                    "patient_hash": patient_hash,
+                    "chunk_index": i,
+                    "chunk_length": len(chunk.page_content),
+                    "token_count": self._count_tokens(chunk.page_content)
+                }
             )
-            
-            response_body = json.loads(response['body'].read())
-            embedding = response_body.get('embedding', [])
-            
-            return embedding
-            
-        except Exception as e:
-            logger.error(f"Error creating embedding: {e}")
-            return []
 
-    def chunk_and_embed(self, patient_data, patient_section, patient_id, patient_hash, collection_name: str, max_retries=5):
-        """Parallel chunking and embedding process with retry logic."""
-        target_collection = collection_name
-        chunks = self._chunk(patient_data)
-        points = []
-        max_workers = 13
-
-        def embed_with_retry(chunk, i):
-            retries = 0
-            delay_seconds = 0.1
-            while retries < max_retries:
-                token_count = self._count_tokens(chunk.page_content)
-                embedding = self._embed(chunk.page_content)
+        misses = []
+        for point_id, i, chunk in new_chunks:
+            embedding = cached.get(text_digest(chunk.page_content))
+            if embedding:
+                points.append(to_point(point_id, chunk, i, embedding))
+            else:
+                misses.append((point_id, i, chunk))
+
+        fresh = {}
+        if misses:
+            # Retries, backoff and the global throttle-aware concurrency limit live in the service.
+            embeddings = self.embedding_service.embed_many(
+                [chunk.page_content for _, _, chunk in misses], max_retries=max_retries
+            )
+            for (point_id, i, chunk), embedding in zip(misses, embeddings):
                 if embedding:
-                    return PointStruct(
-                        id=str(uuid.uuid4()),
-                        vector=embedding,
-                        payload={
-                            "patient_text": chunk.page_content,
-                            "section_name": patient_section,
-                            "patient_id": patient_id,
-                            "patient_hash": patient_hash,
-                            "chunk_index": i,
-                            "chunk_length": len(chunk.page_content),
-                            "token_count": token_count
-                        }
-                    )
+                    fresh[chunk.page_content] = embedding
+                    points.append(to_point(point_id, chunk, i, embedding))
                 else:
-                    retries += 1
-                    wait_time = delay_seconds * (2 ** (retries - 1))  # exponential backoff
-                    logger.error(f"Failed to create embedding for chunk {i+1}, retry {retries}/{max_retries}. Waiting {wait_time:.2f}s.")
-                    time.sleep(wait_time)
-            return None
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_index = {executor.submit(embed_with_retry, chunk, i): i for i, chunk in enumerate(chunks)}
-            for future in as_completed(future_to_index):
-                result = future.result()
-                if result:
-                    points.append(result)
-
-        if points:
-            try:
+                    logger.error(f"Failed to create embedding for chunk {i+1} after {max_retries} attempts.")
+            put_cached_embeddings(self.embedding_model, self.embedding_dimensions, fresh)
+
+        stats.update(
+            chunks=len(chunks), cache_hits=len(new_chunks) - len(misses), embedded=len(fresh),
+            embed_s=round(time.monotonic() - started, 3),
+        )
+        started = time.monotonic()
+        logger.info(
+            "Section chunks embedded",
+            extra={"section_name": patient_section, "chunks": len(chunks), "kept": len(kept_ids),
+                   "added": len(points), "removed": len(vanished_ids),
+                   "cache_hits": len(new_chunks) - len(misses), "embedded": len(fresh)},
+        )
+
+        if chunks and not points and not kept_ids:
+            logger.error("No points to store - all embeddings failed")
+            return 0
+        # No chunks at all (the section became empty): its old points are deleted below and the
+        # manifest records the new hash with no points, like any other successful write.
+
+        try:
+            # Upsert first so a failure never leaves the section with fewer points than before.
+            if points:
                 self.qdrant_client.upsert(
                     collection_name=target_collection,
                     points=points
                 )
-            except Exception as e:
-                logger.error(f"Error storing points in Qdrant: {e}")
-        else:
-            logger.error("No points to store - all embeddings failed")
+            if vanished_ids:
+                self.qdrant_client.delete(
+                    collection_name=target_collection,
+                    points_selector=PointIdsList(points=vanished_ids),
+                )
+            if kept_ids:
+                self.qdrant_client.batch_update_points(
+                    collection_name=target_collection,
+                    update_operations=[
+                        SetPayloadOperation(
+                            set_payload=SetPayload(
+                                payload={"patient_hash": patient_hash, "chunk_index": chunk_indexes[point_id]},
+                                points=[point_id],
+                            )
+                        )
+                        for point_id in kept_ids
+                    ],
+                )
+        except Exception as e:
+            logger.error(f"Error storing points in Qdrant: {e}")
+            return 0
+
+        point_count = len(points) + len(kept_ids)
+        stats.update(upserted=len(points), removed=len(vanished_ids), upsert_s=round(time.monotonic() - started, 3))
+        save_section_manifest(target_collection, patient_id, patient_section, patient_hash, point_count)
+        return point_count
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_patient_embedder() -> PatientDataEmbedder:
+    """Process-wide embedder (one Qdrant client, shared embedding service), created on first use."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = PatientDataEmbedder(
+                    qdrant_url=os.getenv("QDRANT_URL"),
+                    qdrant_api_key=os.getenv("QDRANT_API_KEY"),
+                )
+    return _embedder
+
+
+def close_patient_embedder() -> None:
+    """Release the shared Qdrant client (app shutdown)."""
+    global _embedder
+    with _embedder_lock:
+        if _embedder is not None:
+            _embedder.qdrant_client.close()
+            _embedder = None
@@ -1,6 +1,6 @@
 import httpx
 import asyncio
-import os
+import time
 import json
 import hashlib
 import xmltodict
@@ -9,8 +9,17 @@ from io import BytesIO
 
 import pdfplumber
 
+from app.services.answer_cache import answer_cache
+from app.services.ccda_extractor import extract_ccda_text
 from app.services.client_service import client
-from app.services.patient_embedder import PatientDataEmbedder
+from app.services.embedding_manifest_store import load_patient_manifest, save_section_manifest
+from app.services.fast_path import fast_path
+from app.services.fhir_change_detection import checkpoint_since, plan_skipped_sources, source_total
+from app.services.fhir_pagination import fetch_all_pages, search_url
+from app.services.fhir_projection import project_section
+from app.services.patient_embedder import get_patient_embedder
+from app.services.source_checkpoint_store import load_source_checkpoints, save_source_checkpoint
+from app.services.structured_sections import STRUCTURED_SECTIONS, structured_sections
 from fastapi import HTTPException
 import logging
 
@@ -90,17 +99,83 @@ def clean_patient_data(patient_data):
     
     return cleaned_data
 
-def hash_patient_data(patient_data):
-    """Create a hash of patient data for change detection"""
-    cleaned_data = clean_patient_data(patient_data)
-    normalized_objects = [
-        json.dumps(obj, sort_keys=True, separators=(',', ':'))
-        for obj in cleaned_data
-    ]
+_METADATA_KEYS = frozenset({'meta', 'id', 'fullUrl', 'link'})
+_ENTRY_METADATA_KEYS = frozenset({'fullUrl'})
+
+# Same output as json.dumps(obj, sort_keys=True, separators=(',', ':')), C encoder.
+_canonical_json = json.JSONEncoder(sort_keys=True, separators=(',', ':')).encode
+
+
+def _without(obj, keys):
+    """Shallow view of a dict minus ``keys`` (values are shared, nothing is deep-copied)."""
+    return {k: v for k, v in obj.items() if k not in keys}
+
+
+def _update_bundle_hash(hasher, bundle, clean=True):
+    """
+    Feed a Bundle to ``hasher`` one entry at a time, in canonical key order. ``clean`` skips
+    metadata keys the way ``clean_patient_data`` does for a top-level Bundle; a Bundle inside a
+    ``{section_name: bundle}`` wrapper is hashed as is (``clean_patient_data`` leaves it alone).
+    """
+    hasher.update(b"{")
+    keys = sorted(k for k in bundle if not clean or k not in _METADATA_KEYS)
+    for n, key in enumerate(keys):
+        if n:
+            hasher.update(b",")
+        hasher.update(_canonical_json(key).encode("utf-8") + b":")
+        value = bundle[key]
+        if key != "entry" or not isinstance(value, list):
+            hasher.update(_canonical_json(value).encode("utf-8"))
+            continue
+        hasher.update(b"[")
+        for i, entry in enumerate(value):
+            if i:
+                hasher.update(b",")
+            if clean and isinstance(entry, dict):
+                entry = _without(entry, _ENTRY_METADATA_KEYS)
+                if isinstance(entry.get("resource"), dict):
+                    entry["resource"] = _without(entry["resource"], _METADATA_KEYS)
+            hasher.update(_canonical_json(entry).encode("utf-8"))
+        hasher.update(b"]")
+    hasher.update(b"}")
+
+
+def _is_bundle(value):
+    return isinstance(value, dict) and value.get("resourceType") == "Bundle"
+
 
-    patient_text = "[" + ",".join(normalized_objects) + "]"
+def hash_patient_data(patient_data):
+    """
+    Create a hash of patient data for change detection.
 
-    return hashlib.sha256(patient_text.encode("utf-8")).hexdigest()
+    Equal to sha256 of the compact, key-sorted JSON of ``clean_patient_data(patient_data)``,
+    but streamed: metadata keys are skipped through shallow views instead of deep copies, and
+    each item is fed to an incremental sha256 as it is encoded, a Bundle one entry at a time.
+    That includes the Bundle in the ``[{section_name: bundle}]`` shape ingest queues.
+    """
+    hasher = hashlib.sha256(b"[")
+    for i, item in enumerate(patient_data):
+        if i:
+            hasher.update(b",")
+        if _is_bundle(item):
+            _update_bundle_hash(hasher, item)
+            continue
+        item = _without(item, _METADATA_KEYS)
+        if not any(_is_bundle(v) for v in item.values()):
+            hasher.update(_canonical_json(item).encode("utf-8"))
+            continue
+        hasher.update(b"{")
+        for n, key in enumerate(sorted(item)):
+            if n:
+                hasher.update(b",")
+            hasher.update(_canonical_json(key).encode("utf-8") + b":")
+            if _is_bundle(item[key]):
+                _update_bundle_hash(hasher, item[key], clean=False)
+            else:
+                hasher.update(_canonical_json(item[key]).encode("utf-8"))
+        hasher.update(b"}")
+    hasher.update(b"]")
+    return hasher.hexdigest()
 
 
 # Rate limiter (max concurrent requests)
@@ -115,11 +190,18 @@ async def limited_get(client: httpx.AsyncClient, url: str, headers: dict = None)
         except Exception as e:
             return e
 
-async def get_patient_info(id: str, modmed_token: str = None, practice_url: str = None, practice_api_key: str = None, user_qdrant_tool = None):
+async def get_patient_info(id: str, modmed_token: str = None, practice_url: str = None, practice_api_key: str = None, user_qdrant_tool = None, progress = None):
     """
     Fetch patient information from Modmed endpoints and process for embedding storage.
     Requires user authentication - no fallback to service credentials.
+
+    ``progress`` is an optional ``progress(stage, **data)`` callback (see ingestion_jobs)
+    invoked as sections are fetched, queued and embedded.
     """
+    def report(stage, **data):
+        if progress:
+            progress(stage, **data)
+
     try:
         # Require user-provided token, practice URL, API key, and qdrant tool
         if not modmed_token:
@@ -155,34 +237,89 @@ async def get_patient_info(id: str, modmed_token: str = None, practice_url: str
             "document_references": f"{base_url}/DocumentReference?patient={id}",
         }
 
-        # --- Parallel fetch all sections using global client ---
-        tasks = {name: limited_get(client, url, headers) for name, url in section_urls.items()}
+        def get(url, headers):
+            return limited_get(client, url, headers)
+
+        fetch_started = time.time()
+
+        # The manifest answers "what hash is indexed for this section?" locally, so
+        # unchanged charts never touch Qdrant. Sections missing from it (ingested
+        # before the manifest existed, or lost) fall back to Qdrant and are backfilled.
+        manifest = await asyncio.to_thread(load_patient_manifest, practice_url, id)
+        checkpoints = await asyncio.to_thread(load_source_checkpoints, practice_url, id)
+
+        # Sections unchanged since the last complete ingest are not downloaded at all.
+        # Documents are indexed under their titles, so any non-section manifest row counts.
+        indexed = {
+            name: (checkpoints.get(name, {}).get("total") == 0)
+            or (name in manifest if name != "document_references" else any(k not in section_urls for k in manifest))
+            for name in section_urls
+        }
+        check_urls = {**section_urls, "patient": f"{base_url}/Patient?_id={id}"}
+        skipped = await plan_skipped_sources(get, check_urls, headers, checkpoints, indexed, id)
+        # Unchanged list sections this worker holds no copy of are fetched anyway, for the fast path.
+        cache_structured = fast_path.enabled and structured_sections.max_entries > 0
+        for name in skipped & STRUCTURED_SECTIONS if cache_structured else ():
+            section_hash = (manifest.get(name) or {}).get("section_hash")
+            if section_hash and not structured_sections.has(practice_url, id, name, section_hash):
+                skipped.discard(name)
+                logger.info("Section pre-check", extra={"patient_id": id, "section": name, "decision": "fetch",
+                                                        "reason": "structured_cache_miss"})
+        timings = {"precheck_s": round(time.time() - fetch_started, 3)}
+
+        # --- Parallel fetch all changed sections (every page of each search) using global client ---
+        outcomes = {name: {} for name in section_urls if name not in skipped}
+        tasks = {
+            name: fetch_all_pages(
+                get, url if name == "patient" else search_url(url), headers, name,
+                outcome=outcomes[name], plain_url=url,
+            )
+            for name, url in section_urls.items()
+            if name not in skipped
+        }
         responses = await asyncio.gather(*tasks.values(), return_exceptions=True)
 
         results = {}
         doc_entries = []
+        # Sources fetched completely: name -> total, checkpointed once everything is indexed.
+        complete_sources = {}
 
         for name, resp in zip(tasks.keys(), responses):
-            if isinstance(resp, Exception) or resp.status_code != 200:
+            # A merged body is a dict; otherwise the failed first response or exception.
+            if not isinstance(resp, dict):
                 if name == "document_references":
                     logger.error(f"DocumentReference API Error: {resp.status_code if hasattr(resp, 'status_code') else 'Exception'} - {resp.text[:200] if hasattr(resp, 'text') else str(resp)[:200]}")
                 continue
 
+            if outcomes[name].get("stopped") != "error":
+                complete_sources[name] = source_total(resp)
             if name == "document_references":
-                doc_data = resp.json()
-                doc_entries = doc_data.get("entry", [])
+                doc_entries = resp.get("entry", [])
             else:
-                results[name] = resp.json()
+                results[name] = resp
+
+        timings["fetch_s"] = round(time.time() - fetch_started, 3)
+        report(
+            "sections_fetched",
+            sections_fetched=len(results),
+            sections_skipped=len(skipped),
+            document_references=len(doc_entries),
+            seconds=timings["fetch_s"],
+        )
 
         if doc_entries:
+            docs_started = time.monotonic()
+            parse_s = 0.0
             doc_urls = [entry.get("fullUrl") for entry in doc_entries if entry.get("fullUrl")]
             doc_tasks = [limited_get(client, url, headers) for url in doc_urls]
             doc_responses = await asyncio.gather(*doc_tasks, return_exceptions=True)
 
             all_file_info = []
             doc_jsons = []
+            files = []
             for doc_resp in doc_responses:
                 if not isinstance(doc_resp, httpx.Response) or doc_resp.status_code != 200:
+                    complete_sources.pop("document_references", None)
                     continue
                 doc_json = doc_resp.json()
                 doc_jsons.append(doc_json)
@@ -197,9 +334,9 @@ async def get_patient_info(id: str, modmed_token: str = None, practice_url: str
                 all_file_tasks = [limited_get(client, url) for url, _, _ in all_file_info]
                 all_file_responses = await asyncio.gather(*all_file_tasks, return_exceptions=True)
 
-                files = []
                 for (url, attachment, doc_json), file_resp in zip(all_file_info, all_file_responses):
                     if not isinstance(file_resp, httpx.Response) or file_resp.status_code != 200:
+                        complete_sources.pop("document_references", None)
                         # Use robust title fallback
                         title = (
                             attachment.get("title") or
@@ -244,6 +381,7 @@ async def get_patient_info(id: str, modmed_token: str = None, practice_url: str
                         "file"
                     )
 
+                    parse_started = time.monotonic()
                     if content_type == "application/pdf":
                         file_bytes = file_resp.content
                         # Use raw bytes for PDF parsing
@@ -255,22 +393,28 @@ async def get_patient_info(id: str, modmed_token: str = None, practice_url: str
                             "creation": attachment.get("creation")
                         })
                     elif content_type == "application/xml":
-                        xml_text = file_resp.text
-                        xml_parsed = await asyncio.to_thread(parse_xml_blocking, xml_text)
+                        # C-CDA: stream out the section narratives only.
+                        ccda_text = await asyncio.to_thread(extract_ccda_text, file_resp.content)
+                        if ccda_text is not None:
+                            content = {"content_text": ccda_text}
+                        else:
+                            xml_text = file_resp.text
+                            content = {"content_xml": await asyncio.to_thread(parse_xml_blocking, xml_text)}
                         files.append({
                             "title": title,
-                            "content_xml": xml_parsed,
+                            **content,
                             "contentType": content_type,
                             "creation": attachment.get("creation")
                         })
+                    parse_s += time.monotonic() - parse_started
 
+            documents_s = time.monotonic() - docs_started
+            timings.update(download_s=round(documents_s - parse_s, 3), parse_s=round(parse_s, 3))
             if files:
                 results["documents"] = files
+                report("documents_fetched", documents=len(files), download_s=timings["download_s"], parse_s=timings["parse_s"])
 
-        embedder = PatientDataEmbedder(
-            qdrant_url=os.getenv("QDRANT_URL"),
-            qdrant_api_key=os.getenv("QDRANT_API_KEY")
-        )
+        embedder = get_patient_embedder()
 
         # user_qdrant_tool.delete_all_points()
         
@@ -279,16 +423,25 @@ async def get_patient_info(id: str, modmed_token: str = None, practice_url: str
         # Re-embed a section only when its content changed since the last ingest.
         # Dedup is keyed on (patient_id, section_name): compare the hash stored on
         # the existing vectors to the freshly computed one. If they match, skip; if
-        # they differ, delete the stale vectors before re-embedding so changed
-        # sections don't accumulate orphaned duplicates. The hash is computed over
-        # the exact structure that gets embedded so the two stay consistent.
-        def queue_section_if_changed(section_list, section_name, current_hash):
-            previous_hash = user_qdrant_tool.find_section_hash(id, section_name)
-            if previous_hash == current_hash:
-                return
-            if previous_hash:
-                user_qdrant_tool.delete_points_by_section(id, section_name)
-            all_sections_to_embed.append((section_list, section_name, current_hash))
+        # they differ, the embedder diffs chunk ids against the stored points so only
+        # new chunks are written and vanished ones deleted. The hash is computed over
+        # the exact (projected) structure that gets embedded so the two stay consistent.
+        async def queue_section_if_changed(section_list, section_name, current_hash):
+            entry = manifest.get(section_name)
+            if entry is not None:
+                if entry["section_hash"] == current_hash:
+                    return
+                has_points = entry["point_count"] > 0
+            else:
+                # Qdrant and the manifest store are blocking clients: keep them off the event loop.
+                previous_hash = await asyncio.to_thread(user_qdrant_tool.find_section_hash, id, section_name)
+                if previous_hash == current_hash:
+                    point_count = await asyncio.to_thread(user_qdrant_tool.count_section_points, id, section_name)
+                    await asyncio.to_thread(save_section_manifest, practice_url, id, section_name, current_hash, point_count)
+                    return
+                has_points = previous_hash is not None
+            # Changed sections with stored points are diffed chunk-by-chunk by the embedder.
+            all_sections_to_embed.append((section_list, section_name, current_hash, has_points))
 
         for section_name, section_data in results.items():
             if not section_data:
@@ -297,20 +450,58 @@ async def get_patient_info(id: str, modmed_token: str = None, practice_url: str
             if section_name == "documents":
                 for doc in section_data:
                     doc_title = doc.get("title") or "document"
-                    section_list = [{doc_title: doc}]
-                    queue_section_if_changed(section_list, doc_title, hash_patient_data(section_list))
+                    section_list = [{doc_title: project_section(doc)}]
+                    await queue_section_if_changed(section_list, doc_title, hash_patient_data(section_list))
             else:
-                section_list = [{section_name: section_data}]
-                queue_section_if_changed(section_list, section_name, hash_patient_data(section_list))
+                projected = project_section(section_data)
+                section_list = [{section_name: projected}]
+                section_hash = hash_patient_data(section_list)
+                # Kept for the fast path; only served once the manifest carries this hash.
+                outcome = outcomes.get(section_name, {})
+                structured_sections.put(
+                    practice_url, id, section_name, section_hash, projected,
+                    complete=not outcome.get("stopped") and not outcome.get("truncated"),
+                )
+                await queue_section_if_changed(section_list, section_name, section_hash)
+
+        report("sections_queued", sections_total=len(all_sections_to_embed), sections_done=0)
+
+        # Sources with a section that was not stored; they must not be checkpointed.
+        failed_sources = set()
+
+        async def embed_section(section_list, name, h, has_points):
+            started = time.monotonic()
+            stats = {}
+            points = await asyncio.to_thread(
+                embedder.chunk_and_embed, section_list, name, id, h, practice_url,
+                replace_existing=has_points, stats=stats,
+            )
+            if not points and stats.get("chunks") != 0:
+                # Every embedding or the Qdrant write failed; the manifest still has the old hash.
+                failed_sources.add(name if name in section_urls else "document_references")
+                logger.error("Section not indexed; its source will be fetched again next ingest",
+                             extra={"patient_id": id, "section_name": name})
+            report("section_embedded", section=name, seconds=round(time.monotonic() - started, 3), points=points, **stats)
 
         # Now embed everything in parallel using practice-specific collection
+        embed_started = time.monotonic()
         await asyncio.gather(*[
-            asyncio.to_thread(embedder.chunk_and_embed, section_list, name, id, h, practice_url)
-            for section_list, name, h in all_sections_to_embed
+            embed_section(section_list, name, h, has_points)
+            for section_list, name, h, has_points in all_sections_to_embed
         ])
+        timings["embed_s"] = round(time.monotonic() - embed_started, 3)
+        if all_sections_to_embed:
+            answer_cache.invalidate_patient(practice_url, id)
+
+        # Sources fetched and fully indexed now; let the next ingest pre-check them.
+        since = checkpoint_since(fetch_started)
+        for source, total in complete_sources.items():
+            if source not in failed_sources:
+                await asyncio.to_thread(save_source_checkpoint, practice_url, id, source, since, total)
 
         logger.info("Patient information processed successfully", 
-                   extra={"patient_id": id, "practice_url": practice_url, "sections_embedded": len(all_sections_to_embed)})
+                   extra={"patient_id": id, "practice_url": practice_url, "sections_embedded": len(all_sections_to_embed),
+                          "sections_skipped": len(skipped), **timings})
         return True
 
     except HTTPException:
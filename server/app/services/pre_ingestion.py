@@ -0,0 +1,213 @@
+"""
+Off-peak pre-ingestion of upcoming patients' charts.
+
+Takes the patient ids of surgery appointments (optionally every appointment) from today
+through ``PRE_INGEST_DAYS_AHEAD`` days out, read from the practice's cached schedule window
+(``schedule_cache_store``; ModMed is queried only when the cache does not cover those days),
+and ingests their charts through the ingestion job registry under a rate budget. Morning
+questions then hit a warm index and an up-to-date embedding manifest.
+
+Runs nightly from the app lifespan when enabled, or on demand via
+``scripts/pre_ingest_upcoming.py``. With several app workers, enable the loop on one of them
+(ingest is idempotent, but each worker would repeat the ModMed fetches).
+
+Env:
+  PRE_INGEST_ENABLED — run the nightly loop in the app lifespan (default false)
+  PRE_INGEST_PRACTICES — comma-separated practice names; credentials from PRACTICE_<name>
+  PRE_INGEST_HOUR — US/Pacific hour the nightly run starts (default 2)
+  PRE_INGEST_DAYS_AHEAD — days after today to cover (default 1)
+  PRE_INGEST_ALL_APPOINTMENTS — every appointment, not only surgery (default false)
+  PRE_INGEST_CONCURRENCY — charts ingested at once (default 2)
+  PRE_INGEST_MIN_INTERVAL_SECONDS — minimum spacing between chart starts (default 5)
+  PRE_INGEST_MAX_PATIENTS — cap per practice per run (default 300)
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+import pytz
+
+from app.models import SessionUser
+from app.services.auth_service import auth_service
+from app.services.appointment_service import _is_surgery_appointment, get_appointments_by_date
+from app.services.ingestion_jobs import ingestion_jobs, start_patient_ingestion
+from app.services.schedule_cache_store import load_schedule_cache_entry
+
+logger = logging.getLogger(__name__)
+
+PRE_INGEST_ENABLED = (os.getenv("PRE_INGEST_ENABLED") or "false").strip().lower() == "true"
+PRE_INGEST_PRACTICES = [p.strip() for p in (os.getenv("PRE_INGEST_PRACTICES") or "").split(",") if p.strip()]
+PRE_INGEST_HOUR = int(os.getenv("PRE_INGEST_HOUR", "2"))
+PRE_INGEST_DAYS_AHEAD = int(os.getenv("PRE_INGEST_DAYS_AHEAD", "1"))
+PRE_INGEST_ALL_APPOINTMENTS = (os.getenv("PRE_INGEST_ALL_APPOINTMENTS") or "false").strip().lower() == "true"
+PRE_INGEST_CONCURRENCY = int(os.getenv("PRE_INGEST_CONCURRENCY", "2"))
+PRE_INGEST_MIN_INTERVAL_SECONDS = float(os.getenv("PRE_INGEST_MIN_INTERVAL_SECONDS", "5"))
+PRE_INGEST_MAX_PATIENTS = int(os.getenv("PRE_INGEST_MAX_PATIENTS", "300"))
+
+FHIR_BASE = "https://mmapi.ema-api.com/ema-prod/firm/{practice_url}/ema/fhir/v2"
+
+_PACIFIC = pytz.timezone("US/Pacific")
+
+
+class RateBudget:
+    """At most ``concurrency`` holders, and starts spaced at least ``min_interval`` seconds apart."""
+
+    def __init__(self, concurrency: int, min_interval: float):
+        self._slots = asyncio.Semaphore(max(1, concurrency))
+        self._start_lock = asyncio.Lock()
+        self._min_interval = max(0.0, min_interval)
+        self._last_start: Optional[float] = None
+
+    async def __aenter__(self):
+        await self._slots.acquire()
+        async with self._start_lock:
+            if self._last_start is not None:
+                delay = self._last_start + self._min_interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self._last_start = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._slots.release()
+        return False
+
+
+def _pacific_start(appt: Dict[str, Any]) -> Optional[datetime]:
+    start_str = appt.get("start")
+    if not start_str:
+        return None
+    try:
+        dt = datetime.fromisoformat(start_str.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = pytz.utc.localize(dt)
+    return dt.astimezone(_PACIFIC)
+
+
+def select_patient_ids(
+    appointments: Iterable[Dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    include_all: bool = False,
+    not_before: Optional[datetime] = None,
+) -> List[str]:
+    """Unique patient ids with appointments in [start_date, end_date] (Pacific), earliest first."""
+    upcoming = []
+    for appt in appointments:
+        pid = str(appt.get("patient_id") or "").strip()
+        if not pid or not (include_all or _is_surgery_appointment(appt)):
+            continue
+        start = _pacific_start(appt)
+        if start is None or not (start_date <= start.strftime("%Y-%m-%d") <= end_date):
+            continue
+        if not_before is not None and start < not_before:
+            continue
+        upcoming.append((start, pid))
+    upcoming.sort(key=lambda row: row[0])
+    return list(dict.fromkeys(pid for _start, pid in upcoming))
+
+
+async def load_upcoming_appointments(user: SessionUser, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+    """Appointments for the range from the schedule cache window, else from ModMed."""
+    base_url = FHIR_BASE.format(practice_url=user.practice_url)
+    entry = await asyncio.to_thread(load_schedule_cache_entry, base_url)
+    if entry and entry.get("window_start", "") <= start_date and end_date <= entry.get("window_end", ""):
+        logger.info(
+            "Pre-ingest using cached schedule window %s..%s (cached %.0fs ago)",
+            entry["window_start"],
+            entry["window_end"],
+            time.time() - float(entry.get("cached_at") or 0),
+        )
+        return entry.get("appointments") or []
+    logger.info("Pre-ingest schedule cache does not cover %s..%s; fetching from ModMed", start_date, end_date)
+    return await get_appointments_by_date(
+        start_date, end_date, user.modmed_access_token, base_url, user.practice_api_key
+    )
+
+
+async def pre_ingest_practice(
+    user: SessionUser,
+    days_ahead: int = PRE_INGEST_DAYS_AHEAD,
+    include_all: bool = PRE_INGEST_ALL_APPOINTMENTS,
+    max_patients: int = PRE_INGEST_MAX_PATIENTS,
+    concurrency: int = PRE_INGEST_CONCURRENCY,
+    min_interval: float = PRE_INGEST_MIN_INTERVAL_SECONDS,
+    dry_run: bool = False,
+    today: Optional[date] = None,
+) -> Dict[str, Any]:
+    """Ingest upcoming patients' charts for one practice; returns run counts."""
+    now = datetime.now(_PACIFIC)
+    today = today or now.date()
+    start_date = today.strftime("%Y-%m-%d")
+    end_date = (today + timedelta(days=max(0, days_ahead))).strftime("%Y-%m-%d")
+
+    appointments = await load_upcoming_appointments(user, start_date, end_date)
+    patient_ids = select_patient_ids(appointments, start_date, end_date, include_all, not_before=now)
+    skipped = max(0, len(patient_ids) - max_patients)
+    patient_ids = patient_ids[:max_patients]
+    summary: Dict[str, Any] = {
+        "practice_url": user.practice_url,
+        "window": f"{start_date}..{end_date}",
+        "patients": len(patient_ids),
+        "over_cap": skipped,
+        "succeeded": 0,
+        "failed": 0,
+    }
+    if dry_run or not patient_ids:
+        return summary
+
+    budget = RateBudget(concurrency, min_interval)
+    started = time.monotonic()
+
+    async def ingest(patient_id: str) -> None:
+        async with budget:
+            job = start_patient_ingestion(user, patient_id)
+            await ingestion_jobs.wait(job)
+            summary["succeeded" if job.status == "succeeded" else "failed"] += 1
+
+    await asyncio.gather(*(ingest(pid) for pid in patient_ids))
+    summary["seconds"] = round(time.monotonic() - started, 1)
+    logger.info("Pre-ingest finished", extra=summary)
+    return summary
+
+
+async def run_pre_ingestion(practices: Iterable[str] = PRE_INGEST_PRACTICES, **options: Any) -> List[Dict[str, Any]]:
+    """Pre-ingest every configured practice in turn (one ModMed login each)."""
+    summaries = []
+    for practice in practices:
+        user = await auth_service.build_practice_service_user(practice)
+        if not user:
+            logger.warning("Pre-ingest skipped practice %s: ModMed login unavailable", practice)
+            continue
+        try:
+            summaries.append(await pre_ingest_practice(user, **options))
+        except Exception:
+            logger.exception("Pre-ingest failed for practice %s", practice)
+    return summaries
+
+
+def seconds_until_next_run(hour: int = PRE_INGEST_HOUR, now: Optional[datetime] = None) -> float:
+    """Seconds from ``now`` until the next ``hour``:00 US/Pacific."""
+    now = now or datetime.now(_PACIFIC)
+    target = _PACIFIC.localize(datetime(now.year, now.month, now.day, hour % 24))
+    if target <= now:
+        next_day = now.date() + timedelta(days=1)
+        target = _PACIFIC.localize(datetime(next_day.year, next_day.month, next_day.day, hour % 24))
+    return (target - now).total_seconds()
+
+
+async def pre_ingestion_loop() -> None:
+    """Nightly loop started by the app lifespan when PRE_INGEST_ENABLED is set."""
+    while True:
+        await asyncio.sleep(seconds_until_next_run())
+        try:
+            await run_pre_ingestion()
+        except Exception:
+            logger.exception("Nightly pre-ingest run failed")
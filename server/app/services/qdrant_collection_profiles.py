@@ -0,0 +1,384 @@
+"""
+Declarative Qdrant collection profiles for practice collections.
+
+A profile fixes the vector storage (on-disk or RAM), HNSW graph, quantization and the
+payload indexes every search/scroll filters on (``patient_id``, ``section_name``,
+``patient_hash``), plus whether points carry the BM25 sparse vector used by hybrid search
+(``app/services/sparse_vectors.py``). ``scripts/create_qdrant_collection.py`` creates, migrates in place or
+rebuilds collections from a profile; ``scripts/bench_qdrant_profiles.py`` compares them.
+
+Profiles:
+  baseline  — what the collection script used to create: RAM vectors, default HNSW,
+              plain keyword indexes on patient_id and patient_hash
+  tenant    — (default) patient_id as a tenant index, section_name + patient_hash indexes,
+              HNSW built per patient only (m=0, payload_m=16). Every query is expected to
+              filter on patient_id; unfiltered searches fall back to a full scan. Adds the
+              sparse vector for hybrid search (so do the quantized variants)
+  tenant-sq — tenant + int8 scalar quantization kept in RAM, original vectors on disk
+  tenant-bq — tenant + binary quantization kept in RAM, original vectors on disk
+
+Rebuilds copy points (same ids, payloads and vectors, so the embedding manifest stays valid)
+into ``<name>__<YYYYmmddHHMMSS>`` and point the alias ``<name>`` at it; the app keeps using the
+practice name as its collection name throughout. A sparse vector can only be added by a
+rebuild; it is computed from each point's ``patient_text`` during the copy.
+
+Ingest may keep writing while a rebuild copies, and a write that lands in the old collection
+after the copy passed its points is lost with it. Pausing ingestion is therefore not required:
+after switching the alias, ``rebuild_collection`` reconciles the embedding manifest with the new
+collection and clears the practice's source checkpoints (``resync_practice_ingest_state``), so
+the next ingest of each patient re-fetches and re-embeds whatever is missing.
+
+The assistant's searches rescore quantized candidates with the original vectors
+(``collection_search_params``, read from the collection's own quantization config).
+
+``verify_search_indexes`` runs at app startup (configured practices) and on a collection's
+first assistant search: it only adds missing ``patient_id`` / ``section_name`` indexes, since
+every search is filtered on the patient.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from app.services.embedding_manifest_reconcile import resync_practice_ingest_state
+from app.services.sparse_vectors import (
+    SPARSE_VECTOR_NAME,
+    collection_has_sparse,
+    document_sparse_vector,
+    sparse_vectors_config,
+)
+
+logger = logging.getLogger(__name__)
+
+VECTOR_SIZE = 1024  # Amazon Titan v2 embedding size
+
+DEFAULT_PROFILE = "tenant"
+
+
+@dataclass(frozen=True)
+class PayloadIndex:
+    field_name: str
+    is_tenant: bool = False
+
+    def schema(self) -> models.KeywordIndexParams:
+        return models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=self.is_tenant or None)
+
+
+@dataclass(frozen=True)
+class CollectionProfile:
+    name: str
+    description: str
+    on_disk_vectors: bool = False
+    hnsw_m: Optional[int] = None
+    hnsw_payload_m: Optional[int] = None
+    hnsw_ef_construct: Optional[int] = None
+    quantization: Optional[str] = None  # None | "scalar" | "binary"
+    payload_indexes: Tuple[PayloadIndex, ...] = field(default_factory=tuple)
+    sparse: bool = False
+
+    def vectors_config(self, size: int = VECTOR_SIZE) -> models.VectorParams:
+        return models.VectorParams(size=size, distance=models.Distance.COSINE, on_disk=self.on_disk_vectors or None)
+
+    def hnsw_config(self) -> Optional[models.HnswConfigDiff]:
+        if self.hnsw_m is None and self.hnsw_payload_m is None and self.hnsw_ef_construct is None:
+            return None
+        return models.HnswConfigDiff(m=self.hnsw_m, payload_m=self.hnsw_payload_m, ef_construct=self.hnsw_ef_construct)
+
+    def quantization_config(self):
+        if self.quantization == "scalar":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
+        if self.quantization == "binary":
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def search_params(self) -> Optional[models.SearchParams]:
+        """Query-time params that go with the profile (rescore quantized hits with full vectors)."""
+        return quantization_search_params(self.quantization)
+
+
+def quantization_search_params(quantization: Optional[str]) -> Optional[models.SearchParams]:
+    """Rescore quantized candidates with the original vectors, oversampling more for binary."""
+    if not quantization:
+        return None
+    return models.SearchParams(
+        quantization=models.QuantizationSearchParams(rescore=True, oversampling=2.0 if quantization == "binary" else 1.5)
+    )
+
+
+_TENANT_INDEXES = (
+    PayloadIndex("patient_id", is_tenant=True),
+    PayloadIndex("section_name"),
+    PayloadIndex("patient_hash"),
+)
+
+PROFILES: Dict[str, CollectionProfile] = {
+    p.name: p
+    for p in (
+        CollectionProfile(
+            name="baseline",
+            description="RAM vectors, default HNSW, keyword indexes on patient_id and patient_hash",
+            payload_indexes=(PayloadIndex("patient_id"), PayloadIndex("patient_hash")),
+        ),
+        CollectionProfile(
+            name="tenant",
+            description="Tenant patient_id index, per-patient HNSW (m=0, payload_m=16), section_name/patient_hash indexes",
+            hnsw_m=0,
+            hnsw_payload_m=16,
+            payload_indexes=_TENANT_INDEXES,
+            sparse=True,
+        ),
+        CollectionProfile(
+            name="tenant-sq",
+            description="tenant + int8 scalar quantization in RAM, original vectors on disk",
+            on_disk_vectors=True,
+            hnsw_m=0,
+            hnsw_payload_m=16,
+            quantization="scalar",
+            payload_indexes=_TENANT_INDEXES,
+            sparse=True,
+        ),
+        CollectionProfile(
+            name="tenant-bq",
+            description="tenant + binary quantization in RAM, original vectors on disk",
+            on_disk_vectors=True,
+            hnsw_m=0,
+            hnsw_payload_m=16,
+            quantization="binary",
+            payload_indexes=_TENANT_INDEXES,
+            sparse=True,
+        ),
+    )
+}
+
+
+def get_profile(name: str) -> CollectionProfile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown collection profile {name!r}; choose from {', '.join(PROFILES)}") from None
+
+
+def create_collection(client: QdrantClient, collection_name: str, profile: CollectionProfile) -> None:
+    """Create a new collection from ``profile`` (fails if the name exists)."""
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=profile.vectors_config(),
+        hnsw_config=profile.hnsw_config(),
+        quantization_config=profile.quantization_config(),
+        sparse_vectors_config=sparse_vectors_config() if profile.sparse else None,
+    )
+    ensure_payload_indexes(client, collection_name, profile)
+
+
+def _index_matches(info: Any, index: PayloadIndex) -> bool:
+    if info is None or str(getattr(info.data_type, "value", info.data_type)) != "keyword":
+        return False
+    return bool(getattr(info.params, "is_tenant", None)) == index.is_tenant
+
+
+def ensure_payload_indexes(client: QdrantClient, collection_name: str, profile: CollectionProfile) -> List[str]:
+    """
+    Create the profile's payload indexes, re-creating any with the wrong type/tenant flag.
+    Returns the field names that were (re)built.
+    """
+    schema = client.get_collection(collection_name).payload_schema or {}
+    changed = []
+    for index in profile.payload_indexes:
+        existing = schema.get(index.field_name)
+        if _index_matches(existing, index):
+            continue
+        if existing is not None:
+            client.delete_payload_index(collection_name=collection_name, field_name=index.field_name, wait=True)
+        client.create_payload_index(
+            collection_name=collection_name, field_name=index.field_name, field_schema=index.schema(), wait=True
+        )
+        changed.append(index.field_name)
+    return changed
+
+
+# Fields every assistant search filters on; see ``verify_search_indexes``.
+SEARCH_INDEXES = (PayloadIndex("patient_id", is_tenant=True), PayloadIndex("section_name"))
+
+_verified: Set[Tuple[int, str]] = set()
+_verified_lock = threading.Lock()
+
+
+def verify_search_indexes(client: QdrantClient, collection_name: str) -> List[str]:
+    """
+    Make sure the fields searches filter on are indexed, creating any missing index (existing
+    ones are left as they are; ``migrate_collection`` upgrades them). Checked once per client and
+    collection per process. Returns the fields whose index was created.
+    """
+    key = (id(client), collection_name)
+    with _verified_lock:
+        if key in _verified:
+            return []
+    schema = client.get_collection(collection_name).payload_schema or {}
+    created = []
+    for index in SEARCH_INDEXES:
+        if index.field_name in schema:
+            continue
+        logger.warning("%s has no payload index on %s; creating it", collection_name, index.field_name)
+        client.create_payload_index(
+            collection_name=collection_name, field_name=index.field_name, field_schema=index.schema(), wait=False
+        )
+        created.append(index.field_name)
+    with _verified_lock:
+        _verified.add(key)
+    return created
+
+
+def verify_practice_search_indexes(client: QdrantClient, practices: List[str]) -> Dict[str, List[str]]:
+    """Startup check of every configured practice collection; missing collections are skipped."""
+    created = {}
+    for practice in practices:
+        try:
+            if not client.collection_exists(practice):
+                logger.info("No Qdrant collection for practice %s yet; skipping index check", practice)
+                continue
+            created[practice] = verify_search_indexes(client, practice)
+        except Exception as e:
+            logger.warning("Payload index check failed for %s: %s", practice, e)
+    return created
+
+
+_search_params: Dict[Tuple[int, str], Tuple[float, Optional[models.SearchParams]]] = {}
+_search_params_lock = threading.Lock()
+_SEARCH_PARAMS_TTL_SECONDS = 300.0
+
+
+def collection_search_params(client: QdrantClient, collection_name: str) -> Optional[models.SearchParams]:
+    """
+    ``search_params`` for the quantization the collection (or the one behind the alias) actually
+    has, whichever profile built it. Cached per client for a few minutes, like
+    ``collection_has_sparse``, so a migrated or rebuilt collection is picked up without a restart.
+    """
+    key = (id(client), collection_name)
+    now = time.monotonic()
+    with _search_params_lock:
+        cached = _search_params.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+    config = client.get_collection(collection_name).config.quantization_config
+    if isinstance(config, models.BinaryQuantization):
+        params = quantization_search_params("binary")
+    else:
+        params = quantization_search_params("scalar" if config is not None else None)
+    with _search_params_lock:
+        _search_params[key] = (now + _SEARCH_PARAMS_TTL_SECONDS, params)
+    return params
+
+
+def migrate_collection(client: QdrantClient, collection_name: str, profile: CollectionProfile) -> List[str]:
+    """
+    Apply ``profile`` in place: HNSW, quantization and on-disk flag via update_collection
+    (Qdrant re-optimizes segments in the background), then payload indexes. A profile without
+    HNSW settings leaves the collection's graph as it is. A missing sparse vector is only
+    reported: Qdrant cannot add one to an existing collection (use a rebuild).
+    """
+    if profile.sparse and not collection_has_sparse(client, collection_name):
+        logger.warning(
+            "%s has no sparse vector; searches stay dense-only until it is rebuilt with profile %s",
+            collection_name, profile.name,
+        )
+    client.update_collection(
+        collection_name=collection_name,
+        vectors_config={"": models.VectorParamsDiff(on_disk=profile.on_disk_vectors)},
+        hnsw_config=profile.hnsw_config(),
+        quantization_config=profile.quantization_config() or models.Disabled.DISABLED,
+    )
+    return ensure_payload_indexes(client, collection_name, profile)
+
+
+def _alias_target(client: QdrantClient, alias: str) -> Optional[str]:
+    for a in client.get_aliases().aliases:
+        if a.alias_name == alias:
+            return a.collection_name
+    return None
+
+
+def _copy_vector(point: Any, sparse: bool) -> Any:
+    """The point's vector(s) for the target collection: sparse added if missing, dropped if unwanted."""
+    vector = point.vector
+    dense = vector.get("") if isinstance(vector, dict) else vector
+    if not sparse:
+        return dense
+    if isinstance(vector, dict) and SPARSE_VECTOR_NAME in vector:
+        return vector
+    text_vector = document_sparse_vector((point.payload or {}).get("patient_text", ""))
+    if not text_vector.indices:
+        return dense
+    return {"": dense, SPARSE_VECTOR_NAME: text_vector}
+
+
+def rebuild_collection(
+    client: QdrantClient,
+    collection_name: str,
+    profile: CollectionProfile,
+    batch_size: int = 256,
+) -> Dict[str, Any]:
+    """
+    Copy every point into a fresh collection built from ``profile`` and switch the alias
+    ``collection_name`` to it. When ``collection_name`` is still a concrete collection (first
+    rebuild), it is deleted just before the alias is created, so requests fail for that instant.
+    Afterwards the manifest and source checkpoints are resynced with the new collection, which
+    recovers any point written to the old one after the copy passed it.
+    """
+    old_target = _alias_target(client, collection_name)
+    source = old_target or collection_name
+    target = f"{collection_name}__{time.strftime('%Y%m%d%H%M%S')}"
+    suffix = 1
+    while client.collection_exists(target):
+        suffix += 1
+        target = f"{collection_name}__{time.strftime('%Y%m%d%H%M%S')}_{suffix}"
+    create_collection(client, target, profile)
+
+    copied = 0
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=source, limit=batch_size, offset=offset, with_payload=True, with_vectors=True
+        )
+        if points:
+            client.upsert(
+                collection_name=target,
+                points=[
+                    models.PointStruct(id=p.id, vector=_copy_vector(p, profile.sparse), payload=p.payload)
+                    for p in points
+                ],
+                wait=True,
+            )
+            copied += len(points)
+        if offset is None:
+            break
+
+    if old_target:
+        client.update_collection_aliases(
+            change_aliases_operations=[
+                models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=collection_name)),
+                models.CreateAliasOperation(
+                    create_alias=models.CreateAlias(collection_name=target, alias_name=collection_name)
+                ),
+            ]
+        )
+        client.delete_collection(old_target)
+    else:
+        client.delete_collection(collection_name)
+        client.update_collection_aliases(
+            change_aliases_operations=[
+                models.CreateAliasOperation(
+                    create_alias=models.CreateAlias(collection_name=target, alias_name=collection_name)
+                )
+            ]
+        )
+    logger.info("Rebuilt %s into %s with profile %s (%s points)", collection_name, target, profile.name, copied)
+    resynced = resync_practice_ingest_state(client, collection_name)
+    return {"source": source, "target": target, "points": copied, "ingest_state": resynced}
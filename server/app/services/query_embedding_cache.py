@@ -0,0 +1,100 @@
+"""
+In-process LRU + TTL cache of search-query vectors.
+
+Agents repeat the same few queries across iterations and users ("current medications",
+"allergies" ...); each used to cost a new boto3 client and a Bedrock call. ``embed_query``
+normalizes the query (case and whitespace), serves it from the cache keyed by
+(model, dimensions, normalized query), and otherwise embeds it through the shared
+``EmbeddingService`` (one pooled Bedrock client, same concurrency governor as ingest).
+Failed embeddings are not cached. Hit/miss counters are reported under ``GET /metrics``.
+
+Env:
+  QUERY_EMBEDDING_CACHE_SIZE — entries kept per process (default 2048; 0 disables)
+  QUERY_EMBEDDING_CACHE_TTL_SECONDS — entry lifetime (default 3600)
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.services.embedding_service import get_embedding_service
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "3600"))
+
+Key = Tuple[str, int, str]
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.casefold().split())
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU with per-entry expiry; safe to share across crew threads."""
+
+    def __init__(
+        self,
+        max_entries: int = QUERY_EMBEDDING_CACHE_SIZE,
+        ttl_seconds: float = QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Key, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    def get(self, key: Key) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                del self._entries[key]
+                self._counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[1]
+
+    def put(self, key: Key, vector: List[float]) -> None:
+        if self.max_entries <= 0 or not vector:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evicted"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+query_embedding_cache = QueryEmbeddingCache()
+
+
+def embed_query(query: str, cache: Optional[QueryEmbeddingCache] = None) -> List[float]:
+    """Vector for a search query (normalized); [] when embedding fails."""
+    cache = query_embedding_cache if cache is None else cache
+    service = get_embedding_service()
+    text = normalize_query(query)
+    key = (service.model, service.dimensions, text)
+    vector = cache.get(key)
+    if vector is None:
+        vector = service.embed(text)
+        cache.put(key, vector)
+    return vector
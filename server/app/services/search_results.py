@@ -0,0 +1,135 @@
+"""
+Shaping vector search hits into the context the assistant LLM reads.
+
+The search tool asks Qdrant for up to 100 candidates above a low score threshold; passing them
+all through as indented JSON with full payloads costs prompt tokens and LLM latency. Before the
+tool returns, ``select_results``:
+
+- drops near-duplicates: a hit whose tokens are (almost) all contained in a higher-ranked hit
+  (repeated resources, the same note in two sections, re-ingested documents)
+- re-ranks with maximal marginal relevance (MMR), trading relevance against similarity to the
+  hits already picked, so one topic does not crowd out the rest of the chart
+- packs hits in that order until ``SEARCH_RESULT_TOKEN_BUDGET`` whitespace tokens (the
+  ``token_count`` stored on each point) or ``SEARCH_RESULT_MAX`` hits
+
+Similarity is token-set overlap (the sparse-vector tokenizer), so no vectors are fetched.
+Only ``SEARCH_PAYLOAD_FIELDS`` are requested from Qdrant, and ``format_results`` emits compact
+JSON unless ``SEARCH_RESULTS_PRETTY`` is set.
+
+Env:
+  SEARCH_DEDUP_CONTAINMENT — share of a hit's tokens found in a better hit that makes it a duplicate (default 0.9)
+  SEARCH_MMR_LAMBDA — relevance weight in MMR, 1 = plain score order (default 0.7)
+  SEARCH_RESULT_TOKEN_BUDGET — context tokens handed to the LLM per search (default 2500)
+  SEARCH_RESULT_MAX — most hits returned per search (default 20)
+  SEARCH_RESULTS_PRETTY — indent the tool's JSON output (default false)
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from typing import Any, Dict, FrozenSet, List, Sequence
+
+from app.services.fhir_chunker import count_tokens
+from app.services.sparse_vectors import tokenize
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DEDUP_CONTAINMENT = float(os.getenv("SEARCH_DEDUP_CONTAINMENT", "0.9"))
+SEARCH_MMR_LAMBDA = float(os.getenv("SEARCH_MMR_LAMBDA", "0.7"))
+SEARCH_RESULT_TOKEN_BUDGET = int(os.getenv("SEARCH_RESULT_TOKEN_BUDGET", "2500"))
+SEARCH_RESULT_MAX = int(os.getenv("SEARCH_RESULT_MAX", "20"))
+SEARCH_RESULTS_PRETTY = (os.getenv("SEARCH_RESULTS_PRETTY") or "false").strip().lower() == "true"
+
+# Everything the tool output uses; embeddings and bookkeeping fields stay in Qdrant.
+SEARCH_PAYLOAD_FIELDS = ["patient_text", "section_name", "token_count"]
+
+
+def _contained(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Share of ``a``'s tokens that also appear in ``b``."""
+    if not a:
+        return 1.0
+    return len(a & b) / len(a)
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def dedupe(hits: Sequence[Any], token_sets: Sequence[FrozenSet[str]], containment: float) -> List[int]:
+    """Indexes of ``hits`` (best first) that are not near-duplicates of a better-ranked hit."""
+    kept: List[int] = []
+    seen_texts = set()
+    for i, hit in enumerate(hits):
+        text = (hit.payload or {}).get("patient_text", "")
+        if not text or text in seen_texts:
+            continue
+        if any(_contained(token_sets[i], token_sets[j]) >= containment for j in kept):
+            continue
+        seen_texts.add(text)
+        kept.append(i)
+    return kept
+
+
+def mmr_order(
+    candidates: Sequence[int], scores: Sequence[float], token_sets: Sequence[FrozenSet[str]], lam: float
+) -> List[int]:
+    """Greedy MMR over ``candidates``; relevance is the score relative to the best candidate."""
+    if lam >= 1 or len(candidates) < 3:
+        return list(candidates)
+    top = max(scores[i] for i in candidates) or 1.0
+    # Highest similarity of each remaining candidate to anything already picked.
+    redundancy = {i: 0.0 for i in candidates}
+    order: List[int] = []
+    while redundancy:
+        best = max(redundancy, key=lambda i: lam * scores[i] / top - (1 - lam) * redundancy[i])
+        del redundancy[best]
+        order.append(best)
+        for i in redundancy:
+            redundancy[i] = max(redundancy[i], _jaccard(token_sets[i], token_sets[best]))
+    return order
+
+
+def select_results(
+    hits: Sequence[Any],
+    token_budget: int = SEARCH_RESULT_TOKEN_BUDGET,
+    max_results: int = SEARCH_RESULT_MAX,
+    mmr_lambda: float = SEARCH_MMR_LAMBDA,
+    containment: float = SEARCH_DEDUP_CONTAINMENT,
+) -> List[Dict[str, Any]]:
+    """
+    Deduplicated, MMR-ordered hits that fit the token budget, as ``{section, context, score}``.
+    The best hit is always returned, even if it alone is over budget.
+    """
+    token_sets = [frozenset(tokenize((h.payload or {}).get("patient_text", ""))) for h in hits]
+    unique = dedupe(hits, token_sets, containment)
+    order = mmr_order(unique, [h.score for h in hits], token_sets, mmr_lambda)
+
+    results: List[Dict[str, Any]] = []
+    used = 0
+    for i in order:
+        if len(results) >= max_results:
+            break
+        payload = hits[i].payload or {}
+        tokens = payload.get("token_count") or count_tokens(payload.get("patient_text", ""))
+        if results and used + tokens > token_budget:
+            continue  # a shorter hit further down may still fit
+        used += tokens
+        results.append({
+            "section": payload.get("section_name", ""),
+            "context": payload["patient_text"],
+            "score": round(hits[i].score, 4),
+        })
+    logger.debug(
+        "Search results selected",
+        extra={"candidates": len(hits), "unique": len(unique), "returned": len(results), "tokens": used},
+    )
+    return results
+
+
+def format_results(results: List[Dict[str, Any]], pretty: bool = SEARCH_RESULTS_PRETTY) -> str:
+    if pretty:
+        return json.dumps(results, indent=2, ensure_ascii=False)
+    return json.dumps(results, separators=(",", ":"), ensure_ascii=False)
@@ -0,0 +1,120 @@
+"""
+Query-time section routing for the assistant's search tool.
+
+Every chunk carries the ``section_name`` it was ingested under, but a search used to rank the
+patient's whole chart. ``SectionRouter.route`` predicts the sections a query is about from
+specific keywords ("dose", "mg" -> medications; "PSA", "biopsy" -> diagnostic_reports; "visit"
+-> encounters; ...); generic words ("results", "report", "taking") route nowhere. The tool then
+searches those sections plus every clinical document (documents are indexed under their titles,
+i.e. any ``section_name`` outside ``FHIR_SECTIONS``; lab and pathology PDFs live there), on top of
+the patient filter. It runs the usual patient-wide search only when the routed results look weak:
+
+- fewer than ``SECTION_ROUTING_MIN_HITS`` hits, or
+- a best dense (cosine) score below ``SECTION_ROUTING_MIN_SCORE``. Hybrid results carry
+  rank-fusion scores, which do not measure similarity, and their sparse candidates have no score
+  threshold, so for hybrid search the tool takes the best score from a one-point dense probe with
+  the routed filter
+
+A query with no section keywords, or one the agent already scoped with ``section_name``, is
+not routed. Routing, fall-back and unrouted counts are reported at ``GET /metrics``.
+
+Env:
+  SECTION_ROUTING_ENABLED — search predicted sections first (default true)
+  SECTION_ROUTING_MIN_HITS — routed hits needed to skip the patient-wide search (default 3)
+  SECTION_ROUTING_MIN_SCORE — best routed dense score needed to skip it (default 0.35)
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+from typing import Any, Dict, Sequence, Tuple
+
+SECTION_ROUTING_ENABLED = (os.getenv("SECTION_ROUTING_ENABLED") or "true").strip().lower() == "true"
+SECTION_ROUTING_MIN_HITS = int(os.getenv("SECTION_ROUTING_MIN_HITS", "3"))
+SECTION_ROUTING_MIN_SCORE = float(os.getenv("SECTION_ROUTING_MIN_SCORE", "0.35"))
+
+# Ingested FHIR section -> query words that point at it. Only words specific to one section:
+# anything generic ("result", "report", "taking", "seen") would pull unrelated questions in.
+SECTION_KEYWORDS: Dict[str, frozenset] = {
+    "medications": frozenset(
+        "medication medications med meds medicine medicines drug drugs prescription prescriptions prescribed rx "
+        "dose doses dosage dosing mg mcg tablet tablets capsule capsules refill refills pharmacy".split()
+    ),
+    "allergies": frozenset("allergy allergies allergic nkda intolerance intolerances anaphylaxis".split()),
+    "conditions": frozenset(
+        "condition conditions problem problems diagnosis diagnoses diagnosed dx icd comorbidity comorbidities "
+        "pmh".split()
+    ),
+    "family_history": frozenset(
+        "family familial hereditary father mother brother brothers sister sisters sibling siblings parent "
+        "parents".split()
+    ),
+    "diagnostic_reports": frozenset(
+        "lab labs laboratory psa creatinine egfr urinalysis ua culture cultures cytology pathology biopsy "
+        "imaging ct mri ultrasound xray".split()
+    ),
+    "tasks": frozenset("recall recalls".split()),
+    "encounters": frozenset(
+        "visit visits encounter encounters appointment appointments telehealth admission admitted".split()
+    ),
+    "patient": frozenset("dob birthday gender address phone email insurance demographics".split()),
+}
+# Every section ingested from a FHIR search; any other section_name is a document title.
+FHIR_SECTIONS = frozenset(SECTION_KEYWORDS)
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class SectionRouter:
+    """Keyword section predictor plus the routed-results check, with counters."""
+
+    def __init__(
+        self,
+        enabled: bool = SECTION_ROUTING_ENABLED,
+        min_hits: int = SECTION_ROUTING_MIN_HITS,
+        min_score: float = SECTION_ROUTING_MIN_SCORE,
+    ):
+        self.enabled = enabled
+        self.min_hits = min_hits
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self._counters = {"queries": 0, "routed": 0, "unrouted": 0, "fallbacks": 0}
+
+    def route(self, query: str) -> Tuple[str, ...]:
+        """Sections ``query`` is about (in SECTION_KEYWORDS order); empty means search the whole chart."""
+        words = set(_WORD.findall(query.lower()))
+        sections = (
+            tuple(name for name, keywords in SECTION_KEYWORDS.items() if words & keywords) if self.enabled else ()
+        )
+        with self._lock:
+            self._counters["queries"] += 1
+            self._counters["routed" if sections else "unrouted"] += 1
+        return sections
+
+    def sufficient(self, hits: Sequence[Any], best_dense_score: float) -> bool:
+        """
+        Whether routed ``hits`` can stand, or the patient-wide search should run instead.
+        ``best_dense_score`` is the best cosine similarity among the routed points.
+        """
+        ok = bool(hits) and len(hits) >= self.min_hits and best_dense_score >= self.min_score
+        if not ok:
+            with self._lock:
+                self._counters["fallbacks"] += 1
+        return ok
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            routed = self._counters["routed"]
+            queries = self._counters["queries"]
+            return {
+                "enabled": self.enabled,
+                "min_hits": self.min_hits,
+                "min_score": self.min_score,
+                **self._counters,
+                "routed_rate": round(routed / queries, 4) if queries else 0.0,
+                "fallback_rate": round(self._counters["fallbacks"] / routed, 4) if routed else 0.0,
+            }
+
+
+section_router = SectionRouter()
@@ -0,0 +1,209 @@
+"""
+FHIR source checkpoints: (practice_url, patient_id, source) -> checked_since, total, checked_at.
+
+``source`` is a fetched chart section (``encounters``, ``document_references``, ``patient`` ...).
+Written by ``get_patient_info`` after a section was fetched completely and its content
+indexed; ``checked_since`` is the FHIR instant the next ingest passes as
+``_lastUpdated=gt...`` and ``total`` the searchset size it compares ``_summary=count`` to.
+
+Local SQLite by default (``SOURCE_CHECKPOINT_SQLITE_PATH``, default
+``app/data/source_checkpoints.sqlite3``). Set ``SOURCE_CHECKPOINT_DYNAMODB_TABLE`` to use
+DynamoDB instead: partition key ``practice_url``, sort key ``source_key`` holding
+``<patient_id>#<source>``.
+
+``DYNAMODB_REGION`` sets the AWS region for the DynamoDB client (default ``us-west-2``).
+"""
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+import sqlite3
+import time
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+
+SOURCE_CHECKPOINT_SQLITE_PATH = (
+    os.getenv("SOURCE_CHECKPOINT_SQLITE_PATH") or os.path.join(_DATA_DIR, "source_checkpoints.sqlite3")
+).strip()
+SOURCE_CHECKPOINT_DYNAMODB_TABLE = (os.getenv("SOURCE_CHECKPOINT_DYNAMODB_TABLE") or "").strip()
+_DDB_REGION = (os.getenv("DYNAMODB_REGION") or "").strip() or "us-west-2"
+_DDB_PK = "practice_url"
+_DDB_SK = "source_key"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS source_checkpoint (
+    practice_url TEXT NOT NULL,
+    patient_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    checked_since TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    checked_at REAL NOT NULL,
+    PRIMARY KEY (practice_url, patient_id, source)
+)
+"""
+
+_dynamodb_table = None
+_sqlite_ready_path: Optional[str] = None
+
+
+def _get_table():
+    global _dynamodb_table
+    if not SOURCE_CHECKPOINT_DYNAMODB_TABLE:
+        return None
+    if _dynamodb_table is not None:
+        return _dynamodb_table
+    try:
+        import boto3  # type: ignore
+
+        resource = boto3.resource("dynamodb", region_name=_DDB_REGION)
+        _dynamodb_table = resource.Table(SOURCE_CHECKPOINT_DYNAMODB_TABLE)
+        return _dynamodb_table
+    except Exception as e:
+        logger.warning("Source checkpoint DynamoDB init failed: %s", e)
+        return None
+
+
+@contextlib.contextmanager
+def _connect():
+    """Open the checkpoint database (schema created on first use), commit on success, always close."""
+    global _sqlite_ready_path
+    path = SOURCE_CHECKPOINT_SQLITE_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    try:
+        if _sqlite_ready_path != path:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            _sqlite_ready_path = path
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _source_key(patient_id: str, source: str) -> str:
+    return f"{patient_id}#{source}"
+
+
+def _entry(checked_since: Any, total: Any, checked_at: Any) -> Dict[str, Any]:
+    if isinstance(total, Decimal):
+        total = int(total)
+    if isinstance(checked_at, Decimal):
+        checked_at = float(checked_at)
+    return {
+        "checked_since": str(checked_since or ""),
+        "total": int(total or 0),
+        "checked_at": float(checked_at or 0),
+    }
+
+
+def load_source_checkpoints(practice_url: str, patient_id: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns map source -> {checked_since, total, checked_at} for one patient.
+    An empty dict means nothing is recorded (every section is fetched).
+    """
+    table = _get_table()
+    if table:
+        try:
+            from boto3.dynamodb.conditions import Key  # type: ignore
+
+            prefix = _source_key(patient_id, "")
+            out: Dict[str, Dict[str, Any]] = {}
+            kwargs = {"KeyConditionExpression": Key(_DDB_PK).eq(practice_url) & Key(_DDB_SK).begins_with(prefix)}
+            while True:
+                resp = table.query(**kwargs)
+                for item in resp.get("Items", []):
+                    source = str(item.get(_DDB_SK) or "")[len(prefix):]
+                    out[source] = _entry(item.get("checked_since"), item.get("total"), item.get("checked_at"))
+                last_key = resp.get("LastEvaluatedKey")
+                if not last_key:
+                    return out
+                kwargs["ExclusiveStartKey"] = last_key
+        except Exception as e:
+            logger.warning("Source checkpoint DynamoDB read failed for patient %s: %s", patient_id, e)
+            return {}
+
+    try:
+        with _connect() as conn:
+            rows = conn.execute(
+                "SELECT source, checked_since, total, checked_at FROM source_checkpoint "
+                "WHERE practice_url = ? AND patient_id = ?",
+                (practice_url, patient_id),
+            ).fetchall()
+        return {row[0]: _entry(row[1], row[2], row[3]) for row in rows}
+    except Exception as e:
+        logger.warning("Source checkpoint read failed for patient %s: %s", patient_id, e)
+        return {}
+
+
+def save_source_checkpoint(
+    practice_url: str,
+    patient_id: str,
+    source: str,
+    checked_since: str,
+    total: int,
+    checked_at: Optional[float] = None,
+) -> None:
+    """Upsert one source row; checked_at defaults to now (epoch seconds)."""
+    checked_at = time.time() if checked_at is None else checked_at
+    table = _get_table()
+    if table:
+        try:
+            table.put_item(
+                Item={
+                    _DDB_PK: practice_url,
+                    _DDB_SK: _source_key(patient_id, source),
+                    "checked_since": checked_since,
+                    "total": int(total),
+                    "checked_at": Decimal(str(round(checked_at, 3))),
+                }
+            )
+        except Exception as e:
+            logger.warning("Source checkpoint DynamoDB write failed for patient %s: %s", patient_id, e)
+        return
+
+    try:
+        with _connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO source_checkpoint "
+                "(practice_url, patient_id, source, checked_since, total, checked_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (practice_url, patient_id, source, checked_since, int(total), float(checked_at)),
+            )
+    except Exception as e:
+        logger.warning("Source checkpoint write failed for patient %s: %s", patient_id, e)
+
+
+def delete_practice_checkpoints(practice_url: str) -> int:
+    """
+    Drop every source row of a practice, so each patient's next ingest fetches all sections
+    (after its collection was rebuilt or recreated). Returns the number of rows deleted.
+    """
+    table = _get_table()
+    if table:
+        from boto3.dynamodb.conditions import Key  # type: ignore
+
+        deleted = 0
+        kwargs = {
+            "KeyConditionExpression": Key(_DDB_PK).eq(practice_url),
+            "ProjectionExpression": f"{_DDB_PK}, {_DDB_SK}",
+        }
+        with table.batch_writer() as batch:
+            while True:
+                resp = table.query(**kwargs)
+                for item in resp.get("Items", []):
+                    batch.delete_item(Key={_DDB_PK: practice_url, _DDB_SK: item[_DDB_SK]})
+                    deleted += 1
+                last_key = resp.get("LastEvaluatedKey")
+                if not last_key:
+                    return deleted
+                kwargs["ExclusiveStartKey"] = last_key
+
+    with _connect() as conn:
+        return conn.execute("DELETE FROM source_checkpoint WHERE practice_url = ?", (practice_url,)).rowcount
@@ -0,0 +1,149 @@
+"""
+BM25-style sparse vectors for hybrid (sparse + dense) retrieval.
+
+Dense Titan vectors rank exact-token questions poorly: drug names, CPT/ICD codes ("E11.9",
+"52000"), lab names ("PSA"). Each chunk therefore also gets a sparse vector named
+``SPARSE_VECTOR_NAME`` in the same point:
+
+- tokens are lower-cased alphanumeric runs, dotted codes kept whole, common English stop
+  words dropped; each token maps to a stable 32-bit index (crc32), so there is no vocabulary
+  to store or share between workers
+- document values are BM25 term-frequency weights (``k1``/``b`` against a nominal chunk length)
+- the collection's sparse vector uses Qdrant's ``IDF`` modifier, so inverse document frequency
+  is kept current by Qdrant itself as charts are added
+- a query vector is its distinct tokens with weight 1
+
+At query time the tool prefetches dense and sparse candidates and fuses them with reciprocal
+rank fusion (``hybrid_query``). Collections created before the sparse vector existed keep
+working dense-only until rebuilt (``scripts/create_qdrant_collection.py --mode rebuild``
+computes sparse vectors for the copied points).
+
+Env:
+  HYBRID_SEARCH_ENABLED — fuse sparse + dense when the collection has the sparse vector (default true)
+  HYBRID_PREFETCH_LIMIT — candidates taken from each of the dense and sparse searches (default 100)
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple, Union
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from app.services.fhir_chunker import FHIR_CHUNK_MAX_TOKENS
+
+HYBRID_SEARCH_ENABLED = (os.getenv("HYBRID_SEARCH_ENABLED") or "true").strip().lower() == "true"
+HYBRID_PREFETCH_LIMIT = int(os.getenv("HYBRID_PREFETCH_LIMIT", "100"))
+
+SPARSE_VECTOR_NAME = "text"
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Chunks are packed up to the token budget, so most are close to it.
+BM25_AVG_TOKENS = FHIR_CHUNK_MAX_TOKENS * 0.8
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were "
+    "with what which who when how does did do any all his her their patient patients".split()
+)
+_SUPPORT_TTL_SECONDS = 300.0
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOP_WORDS]
+
+
+def token_index(token: str) -> int:
+    return zlib.crc32(token.encode("utf-8"))
+
+
+def _sparse(weights: Dict[int, float]) -> models.SparseVector:
+    indices = sorted(weights)
+    return models.SparseVector(indices=indices, values=[weights[i] for i in indices])
+
+
+def document_sparse_vector(text: str) -> models.SparseVector:
+    """BM25 term-frequency weights of one chunk (IDF is applied by Qdrant)."""
+    tokens = tokenize(text)
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / BM25_AVG_TOKENS)
+    weights: Dict[int, float] = {}
+    for token, tf in Counter(tokens).items():
+        index = token_index(token)
+        # crc32 collisions are rare; colliding tokens just share a weight.
+        weights[index] = weights.get(index, 0.0) + round(tf * (BM25_K1 + 1) / (tf + norm), 4)
+    return _sparse(weights)
+
+
+def query_sparse_vector(text: str) -> models.SparseVector:
+    return _sparse({token_index(t): 1.0 for t in tokenize(text)})
+
+
+def sparse_vectors_config() -> Dict[str, models.SparseVectorParams]:
+    return {SPARSE_VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF)}
+
+
+_support: Dict[Tuple[int, str], Tuple[float, bool]] = {}
+_support_lock = threading.Lock()
+
+
+def collection_has_sparse(client: QdrantClient, collection_name: str) -> bool:
+    """
+    Whether the collection (or the collection behind the alias) has the sparse vector.
+    Cached per client for a few minutes so a rebuilt collection is picked up without a restart.
+    """
+    key = (id(client), collection_name)
+    now = time.monotonic()
+    with _support_lock:
+        cached = _support.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+    sparse = client.get_collection(collection_name).config.params.sparse_vectors or {}
+    supported = SPARSE_VECTOR_NAME in sparse
+    with _support_lock:
+        _support[key] = (now + _SUPPORT_TTL_SECONDS, supported)
+    return supported
+
+
+def hybrid_query(
+    client: QdrantClient,
+    collection_name: str,
+    query: str,
+    dense_vector: List[float],
+    query_filter: Optional[models.Filter],
+    limit: int,
+    score_threshold: Optional[float] = None,
+    prefetch_limit: int = HYBRID_PREFETCH_LIMIT,
+    with_payload: Union[bool, List[str]] = True,
+    search_params: Optional[models.SearchParams] = None,
+) -> List[models.ScoredPoint]:
+    """
+    Dense and sparse candidates (each filtered, dense ones above ``score_threshold``) fused by
+    reciprocal rank fusion. Falls back to the dense search alone when the query has no sparse
+    tokens. Scores are RRF scores, not cosine similarities. ``search_params`` apply to the dense
+    search (quantization rescoring).
+    """
+    sparse = query_sparse_vector(query)
+    if not sparse.indices:
+        return client.query_points(
+            collection_name=collection_name, query=dense_vector, query_filter=query_filter,
+            limit=limit, score_threshold=score_threshold, with_payload=with_payload, search_params=search_params,
+        ).points
+    return client.query_points(
+        collection_name=collection_name,
+        prefetch=[
+            models.Prefetch(
+                query=dense_vector, filter=query_filter, params=search_params, limit=prefetch_limit,
+                score_threshold=score_threshold,
+            ),
+            models.Prefetch(query=sparse, using=SPARSE_VECTOR_NAME, filter=query_filter, limit=prefetch_limit),
+        ],
+        query=models.FusionQuery(fusion=models.Fusion.RRF),
+        query_filter=query_filter,
+        limit=limit,
+        with_payload=with_payload,
+    ).points
@@ -0,0 +1,106 @@
+"""
+In-process copy of the structured chart sections the fast path answers from.
+
+``get_patient_info`` fetches every section as FHIR and then only keeps it as embedded text. For
+the sections plain lookups are about (``STRUCTURED_SECTIONS``), it also stores the projected
+bundle here under (practice, patient_id, section) together with its section hash. ``get``
+returns an entry only while the caller's section hash (from the embedding manifest) is the
+same, so an entry is never used after the section changed, whichever worker re-ingested it.
+A structured section the change pre-check would skip as unchanged is still fetched when this
+worker holds no copy with the indexed hash (``has``), so after a restart or an eviction the
+patient's next ingest fills the cache again; list sections are small. Until then a question
+goes down the crew path. A section fetched incompletely (page cap, failed page) is not stored:
+the fast path would otherwise state absences ("no active allergies") from a partial list.
+
+Env:
+  STRUCTURED_SECTION_CACHE_SIZE — sections kept per process (default 4096; 0 disables)
+  STRUCTURED_SECTION_CACHE_TTL_SECONDS — entry lifetime (default 43200, half a day)
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+STRUCTURED_SECTION_CACHE_SIZE = int(os.getenv("STRUCTURED_SECTION_CACHE_SIZE", "4096"))
+STRUCTURED_SECTION_CACHE_TTL_SECONDS = float(os.getenv("STRUCTURED_SECTION_CACHE_TTL_SECONDS", "43200"))
+
+# Sections with a deterministic renderer in ``fast_path``.
+STRUCTURED_SECTIONS = frozenset({"medications", "allergies", "conditions", "tasks"})
+
+Key = Tuple[str, str, str]
+
+
+class StructuredSectionCache:
+    """Thread-safe LRU of (section hash, projected section) with per-entry expiry."""
+
+    def __init__(
+        self,
+        max_entries: int = STRUCTURED_SECTION_CACHE_SIZE,
+        ttl_seconds: float = STRUCTURED_SECTION_CACHE_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Key, Tuple[float, str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stale": 0, "expired": 0, "evicted": 0, "incomplete": 0}
+
+    def put(
+        self, practice_url: str, patient_id: str, section_name: str, section_hash: str, data: Any,
+        complete: bool = True,
+    ) -> None:
+        """Cache a fetched section; ``complete`` is False when the fetch stopped before the end."""
+        if self.max_entries <= 0 or section_name not in STRUCTURED_SECTIONS or not section_hash:
+            return
+        key = (practice_url, patient_id, section_name)
+        with self._lock:
+            if not complete:
+                self._entries.pop(key, None)
+                self._counters["incomplete"] += 1
+                return
+            self._entries[key] = (self._clock() + self.ttl_seconds, section_hash, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evicted"] += 1
+
+    def has(self, practice_url: str, patient_id: str, section_name: str, section_hash: str) -> bool:
+        """Whether an unexpired copy with ``section_hash`` is held (not counted as a lookup)."""
+        with self._lock:
+            entry = self._entries.get((practice_url, patient_id, section_name))
+            return entry is not None and entry[0] > self._clock() and entry[1] == section_hash
+
+    def get(self, practice_url: str, patient_id: str, section_name: str, section_hash: str) -> Optional[Any]:
+        """The section as fetched, if the cached copy has ``section_hash`` (the indexed one)."""
+        key = (practice_url, patient_id, section_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                del self._entries[key]
+                self._counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            if entry[1] != section_hash:
+                self._counters["stale"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[2]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                **self._counters,
+            }
+
+
+structured_sections = StructuredSectionCache()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark C-CDA handling: streaming narrative extraction (``extract_ccda_text``) against the
+previous path (``xmltodict.parse`` + projection + chunking of the whole tree).
+
+Pass C-CDA XML files, or let the script generate one (``--sections`` x ``--entries``):
+
+  cd server && uv run python scripts/bench_ccda_extraction.py
+  uv run python scripts/bench_ccda_extraction.py --sections 20 --entries 400
+  uv run python scripts/bench_ccda_extraction.py samples/*.xml
+
+Per document it prints parse time, peak Python memory (tracemalloc) and the number of
+chunks / whitespace tokens that would be embedded by each path.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Server package root (parent of scripts/)
+_ROOT = Path(__file__).resolve().parent.parent
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+from app.services.ccda_extractor import NARRATIVE_SECTIONS, extract_ccda_text  # noqa: E402
+from app.services.fhir_chunker import FHIR_CHUNK_MAX_TOKENS, chunk_section, count_tokens  # noqa: E402
+from app.services.fhir_projection import project_section  # noqa: E402
+from app.services.patient_info_service import parse_xml_blocking  # noqa: E402
+
+
+def synthetic_ccda(sections: int, entries: int) -> bytes:
+    codes = list(NARRATIVE_SECTIONS)
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<ClinicalDocument xmlns="urn:hl7-org:v3" xmlns:sdtc="urn:hl7-org:sdtc">',
+             '<templateId root="2.16.840.1.113883.10.20.22.1.1" extension="2015-08-01"/>',
+             '<title>Continuity of Care Document</title><component><structuredBody>']
+    for s in range(sections):
+        code = codes[s % len(codes)]
+        rows = "".join(
+            f'<tr><td><content ID="s{s}r{e}">Finding {e} for section {s}</content></td>'
+            f"<td>2024-01-{e % 28 + 1:02d}</td><td>Active</td></tr>"
+            for e in range(entries)
+        )
+        structured = "".join(
+            f'<entry typeCode="DRIV"><act classCode="ACT" moodCode="EVN">'
+            f'<templateId root="2.16.840.1.113883.10.20.22.4.3" extension="2015-08-01"/>'
+            f'<id root="{s}.{e}.1.2.3.4"/><code code="CONC" codeSystem="2.16.840.1.113883.5.6"/>'
+            f'<statusCode code="active"/><effectiveTime><low value="20240101"/></effectiveTime>'
+            f'<entryRelationship typeCode="SUBJ"><observation classCode="OBS" moodCode="EVN">'
+            f'<code code="55607006" codeSystem="2.16.840.1.113883.6.96" displayName="Problem"/>'
+            f'<text><reference value="#s{s}r{e}"/></text>'
+            f'<value xsi:type="CD" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" code="44054006"'
+            f' codeSystem="2.16.840.1.113883.6.96" displayName="Finding {e}"/></observation></entryRelationship>'
+            f"</act></entry>"
+            for e in range(entries)
+        )
+        parts.append(
+            f'<component><section><templateId root="2.16.840.1.113883.10.20.22.2.{s}"/>'
+            f'<code code="{code}" codeSystem="2.16.840.1.113883.6.1"/><title>{NARRATIVE_SECTIONS[code]}</title>'
+            f"<text><table><thead><tr><th>Item</th><th>Date</th><th>Status</th></tr></thead>"
+            f"<tbody>{rows}</tbody></table></text>{structured}</section></component>"
+        )
+    parts.append("</structuredBody></component></ClinicalDocument>")
+    return "".join(parts).encode("utf-8")
+
+
+def _measure(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    chunks = fn()
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, chunks
+
+
+def legacy_chunks(xml: bytes, max_tokens: int):
+    doc = {"title": "ccda", "content_xml": parse_xml_blocking(xml.decode("utf-8"))}
+    return chunk_section([{"ccda": project_section(doc)}], max_tokens)
+
+
+def streaming_chunks(xml: bytes, max_tokens: int):
+    doc = {"title": "ccda", "content_text": extract_ccda_text(xml)}
+    return chunk_section([{"ccda": project_section(doc)}], max_tokens)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", type=Path)
+    parser.add_argument("--sections", type=int, default=12)
+    parser.add_argument("--entries", type=int, default=200, help="Rows / structured entries per section")
+    parser.add_argument("--max-tokens", type=int, default=FHIR_CHUNK_MAX_TOKENS)
+    args = parser.parse_args()
+
+    docs = [(p.name, p.read_bytes()) for p in args.files] or [
+        (f"synthetic {args.sections}x{args.entries}", synthetic_ccda(args.sections, args.entries))
+    ]
+    header = f"{'document':<28} {'path':<10} {'MB':>6} {'parse+chunk s':>14} {'peak MB':>8} {'chunks':>7} {'tokens':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, xml in docs:
+        for label, fn in (("xmltodict", legacy_chunks), ("iterparse", streaming_chunks)):
+            seconds, peak, chunks = _measure(lambda: fn(xml, args.max_tokens))
+            print(
+                f"{name[:28]:<28} {label:<10} {len(xml) / 2**20:>6.1f} {seconds:>14.3f} {peak / 2**20:>8.1f}"
+                f" {len(chunks):>7} {sum(count_tokens(c) for c in chunks):>8}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-request CrewAI construction: compiling the crew for every query (parse the YAML
+agent/task configs, then build Agent / Task / Crew, as ``ClinicalAssistantCrew()`` did) against
+building from the process-wide ``ClinicalCrewTemplate`` (config and LLM handle compiled once).
+
+No LLM or Bedrock call is made; only construction is timed.
+
+  cd server && MODEL=bedrock/<model-id> uv run python scripts/bench_crew_build.py
+  MODEL=bedrock/<model-id> uv run python scripts/bench_crew_build.py --runs 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Server package root (parent of scripts/)
+_ROOT = Path(__file__).resolve().parent.parent
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+_started = time.perf_counter()
+from app.crew.crew import ClinicalCrewTemplate, get_crew_template  # noqa: E402
+
+IMPORT_S = time.perf_counter() - _started
+
+
+def _time(fn, runs: int):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.mean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.95) - 1]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    get_crew_template().build()
+    warmup_ms = (time.perf_counter() - started) * 1000
+    print(f"import app.crew.crew: {IMPORT_S:.2f} s (paid once at app start)")
+    print(f"warmup (compile + first build): {warmup_ms:.1f} ms")
+
+    header = f"{'path':<28} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for label, fn in (
+        ("compile per request", lambda: ClinicalCrewTemplate().build()),
+        ("prebuilt template", lambda: get_crew_template().build()),
+    ):
+        mean, p50, p95 = _time(fn, args.runs)
+        print(f"{label:<28} {mean:>8.2f} {p50:>8.2f} {p95:>8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark the embedding micro-batcher against a local stub backend (no AWS calls).
+
+The stub models a batch-capable embedding endpoint: every call pays a fixed overhead
+(``--call-ms``) plus a per-text cost (``--item-ms``), and at most ``--parallel-calls`` calls
+run at once (the Bedrock concurrency budget). Concurrent callers each embed a chart's worth
+of chunks, with ``--overlap`` of their texts shared (boilerplate chunks, repeated asks).
+
+Run from the server directory:
+
+  cd server && uv run python scripts/bench_embedding_batcher.py
+  uv run python scripts/bench_embedding_batcher.py --callers 16 --texts 100 --configs 1:0,32:5,128:20
+
+Each config is ``max_batch_items:max_wait_ms``; ``1:0`` is the unbatched baseline.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Server package root (parent of scripts/)
+_ROOT = Path(__file__).resolve().parent.parent
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+from app.services.embedding_batcher import EmbeddingMicroBatcher  # noqa: E402
+
+
+class StubBatchBackend:
+    """Sleeps call_ms + item_ms * len(texts) per call, with bounded call parallelism."""
+
+    def __init__(self, call_ms: float, item_ms: float, parallel_calls: int):
+        self.call_s = call_ms / 1000.0
+        self.item_s = item_ms / 1000.0
+        self._slots = threading.Semaphore(parallel_calls)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def embed_batch(self, texts):
+        with self._slots:
+            with self._lock:
+                self.calls += 1
+            time.sleep(self.call_s + self.item_s * len(texts))
+        return [[0.0] for _ in texts]
+
+
+def _caller_texts(caller: int, count: int, overlap: float):
+    shared = int(count * overlap)
+    return [f"shared chunk {i}" for i in range(shared)] + [
+        f"caller {caller} chunk {i}" for i in range(count - shared)
+    ]
+
+
+def run_config(args, max_items: int, max_wait_ms: float) -> dict:
+    backend = StubBatchBackend(args.call_ms, args.item_ms, args.parallel_calls)
+    batcher = EmbeddingMicroBatcher(
+        backend,
+        max_batch_items=max_items,
+        max_wait_ms=max_wait_ms,
+        max_concurrent_batches=args.parallel_calls,
+    )
+    latencies = []
+    lock = threading.Lock()
+
+    def caller(n: int):
+        texts = _caller_texts(n, args.texts, args.overlap)
+        start = time.perf_counter()
+        batcher.embed_many(texts)
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=caller, args=(n,)) for n in range(args.callers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    stats = batcher.stats()
+    batcher.shutdown()
+
+    latencies.sort()
+    return {
+        "config": f"{max_items}:{max_wait_ms:g}",
+        "wall_s": wall,
+        "texts_per_s": args.callers * args.texts / wall,
+        "backend_calls": backend.calls,
+        "avg_batch": stats["avg_batch_size"],
+        "dedup_saved": stats["dedup_saved"],
+        "p50_ms": 1000 * statistics.median(latencies),
+        "p95_ms": 1000 * latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callers", type=int, default=8, help="Concurrent chunk_and_embed callers")
+    parser.add_argument("--texts", type=int, default=60, help="Texts per caller")
+    parser.add_argument("--overlap", type=float, default=0.2, help="Fraction of texts shared by all callers")
+    parser.add_argument("--call-ms", type=float, default=25.0, help="Fixed stub overhead per backend call")
+    parser.add_argument("--item-ms", type=float, default=1.0, help="Stub cost per text in a call")
+    parser.add_argument("--parallel-calls", type=int, default=8, help="Concurrent backend calls allowed")
+    parser.add_argument("--configs", default="1:0,8:2,32:5,64:10,128:20")
+    args = parser.parse_args()
+
+    print(
+        f"{args.callers} callers x {args.texts} texts, overlap {args.overlap:.0%}, "
+        f"stub {args.call_ms:g}ms/call + {args.item_ms:g}ms/text, {args.parallel_calls} parallel calls"
+    )
+    header = f"{'config':>10} {'wall s':>8} {'texts/s':>9} {'calls':>7} {'avg batch':>10} {'dedup':>6} {'p50 ms':>8} {'p95 ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for spec in args.configs.split(","):
+        items, wait = spec.split(":")
+        r = run_config(args, int(items), float(wait))
+        print(
+            f"{r['config']:>10} {r['wall_s']:>8.2f} {r['texts_per_s']:>9.0f} {r['backend_calls']:>7} "
+            f"{r['avg_batch']:>10.1f} {r['dedup_saved']:>6} {r['p50_ms']:>8.0f} {r['p95_ms']:>8.0f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
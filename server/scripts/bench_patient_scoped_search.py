@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Search latency vs collection size: unscoped vs patient-scoped (indexed patient_id) searches.
+
+The assistant tool used to search the whole practice collection unless the agent passed a
+patient filter; it now always filters on ``patient_id`` (and optionally ``section_name``).
+This grows one collection step by step and times, at each size:
+
+  unscoped         no filter (the old default)
+  patient          patient_id filter, as every tool search now issues
+  patient+section  patient_id + section_name filter
+
+Start Qdrant locally first (the benchmark creates and drops ``bench_scoped``):
+
+  docker run -p 6333:6333 qdrant/qdrant
+
+Then, from the server directory:
+
+  cd server && uv run python scripts/bench_patient_scoped_search.py
+  uv run python scripts/bench_patient_scoped_search.py --sizes 100,1000,5000 --chunks 40 --profile tenant-sq
+  uv run python scripts/bench_patient_scoped_search.py --url :memory: --sizes 50,200   # smoke test, no indexes
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+# Server package root (parent of scripts/)
+_ROOT = Path(__file__).resolve().parent.parent
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+from app.services.qdrant_collection_profiles import (  # noqa: E402
+    PROFILES,
+    VECTOR_SIZE,
+    create_collection,
+    verify_search_indexes,
+)
+
+SECTIONS = ["encounters", "medications", "allergies", "conditions", "diagnostic_reports", "document_references"]
+COLLECTION = "bench_scoped"
+
+
+def _unit_vectors(rng: np.random.Generator, n: int, dim: int) -> np.ndarray:
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _add_patients(client: QdrantClient, start: int, stop: int, chunks: int, rng: np.random.Generator) -> None:
+    batch = []
+    for p in range(start, stop):
+        # Each chart clusters around its own centre, like real per-patient chunk sets.
+        centre = _unit_vectors(rng, 1, VECTOR_SIZE)[0]
+        vectors = centre + 0.7 * _unit_vectors(rng, chunks, VECTOR_SIZE)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        for c in range(chunks):
+            batch.append(models.PointStruct(
+                id=str(uuid.uuid4()),
+                vector=vectors[c].tolist(),
+                payload={"patient_id": f"patient-{p}", "section_name": SECTIONS[c % len(SECTIONS)]},
+            ))
+            if len(batch) >= 512:
+                client.upsert(collection_name=COLLECTION, points=batch, wait=False)
+                batch = []
+    if batch:
+        client.upsert(collection_name=COLLECTION, points=batch, wait=True)
+
+
+def _wait_indexed(client: QdrantClient, timeout: float = 600) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.get_collection(COLLECTION).status == models.CollectionStatus.GREEN:
+            return
+        time.sleep(1)
+
+
+def _time_searches(client: QdrantClient, args, patients: int, pick: random.Random, queries: np.ndarray) -> dict:
+    latencies = {"unscoped": [], "patient": [], "patient+section": []}
+    for q in queries:
+        patient = models.FieldCondition(
+            key="patient_id", match=models.MatchValue(value=f"patient-{pick.randrange(patients)}")
+        )
+        section = models.FieldCondition(key="section_name", match=models.MatchValue(value=pick.choice(SECTIONS)))
+        for label, flt in (
+            ("unscoped", None),
+            ("patient", models.Filter(must=[patient])),
+            ("patient+section", models.Filter(must=[patient, section])),
+        ):
+            t0 = time.perf_counter()
+            client.query_points(collection_name=COLLECTION, query=q.tolist(), query_filter=flt, limit=args.limit)
+            latencies[label].append(time.perf_counter() - t0)
+    return latencies
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:6333", help="Qdrant URL, or :memory: for local mode")
+    parser.add_argument("--sizes", default="100,500,2000", help="Collection sizes in patients, ascending")
+    parser.add_argument("--chunks", type=int, default=40, help="Points per patient")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=100, help="Search limit (the tool asks for 100 candidates)")
+    parser.add_argument("--profile", default="tenant", choices=sorted(PROFILES))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="Keep the bench_scoped collection afterwards")
+    args = parser.parse_args()
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+
+    client = QdrantClient(location=":memory:") if args.url == ":memory:" else QdrantClient(url=args.url, timeout=120)
+    if client.collection_exists(COLLECTION):
+        client.delete_collection(COLLECTION)
+    create_collection(client, COLLECTION, PROFILES[args.profile])
+    missing = verify_search_indexes(client, COLLECTION)
+    print(f"profile {args.profile}, {args.chunks} chunks/patient, {args.queries} queries, limit {args.limit} @ {args.url}"
+          + (f" (created missing indexes: {', '.join(missing)})" if missing else ""))
+
+    header = f"{'patients':>9} {'points':>9}" + "".join(
+        f" {label + ' p50':>20} {label + ' p95':>20}" for label in ("unscoped", "patient", "patient+section")
+    )
+    print(header)
+    print("-" * len(header))
+
+    def pct(values, q):
+        values = sorted(values)
+        return 1000 * values[min(len(values) - 1, int(q * len(values)))]
+
+    rng = np.random.default_rng(args.seed)
+    queries = _unit_vectors(np.random.default_rng(args.seed + 1), args.queries, VECTOR_SIZE)
+    loaded = 0
+    for size in sizes:
+        _add_patients(client, loaded, size, args.chunks, rng)
+        loaded = size
+        _wait_indexed(client)
+        latencies = _time_searches(client, args, size, random.Random(args.seed), queries)
+        print(f"{size:>9} {size * args.chunks:>9}" + "".join(
+            f" {1000 * statistics.median(values):>20.2f} {pct(values, 0.95):>20.2f}" for values in latencies.values()
+        ))
+
+    if not args.keep:
+        client.delete_collection(COLLECTION)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
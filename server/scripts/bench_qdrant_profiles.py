@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Compare Qdrant collection profiles on synthetic chart data against a local Qdrant server.
+
+Start Qdrant locally first (the benchmark creates and drops ``bench_*`` collections):
+
+  docker run -p 6333:6333 qdrant/qdrant
+
+Then, from the server directory:
+
+  cd server && uv run python scripts/bench_qdrant_profiles.py
+  uv run python scripts/bench_qdrant_profiles.py --patients 2000 --chunks 40 --profiles baseline,tenant,tenant-sq
+
+Per profile it reports filtered search latency (patient_id, and patient_id + section_name,
+which is what the assistant tool and ingest scrolls issue), recall@k against an exact search,
+the estimated vector RAM, and the Qdrant process resident-memory delta from ``/telemetry``
+(only meaningful when nothing else runs on that Qdrant).
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+# Server package root (parent of scripts/)
+_ROOT = Path(__file__).resolve().parent.parent
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+from app.services.qdrant_collection_profiles import PROFILES, VECTOR_SIZE, create_collection  # noqa: E402
+
+SECTIONS = ["conditions", "medications", "observations", "encounters", "procedures", "documents"]
+
+
+def _resident_bytes(url: str):
+    try:
+        memory = httpx.get(f"{url}/telemetry", params={"details_level": 1}, timeout=10).json()["result"].get("memory")
+        return (memory or {}).get("resident_bytes")
+    except Exception:
+        return None
+
+
+def _unit_vectors(rng: np.random.Generator, n: int, dim: int) -> np.ndarray:
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _load(client: QdrantClient, name: str, args, rng: np.random.Generator) -> None:
+    batch = []
+    for p in range(args.patients):
+        patient_id = f"patient-{p}"
+        # Each chart clusters around its own centre, like real per-patient chunk sets.
+        centre = _unit_vectors(rng, 1, VECTOR_SIZE)[0]
+        noise = _unit_vectors(rng, args.chunks, VECTOR_SIZE)
+        vectors = centre + 0.7 * noise
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        for c in range(args.chunks):
+            batch.append(
+                models.PointStruct(
+                    id=str(uuid.uuid4()),
+                    vector=vectors[c].tolist(),
+                    payload={
+                        "patient_id": patient_id,
+                        "section_name": SECTIONS[c % len(SECTIONS)],
+                        "patient_hash": f"h{p}",
+                        "patient_text": f"synthetic chunk {c} for {patient_id}",
+                    },
+                )
+            )
+            if len(batch) >= 512:
+                client.upsert(collection_name=name, points=batch, wait=False)
+                batch = []
+    if batch:
+        client.upsert(collection_name=name, points=batch, wait=True)
+
+
+def _wait_indexed(client: QdrantClient, name: str, timeout: float = 600) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info = client.get_collection(name)
+        if info.status == models.CollectionStatus.GREEN:
+            return
+        time.sleep(1)
+
+
+def _query(client, name, vector, query_filter, limit, params=None):
+    return client.query_points(
+        collection_name=name, query=vector, query_filter=query_filter, limit=limit, search_params=params
+    ).points
+
+
+def run_profile(client: QdrantClient, args, profile_name: str) -> dict:
+    profile = PROFILES[profile_name]
+    name = f"bench_{profile_name.replace('-', '_')}"
+    if client.collection_exists(name):
+        client.delete_collection(name)
+
+    rss_before = _resident_bytes(args.url)
+    create_collection(client, name, profile)
+    rng = np.random.default_rng(args.seed)
+    started = time.perf_counter()
+    _load(client, name, args, rng)
+    _wait_indexed(client, name)
+    load_s = time.perf_counter() - started
+    rss_after = _resident_bytes(args.url)
+
+    pick = random.Random(args.seed)
+    queries = _unit_vectors(np.random.default_rng(args.seed + 1), args.queries, VECTOR_SIZE)
+    latencies = {"patient": [], "patient+section": []}
+    recalls = []
+    for q in queries:
+        patient = models.FieldCondition(key="patient_id", match=models.MatchValue(value=f"patient-{pick.randrange(args.patients)}"))
+        section = models.FieldCondition(key="section_name", match=models.MatchValue(value=pick.choice(SECTIONS)))
+        for label, flt in (
+            ("patient", models.Filter(must=[patient])),
+            ("patient+section", models.Filter(must=[patient, section])),
+        ):
+            t0 = time.perf_counter()
+            hits = _query(client, name, q.tolist(), flt, args.k, profile.search_params())
+            latencies[label].append(time.perf_counter() - t0)
+            if label == "patient":
+                exact = _query(client, name, q.tolist(), flt, args.k, models.SearchParams(exact=True))
+                truth = {h.id for h in exact}
+                if truth:
+                    recalls.append(len(truth & {h.id for h in hits}) / len(truth))
+
+    points = args.patients * args.chunks
+    full = points * VECTOR_SIZE * 4
+    quantized = {"scalar": points * VECTOR_SIZE, "binary": points * VECTOR_SIZE // 8}.get(profile.quantization, 0)
+    est_ram = quantized + (0 if profile.on_disk_vectors else full)
+    if not args.keep:
+        client.delete_collection(name)
+
+    def pct(values, q):
+        values = sorted(values)
+        return 1000 * values[min(len(values) - 1, int(q * len(values)))]
+
+    return {
+        "profile": profile_name,
+        "load_s": load_s,
+        "p50_patient": 1000 * statistics.median(latencies["patient"]),
+        "p95_patient": pct(latencies["patient"], 0.95),
+        "p50_section": 1000 * statistics.median(latencies["patient+section"]),
+        "p95_section": pct(latencies["patient+section"], 0.95),
+        "recall": statistics.mean(recalls) if recalls else float("nan"),
+        "est_ram_mb": est_ram / 2**20,
+        "rss_delta_mb": (rss_after - rss_before) / 2**20 if rss_before and rss_after else float("nan"),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:6333")
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--chunks", type=int, default=40, help="Points per patient")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5, help="Search limit (the tool uses 5)")
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="Keep bench_* collections afterwards")
+    args = parser.parse_args()
+
+    client = QdrantClient(url=args.url, timeout=120)
+    print(f"{args.patients} patients x {args.chunks} chunks, {args.queries} queries, k={args.k} @ {args.url}")
+    header = (
+        f"{'profile':>10} {'load s':>7} {'p50 pid':>8} {'p95 pid':>8} {'p50 pid+sec':>12} {'p95 pid+sec':>12}"
+        f" {'recall':>7} {'est RAM MB':>11} {'RSS Δ MB':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for name in args.profiles.split(","):
+        r = run_profile(client, args, name.strip())
+        print(
+            f"{r['profile']:>10} {r['load_s']:>7.1f} {r['p50_patient']:>8.2f} {r['p95_patient']:>8.2f}"
+            f" {r['p50_section']:>12.2f} {r['p95_section']:>12.2f} {r['recall']:>7.3f}"
+            f" {r['est_ram_mb']:>11.1f} {r['rss_delta_mb']:>9.1f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark section hashing: the streaming ``hash_patient_data`` against the previous
+implementation (``clean_patient_data`` deep copies + ``json.dumps`` + one sha256).
+
+Uses a synthetic chart (``--entries`` resources per Bundle) unless saved FHIR responses are
+passed (a Bundle, a single resource, or a JSON list of them):
+
+  cd server && uv run python scripts/bench_section_hash.py
+  uv run python scripts/bench_section_hash.py --entries 2000 --repeat 20
+  uv run python scripts/bench_section_hash.py samples/*.json
+
+Each payload is hashed in both shapes ``get_patient_info`` produces: the queued
+``[{section_name: data}]`` list and the bare ``[bundle]``. The script exits non-zero if the two
+implementations ever disagree.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+import timeit
+from pathlib import Path
+
+# Server package root (parent of scripts/)
+_ROOT = Path(__file__).resolve().parent.parent
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+from app.services.patient_info_service import clean_patient_data, hash_patient_data  # noqa: E402
+
+
+def legacy_hash(patient_data) -> str:
+    cleaned = clean_patient_data(patient_data)
+    text = "[" + ",".join(json.dumps(obj, sort_keys=True, separators=(",", ":")) for obj in cleaned) + "]"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def synthetic_bundle(entries: int) -> dict:
+    return {
+        "resourceType": "Bundle",
+        "id": "bench",
+        "meta": {"lastUpdated": "2024-01-01T00:00:00Z"},
+        "type": "searchset",
+        "total": entries,
+        "link": [{"relation": "self", "url": "https://fhir.example/Observation?patient=1"}],
+        "entry": [
+            {
+                "fullUrl": f"https://fhir.example/Observation/{i}",
+                "search": {"mode": "match"},
+                "resource": {
+                    "resourceType": "Observation",
+                    "id": str(i),
+                    "meta": {"versionId": "1", "lastUpdated": "2024-01-01T00:00:00Z"},
+                    "status": "final",
+                    "category": [{"coding": [{"system": "http://terminology.hl7.org/CodeSystem/observation-category",
+                                              "code": "vital-signs", "display": "Vital Signs"}]}],
+                    "code": {"coding": [{"system": "http://loinc.org", "code": "8310-5",
+                                         "display": "Body temperature"}], "text": "Temperature"},
+                    "subject": {"reference": "Patient/1", "display": "Doe, Jane"},
+                    "effectiveDateTime": f"2024-01-{i % 28 + 1:02d}T09:30:00Z",
+                    "valueQuantity": {"value": 36.5 + (i % 10) / 10, "unit": "°C", "system": "http://unitsofmeasure.org",
+                                      "code": "Cel"},
+                    "note": [{"text": f"Reading {i} taken at rest; patient reports feeling well."}],
+                },
+            }
+            for i in range(entries)
+        ],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", type=Path)
+    parser.add_argument("--entries", type=int, default=500, help="Resources in the synthetic Bundle")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.files:
+        payloads = []
+        for path in args.files:
+            data = json.loads(path.read_text())
+            payloads.extend((path.name, item) for item in (data if isinstance(data, list) else [data]))
+    else:
+        payloads = [(f"synthetic x{args.entries}", synthetic_bundle(args.entries))]
+
+    header = f"{'payload':<32} {'shape':<8} {'legacy ms':>10} {'stream ms':>10} {'speedup':>8}"
+    print(header)
+    print("-" * len(header))
+    mismatches = 0
+    for label, data in payloads:
+        for shape, section in (("queued", [{"section": data}]), ("bare", [data])):
+            if hash_patient_data(section) != legacy_hash(section):
+                mismatches += 1
+                print(f"{label[:32]:<32} {shape:<8} MISMATCH")
+                continue
+            legacy = min(timeit.repeat(lambda: legacy_hash(section), number=1, repeat=args.repeat))
+            stream = min(timeit.repeat(lambda: hash_patient_data(section), number=1, repeat=args.repeat))
+            print(f"{label[:32]:<32} {shape:<8} {1000 * legacy:>10.2f} {1000 * stream:>10.2f} {legacy / stream:>7.1f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
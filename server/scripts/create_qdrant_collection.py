@@ -2,20 +2,42 @@
 """
 Standalone script to create Qdrant collections for urology agent practices.
 
+Collections are built from a declarative profile (app/services/qdrant_collection_profiles.py):
+payload indexes on patient_id (tenant), section_name and patient_hash, HNSW parameters,
+quantization, on-disk vectors and the BM25 sparse vector used for hybrid search.
+
 Usage:
-    python create_qdrant_collection.py <practice_url>
-    
+    python create_qdrant_collection.py <practice_url> [--profile tenant] [--mode create|migrate|rebuild]
+
 Example:
     python create_qdrant_collection.py ocua
-    python create_qdrant_collection.py anotherpractice
+    python create_qdrant_collection.py ocua --mode migrate            # apply profile in place
+    python create_qdrant_collection.py ocua --mode rebuild --profile tenant-sq
+    python create_qdrant_collection.py --list-profiles
+
+Modes:
+    create   New collection (asks before deleting an existing one; a recreated collection is empty,
+             so the practice's embedding manifest and source checkpoints are resynced with it)
+    migrate  Update HNSW / quantization / on-disk settings and payload indexes in place
+    rebuild  Copy points into a fresh collection with the profile and switch alias <practice_url> to it
+             (the only way to add the sparse vector to an existing collection). Ingest may keep
+             running: afterwards the manifest is reconciled with the new collection and source
+             checkpoints are cleared, so points written during the copy are re-embedded on the
+             patient's next ingest
 """
 
+import argparse
 import sys
 import os
 import logging
 from pathlib import Path
 from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PayloadSchemaType
+
+# Server package root (parent of scripts/)
+_ROOT = Path(__file__).resolve().parent.parent
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
 
 # Load environment variables from .env file
 def load_env():
@@ -35,124 +57,191 @@ def load_env():
 # Load environment variables at startup
 load_env()
 
-def create_collection(practice_url: str):
-    """
-    Create a Qdrant collection for a specific practice with proper configuration
-    
-    Args:
-        practice_url: The practice URL that will be used as the collection name
-    """
-    
+# After the environment is loaded: the manifest/checkpoint stores read their settings at import.
+from app.services.embedding_manifest_reconcile import resync_practice_ingest_state  # noqa: E402
+from app.services.qdrant_collection_profiles import (  # noqa: E402
+    DEFAULT_PROFILE,
+    PROFILES,
+    create_collection as create_profile_collection,
+    get_profile,
+    migrate_collection,
+    rebuild_collection,
+)
+from app.services.sparse_vectors import collection_has_sparse  # noqa: E402
+
+def _print_collection(client: QdrantClient, collection_name: str):
+    collection_info = client.get_collection(collection_name)
+    vectors = collection_info.config.params.vectors
+    print(f"   Collection Name: {collection_name}")
+    print(f"   Vector Size: {vectors.size}")
+    print(f"   Distance Metric: {vectors.distance}")
+    print(f"   Vectors On Disk: {bool(vectors.on_disk)}")
+    print(f"   HNSW: m={collection_info.config.hnsw_config.m} payload_m={collection_info.config.hnsw_config.payload_m}")
+    print(f"   Quantization: {collection_info.config.quantization_config or 'none'}")
+    print(f"   Sparse Vectors: {', '.join(sorted(collection_info.config.params.sparse_vectors or {})) or 'none'}")
+    print(f"   Payload Indexes: {', '.join(sorted(collection_info.payload_schema or {})) or 'none'}")
+    print(f"   Points Count: {collection_info.points_count}")
+
+
+def _connect():
     # Get Qdrant connection details from environment
     qdrant_url = os.getenv("QDRANT_URL")
     qdrant_api_key = os.getenv("QDRANT_API_KEY")
-    
+
     if not qdrant_url:
         print("❌ ERROR: QDRANT_URL environment variable not set")
         print("   Please set QDRANT_URL in your .env file")
-        return False
-    
+        return None
+
     print(f"🔗 Connecting to Qdrant at: {qdrant_url}")
-    
+    return QdrantClient(url=qdrant_url, api_key=qdrant_api_key, timeout=120)
+
+
+def create_collection(practice_url: str, profile_name: str = DEFAULT_PROFILE, assume_yes: bool = False):
+    """
+    Create a Qdrant collection for a specific practice with proper configuration
+
+    Args:
+        practice_url: The practice URL that will be used as the collection name
+        profile_name: Collection profile to build from
+        assume_yes: Recreate an existing collection without prompting
+    """
+    client = _connect()
+    if client is None:
+        return False
+
     try:
-        # Initialize Qdrant client
-        client = QdrantClient(
-            url=qdrant_url,
-            api_key=qdrant_api_key
-        )
-        
+        profile = get_profile(profile_name)
         collection_name = practice_url
-        
+
         # Check if collection already exists
-        try:
+        if client.collection_exists(collection_name):
             existing_collection = client.get_collection(collection_name)
             print(f"⚠️  Collection '{collection_name}' already exists!")
             print(f"   Points count: {existing_collection.points_count}")
             print(f"   Vector size: {existing_collection.config.params.vectors.size}")
-            
-            response = input("Do you want to recreate it? This will delete all existing data! (y/N): ")
-            if response.lower() != 'y':
-                print("❌ Collection creation cancelled")
-                return False
-                
+            print("   (use --mode migrate or --mode rebuild to keep the data)")
+
+            if not assume_yes:
+                response = input("Do you want to recreate it? This will delete all existing data! (y/N): ")
+                if response.lower() != 'y':
+                    print("❌ Collection creation cancelled")
+                    return False
+
             # Delete existing collection
             client.delete_collection(collection_name)
             print(f"🗑️  Deleted existing collection: {collection_name}")
-            
-        except Exception:
+        else:
             print(f"✅ Collection '{collection_name}' doesn't exist - will create new one")
-        
-        # Create collection with proper vector configuration
-        print(f"🏗️  Creating collection: {collection_name}")
-        client.create_collection(
-            collection_name=collection_name,
-            vectors_config=VectorParams(
-                size=1024,  # Amazon Titan embedding size
-                distance=Distance.COSINE
-            )
-        )
+
+        print(f"🏗️  Creating collection: {collection_name} (profile: {profile.name})")
+        create_profile_collection(client, collection_name, profile)
         print(f"✅ Collection '{collection_name}' created successfully")
-        
-        # Create required indices for filtering
-        print("🔧 Creating indices...")
-        
-        try:
-            # Index for patient_id filtering
-            client.create_payload_index(
-                collection_name=collection_name,
-                field_name="patient_id",
-                field_schema=PayloadSchemaType.KEYWORD
-            )
-            print("   ✅ Created patient_id index")
-            
-            # Index for patient_hash filtering  
-            client.create_payload_index(
-                collection_name=collection_name,
-                field_name="patient_hash",
-                field_schema=PayloadSchemaType.KEYWORD
-            )
-            print("   ✅ Created patient_hash index")
-            
-        except Exception as e:
-            print(f"   ⚠️  Error creating indices (may already exist): {e}")
-        
-        # Verify collection was created properly
-        collection_info = client.get_collection(collection_name)
+        resynced = resync_practice_ingest_state(client, collection_name)
+        if resynced["removed"] or resynced["checkpoints_cleared"]:
+            print(f"   ✅ Cleared {resynced['removed']} manifest rows and {resynced['checkpoints_cleared']} source checkpoints")
+
         print(f"\n🎉 Collection Setup Complete!")
-        print(f"   Collection Name: {collection_name}")
-        print(f"   Vector Size: {collection_info.config.params.vectors.size}")
-        print(f"   Distance Metric: {collection_info.config.params.vectors.distance}")
-        print(f"   Points Count: {collection_info.points_count}")
-        
+        _print_collection(client, collection_name)
         return True
-        
+
     except Exception as e:
         print(f"❌ ERROR: Failed to create collection: {e}")
         return False
 
+
+def migrate_existing_collection(practice_url: str, profile_name: str = DEFAULT_PROFILE):
+    """Apply a profile to an existing collection in place (Qdrant re-optimizes in the background)."""
+    client = _connect()
+    if client is None:
+        return False
+    try:
+        profile = get_profile(profile_name)
+        print(f"🔧 Migrating '{practice_url}' to profile: {profile.name}")
+        rebuilt = migrate_collection(client, practice_url, profile)
+        print(f"   ✅ Collection settings updated; indexes (re)built: {', '.join(rebuilt) or 'none'}")
+        if profile.sparse and not collection_has_sparse(client, practice_url):
+            print("   ⚠️  No sparse vector; searches stay dense-only. Use --mode rebuild to enable hybrid search")
+        _print_collection(client, practice_url)
+        return True
+    except Exception as e:
+        print(f"❌ ERROR: Failed to migrate collection: {e}")
+        return False
+
+
+def rebuild_existing_collection(practice_url: str, profile_name: str = DEFAULT_PROFILE, assume_yes: bool = False):
+    """Copy all points into a new collection built from the profile and switch the alias."""
+    client = _connect()
+    if client is None:
+        return False
+    try:
+        profile = get_profile(profile_name)
+        if not assume_yes:
+            response = input(
+                f"Rebuild '{practice_url}' with profile {profile.name}? (y/N): "
+            )
+            if response.lower() != 'y':
+                print("❌ Rebuild cancelled")
+                return False
+        print(f"🏗️  Rebuilding '{practice_url}' with profile: {profile.name}")
+        result = rebuild_collection(client, practice_url, profile)
+        print(f"   ✅ Copied {result['points']} points from {result['source']} into {result['target']}")
+        print(f"   ✅ Alias '{practice_url}' -> {result['target']}")
+        resynced = result["ingest_state"]
+        print(f"   ✅ Manifest resynced ({resynced['updated']} updated, {resynced['removed']} removed); "
+              f"{resynced['checkpoints_cleared']} source checkpoints cleared")
+        _print_collection(client, practice_url)
+        return True
+    except Exception as e:
+        print(f"❌ ERROR: Failed to rebuild collection: {e}")
+        return False
+
 def main():
     print("🏥 Qdrant Collection Creator for Urology Agent")
     print("=" * 50)
-    
-    if len(sys.argv) != 2:
-        print("❌ Usage: python create_qdrant_collection.py <practice_url>")
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("practice_url", nargs="?", help="Practice URL (== collection name)")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=sorted(PROFILES))
+    parser.add_argument("--mode", default="create", choices=("create", "migrate", "rebuild"))
+    parser.add_argument("--yes", action="store_true", help="Do not prompt before destructive steps")
+    parser.add_argument("--list-profiles", action="store_true")
+    args = parser.parse_args()
+
+    if args.list_profiles:
+        for profile in PROFILES.values():
+            marker = " (default)" if profile.name == DEFAULT_PROFILE else ""
+            print(f"   {profile.name}{marker}: {profile.description}")
+        return
+
+    if not args.practice_url:
+        parser.print_usage()
         print("\nExamples:")
         print("   python create_qdrant_collection.py uropmsandbox460")
-        print("   python create_qdrant_collection.py anotherpractice")
+        print("   python create_qdrant_collection.py anotherpractice --mode migrate")
         sys.exit(1)
-    
-    practice_url = sys.argv[1]
-    
+
+    practice_url = args.practice_url
+
     # Validate practice URL format
     if not practice_url.replace('_', '').replace('-', '').isalnum():
         print(f"❌ Invalid practice URL format: {practice_url}")
         print("   Practice URL should contain only letters, numbers, hyphens, and underscores")
         sys.exit(1)
-    
+
+    if args.mode == "migrate":
+        if not migrate_existing_collection(practice_url, args.profile):
+            sys.exit(1)
+        return
+    if args.mode == "rebuild":
+        if not rebuild_existing_collection(practice_url, args.profile, args.yes):
+            sys.exit(1)
+        return
+
     print(f"📋 Creating collection for practice: {practice_url}")
-    
-    success = create_collection(practice_url)
-    
+
+    success = create_collection(practice_url, args.profile, args.yes)
+
     if success:
         print(f"\n🎯 Next Steps:")
         print(f"   1. Your urology agent is now ready for practice: {practice_url}")
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Evaluate dense, sparse (BM25) and hybrid (RRF-fused) retrieval on synthetic charts.
+
+Synthetic patients get FHIR bundles for medications, conditions (ICD-10), procedures (CPT)
+and lab observations, chunked with the ingest chunker and stored with both vectors, as
+``PatientDataEmbedder`` does for collections built with a sparse profile. Questions ask for a
+drug, code, procedure or lab of one patient; the relevant chunks are that patient's chunks
+mentioning it. Every search is filtered on ``patient_id``, like the assistant tool.
+
+Runs without any services by default (in-process Qdrant, hashed character-trigram vectors as a
+stand-in for Titan embeddings):
+
+  cd server && uv run python scripts/eval_hybrid_retrieval.py
+  uv run python scripts/eval_hybrid_retrieval.py --patients 200 -k 5 --url http://localhost:6333
+  uv run python scripts/eval_hybrid_retrieval.py --embedder bedrock   # real Titan embeddings (AWS credentials)
+
+Reports recall@k, MRR and p50/p95 search latency per mode and per question kind.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import time
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+# Server package root (parent of scripts/)
+_ROOT = Path(__file__).resolve().parent.parent
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+from app.services.fhir_chunker import FHIR_CHUNK_MAX_TOKENS, chunk_section  # noqa: E402
+from app.services.qdrant_collection_profiles import VECTOR_SIZE, create_collection, get_profile  # noqa: E402
+from app.services.sparse_vectors import (  # noqa: E402
+    SPARSE_VECTOR_NAME,
+    document_sparse_vector,
+    hybrid_query,
+    query_sparse_vector,
+)
+
+MEDICATIONS = [
+    "Tamsulosin", "Finasteride", "Dutasteride", "Oxybutynin", "Mirabegron", "Solifenacin", "Tolterodine",
+    "Tadalafil", "Sildenafil", "Ciprofloxacin", "Nitrofurantoin", "Trimethoprim", "Metformin", "Lisinopril",
+    "Atorvastatin", "Leuprolide", "Bicalutamide", "Enzalutamide", "Abiraterone", "Potassium citrate",
+]
+DOSES = ["0.4 mg", "5 mg", "10 mg", "25 mg", "50 mg", "100 mg", "250 mg", "500 mg"]
+CONDITIONS = [
+    ("N40.1", "Benign prostatic hyperplasia with lower urinary tract symptoms"),
+    ("N20.0", "Calculus of kidney"),
+    ("N39.0", "Urinary tract infection, site not specified"),
+    ("N32.81", "Overactive bladder"),
+    ("C61", "Malignant neoplasm of prostate"),
+    ("R31.9", "Hematuria, unspecified"),
+    ("N52.9", "Male erectile dysfunction, unspecified"),
+    ("E11.9", "Type 2 diabetes mellitus without complications"),
+    ("I10", "Essential (primary) hypertension"),
+    ("R33.9", "Retention of urine, unspecified"),
+    ("N13.30", "Unspecified hydronephrosis"),
+    ("C67.9", "Malignant neoplasm of bladder, unspecified"),
+]
+PROCEDURES = [
+    ("52000", "Cystourethroscopy"),
+    ("52601", "Transurethral electrosurgical resection of prostate"),
+    ("55700", "Biopsy of prostate, needle or punch"),
+    ("52356", "Cystourethroscopy with ureteroscopy and lithotripsy"),
+    ("50590", "Lithotripsy, extracorporeal shock wave"),
+    ("51798", "Measurement of post-voiding residual urine by ultrasound"),
+    ("76770", "Ultrasound, retroperitoneal, complete"),
+    ("55250", "Vasectomy, unilateral or bilateral"),
+]
+LABS = [
+    ("PSA", "ng/mL", 0.5, 12.0), ("Creatinine", "mg/dL", 0.6, 2.4), ("eGFR", "mL/min/1.73m2", 30, 110),
+    ("Hemoglobin A1c", "%", 5.0, 9.5), ("Testosterone", "ng/dL", 150, 900), ("Urine culture colony count", "CFU/mL", 1000, 100000),
+    ("Hemoglobin", "g/dL", 10.0, 16.5), ("Potassium", "mmol/L", 3.3, 5.4),
+]
+DATES = [f"2025-{m:02d}-{d:02d}" for m in range(1, 13) for d in (3, 11, 19, 27)]
+
+
+def _chart(rng: random.Random, patient_id: str) -> Dict[str, List[dict]]:
+    """One synthetic chart: section name -> FHIR resources, plus the facts to ask about."""
+    facts = []
+    medications = []
+    for drug in rng.sample(MEDICATIONS, rng.randint(4, 9)):
+        dose = rng.choice(DOSES)
+        medications.append({
+            "resourceType": "MedicationStatement", "status": "active",
+            "medicationCodeableConcept": {"text": f"{drug} {dose} oral"},
+            "dosage": [{"text": f"{dose} {rng.choice(['daily', 'twice daily', 'at bedtime'])}"}],
+            "effectiveDateTime": rng.choice(DATES),
+        })
+        facts.append(("medication", drug, f"What dose of {drug} is the patient on?"))
+    conditions = []
+    for code, display in rng.sample(CONDITIONS, rng.randint(3, 6)):
+        conditions.append({
+            "resourceType": "Condition", "clinicalStatus": "active",
+            "code": {"coding": [{"system": "ICD-10-CM", "code": code, "display": display}]},
+            "onsetDateTime": rng.choice(DATES),
+        })
+        facts.append(("icd", code, f"Is {code} on the problem list?"))
+        facts.append(("condition", code, f"When was the {display.split(',')[0].lower()} diagnosed?"))
+    procedures = []
+    for code, display in rng.sample(PROCEDURES, rng.randint(2, 5)):
+        procedures.append({
+            "resourceType": "Procedure", "status": "completed",
+            "code": {"coding": [{"system": "CPT", "code": code, "display": display}]},
+            "performedDateTime": rng.choice(DATES),
+        })
+        facts.append(("cpt", code, f"When was CPT {code} performed?"))
+    observations = []
+    for name, unit, low, high in rng.sample(LABS, rng.randint(3, 6)):
+        for _ in range(rng.randint(2, 10)):
+            observations.append({
+                "resourceType": "Observation", "status": "final",
+                "code": {"text": name},
+                "valueQuantity": {"value": round(rng.uniform(low, high), 1), "unit": unit},
+                "effectiveDateTime": rng.choice(DATES),
+            })
+        facts.append(("lab", name, f"What was the latest {name} result?"))
+    # Visit history: the bulk of a real chart, mentioning conditions by name but rarely by code.
+    encounters = []
+    for _ in range(rng.randint(20, 60)):
+        _, display = rng.choice(CONDITIONS)
+        encounters.append({
+            "resourceType": "Encounter", "status": "finished", "class": rng.choice(["office", "telehealth"]),
+            "type": [{"text": rng.choice(["Follow-up visit", "New patient visit", "Post-op check", "Lab review"])}],
+            "reasonCode": [{"text": display}],
+            "period": {"start": rng.choice(DATES)},
+            "note": [{"text": f"Discussed {rng.choice(MEDICATIONS).lower()} and {display.split(',')[0].lower()}."}],
+        })
+    sections = {
+        "medications": medications, "conditions": conditions, "procedures": procedures,
+        "observations": observations, "encounters": encounters,
+    }
+    return {
+        "sections": {
+            name: [{name: {"resourceType": "Bundle", "entry": [{"resource": r} for r in resources]}}]
+            for name, resources in sections.items()
+        },
+        "facts": [(kind, needle, question, patient_id) for kind, needle, question in facts],
+    }
+
+
+def hashed_trigram_embedding(texts: Sequence[str], dim: int = VECTOR_SIZE) -> List[List[float]]:
+    """Stand-in dense embedding: L2-normalised counts of hashed character trigrams."""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        padded = f"  {' '.join(text.lower().split())} "
+        for i in range(len(padded) - 2):
+            vectors[row, zlib.crc32(padded[i:i + 3].encode("utf-8")) % dim] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-9)).tolist()
+
+
+def _bedrock_embedding() -> Callable[[Sequence[str]], List[List[float]]]:
+    from app.services.embedding_service import get_embedding_service
+
+    service = get_embedding_service()
+    return lambda texts: service.embed_many(list(texts))
+
+
+def _load(client: QdrantClient, name: str, charts: List[dict], embed, max_tokens: int) -> Dict[str, List[tuple]]:
+    """Chunk, embed and upsert every chart; returns patient_id -> [(point id, text)]."""
+    chunks_by_patient = defaultdict(list)
+    texts, payloads = [], []
+    for chart in charts:
+        patient_id = chart["facts"][0][3]
+        for section, data in chart["sections"].items():
+            for text in chunk_section(data, max_tokens=max_tokens):
+                texts.append(text)
+                payloads.append({"patient_id": patient_id, "section_name": section, "patient_text": text})
+    vectors = embed(texts)
+    batch = []
+    for point_id, (text, payload, vector) in enumerate(zip(texts, payloads, vectors)):
+        chunks_by_patient[payload["patient_id"]].append((point_id, text))
+        batch.append(models.PointStruct(
+            id=point_id, vector={"": vector, SPARSE_VECTOR_NAME: document_sparse_vector(text)}, payload=payload,
+        ))
+        if len(batch) >= 256:
+            client.upsert(collection_name=name, points=batch)
+            batch = []
+    if batch:
+        client.upsert(collection_name=name, points=batch)
+    return chunks_by_patient
+
+
+def _search(client: QdrantClient, name: str, mode: str, question: str, vector, query_filter, k: int):
+    if mode == "dense":
+        return client.query_points(collection_name=name, query=vector, query_filter=query_filter, limit=k).points
+    if mode == "sparse":
+        return client.query_points(
+            collection_name=name, query=query_sparse_vector(question), using=SPARSE_VECTOR_NAME,
+            query_filter=query_filter, limit=k,
+        ).points
+    return hybrid_query(client, name, question, vector, query_filter, limit=k)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=":memory:", help="Qdrant URL (default: in-process local mode)")
+    parser.add_argument("--patients", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("-k", type=int, default=5, help="Top-k for recall (the tool passes 5)")
+    parser.add_argument("--profile", default="tenant", help="Collection profile (must have sparse vectors)")
+    parser.add_argument("--embedder", default="hash", choices=("hash", "bedrock"))
+    parser.add_argument("--chunk-tokens", type=int, default=FHIR_CHUNK_MAX_TOKENS)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    profile = get_profile(args.profile)
+    if not profile.sparse:
+        parser.error(f"profile {profile.name} has no sparse vector")
+
+    rng = random.Random(args.seed)
+    charts = [_chart(rng, f"patient-{p}") for p in range(args.patients)]
+    embed = hashed_trigram_embedding if args.embedder == "hash" else _bedrock_embedding()
+
+    client = QdrantClient(location=":memory:") if args.url == ":memory:" else QdrantClient(url=args.url, timeout=120)
+    name = "eval_hybrid"
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    create_collection(client, name, profile)
+    started = time.perf_counter()
+    chunks_by_patient = _load(client, name, charts, embed, args.chunk_tokens)
+    points = sum(len(c) for c in chunks_by_patient.values())
+    print(f"{args.patients} patients, {points} chunks loaded in {time.perf_counter() - started:.1f}s "
+          f"({args.embedder} embeddings, profile {profile.name}) @ {args.url}")
+
+    facts = [fact for chart in charts for fact in chart["facts"]]
+    questions = rng.sample(facts, min(args.queries, len(facts)))
+    question_vectors = embed([q for _, _, q, _ in questions])
+
+    modes = ("dense", "sparse", "hybrid")
+    recall = {m: defaultdict(list) for m in modes}
+    rank = {m: [] for m in modes}
+    latency = {m: [] for m in modes}
+    for (kind, needle, question, patient_id), vector in zip(questions, question_vectors):
+        relevant = {pid for pid, text in chunks_by_patient[patient_id] if needle in text}
+        query_filter = models.Filter(
+            must=[models.FieldCondition(key="patient_id", match=models.MatchValue(value=patient_id))]
+        )
+        for mode in modes:
+            t0 = time.perf_counter()
+            hits = [h.id for h in _search(client, name, mode, question, vector, query_filter, args.k)]
+            latency[mode].append(time.perf_counter() - t0)
+            found = relevant.intersection(hits)
+            recall[mode][kind].append(len(found) / min(len(relevant), args.k))
+            rank[mode].append(next((1 / (i + 1) for i, h in enumerate(hits) if h in relevant), 0.0))
+    client.delete_collection(name)
+
+    def pct(values, q):
+        values = sorted(values)
+        return 1000 * values[min(len(values) - 1, int(q * len(values)))]
+
+    kinds = sorted({kind for kind, *_ in questions})
+    header = (
+        f"{'mode':>7} {f'recall@{args.k}':>9} {'MRR':>6} {'p50 ms':>7} {'p95 ms':>7}  "
+        + " ".join(f"{kind:>10}" for kind in kinds)
+    )
+    print(f"{len(questions)} questions (recall@{args.k} per question kind on the right)")
+    print(header)
+    print("-" * len(header))
+    for mode in modes:
+        overall = [r for values in recall[mode].values() for r in values]
+        print(
+            f"{mode:>7} {statistics.mean(overall):>9.3f} {statistics.mean(rank[mode]):>6.3f}"
+            f" {1000 * statistics.median(latency[mode]):>7.2f} {pct(latency[mode], 0.95):>7.2f}  "
+            + " ".join(f"{statistics.mean(recall[mode][kind]):>10.3f}" for kind in kinds)
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
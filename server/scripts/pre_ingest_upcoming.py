@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Pre-ingest charts of upcoming (surgery) patients so morning questions hit a warm index.
+
+Run from the server directory so imports and .env resolve (e.g. nightly from cron when the
+in-app loop, PRE_INGEST_ENABLED, is not used):
+
+  cd server && uv run python scripts/pre_ingest_upcoming.py --practice ocua
+  uv run python scripts/pre_ingest_upcoming.py --practice ocua --days 3 --all-appointments --dry-run
+
+Credentials come from PRACTICE_<practice>=username,password,api_key (same as the app);
+QDRANT_*, EMBEDDING_* and SCHEDULE_CACHE_* settings are shared with the app.
+
+Options:
+  --dry-run   List how many patients would be ingested; no ingest.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Server package root (parent of scripts/)
+_ROOT = Path(__file__).resolve().parent.parent
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+load_dotenv(_ROOT / ".env")
+
+from app.services import pre_ingestion  # noqa: E402
+from app.services.embedding_service import shutdown_embedding_service  # noqa: E402
+from app.services.patient_embedder import close_patient_embedder  # noqa: E402
+
+log = logging.getLogger("pre_ingest_upcoming")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--practice", action="append", help="Practice name (repeatable); default PRE_INGEST_PRACTICES")
+    parser.add_argument("--days", type=int, default=pre_ingestion.PRE_INGEST_DAYS_AHEAD, help="Days after today to cover")
+    parser.add_argument("--all-appointments", action="store_true", default=pre_ingestion.PRE_INGEST_ALL_APPOINTMENTS,
+                        help="Every appointment, not only surgery")
+    parser.add_argument("--max-patients", type=int, default=pre_ingestion.PRE_INGEST_MAX_PATIENTS)
+    parser.add_argument("--concurrency", type=int, default=pre_ingestion.PRE_INGEST_CONCURRENCY)
+    parser.add_argument("--min-interval", type=float, default=pre_ingestion.PRE_INGEST_MIN_INTERVAL_SECONDS,
+                        help="Minimum seconds between chart starts")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    practices = args.practice or pre_ingestion.PRE_INGEST_PRACTICES
+    if not practices:
+        log.error("No practice given (--practice or PRE_INGEST_PRACTICES)")
+        return 1
+
+    try:
+        summaries = asyncio.run(
+            pre_ingestion.run_pre_ingestion(
+                practices,
+                days_ahead=args.days,
+                include_all=args.all_appointments,
+                max_patients=args.max_patients,
+                concurrency=args.concurrency,
+                min_interval=args.min_interval,
+                dry_run=args.dry_run,
+            )
+        )
+    finally:
+        close_patient_embedder()
+        shutdown_embedding_service()
+
+    for summary in summaries:
+        log.info(
+            "%s%s",
+            " (dry run) " if args.dry_run else "",
+            ", ".join(f"{k}={v}" for k, v in summary.items()),
+        )
+    return 0 if len(summaries) == len(practices) and not any(s["failed"] for s in summaries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Repair the local/DynamoDB embedding manifest against the practice's Qdrant collection.
+
+Run from the server directory so imports and .env resolve:
+
+  cd server && uv run python scripts/reconcile_embedding_manifest.py --practice ocua
+
+Uses QDRANT_URL / QDRANT_API_KEY and the same EMBEDDING_MANIFEST_* settings as the app.
+
+Options:
+  --dry-run   Report what would change; no manifest writes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Server package root (parent of scripts/)
+_ROOT = Path(__file__).resolve().parent.parent
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+load_dotenv(_ROOT / ".env")
+
+from qdrant_client import QdrantClient  # noqa: E402
+
+from app.services.embedding_manifest_reconcile import reconcile_practice_manifest  # noqa: E402
+
+log = logging.getLogger("reconcile_embedding_manifest")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--practice", required=True, help="Practice URL (== Qdrant collection name)")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    qdrant_url = os.getenv("QDRANT_URL")
+    if not qdrant_url:
+        log.error("QDRANT_URL is not set")
+        return 1
+
+    client = QdrantClient(url=qdrant_url, api_key=os.getenv("QDRANT_API_KEY"), https=True, timeout=60)
+    summary = reconcile_practice_manifest(client, args.practice, dry_run=args.dry_run)
+    log.info(
+        "%s%s: %s",
+        args.practice,
+        " (dry run)" if args.dry_run else "",
+        ", ".join(f"{k}={v}" for k, v in summary.items()),
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
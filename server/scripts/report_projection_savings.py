@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Report how much the FHIR projection stage shrinks embedded text on sample bundles.
+
+Pass saved ModMed FHIR responses (a Bundle, a single resource, or a JSON list of them), e.g.
+captured with ``curl .../Condition?patient=<id> > conditions.json``:
+
+  cd server && uv run python scripts/report_projection_savings.py samples/*.json
+  uv run python scripts/report_projection_savings.py --max-tokens 350 conditions.json encounters.json
+
+For each file it prints whitespace tokens of the rendered text and chunk counts (with the
+FHIR chunker at ``--max-tokens``) before and after projection, plus a total.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Server package root (parent of scripts/)
+_ROOT = Path(__file__).resolve().parent.parent
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+from app.services.fhir_chunker import FHIR_CHUNK_MAX_TOKENS, chunk_section, count_tokens  # noqa: E402
+from app.services.fhir_projection import project_section  # noqa: E402
+
+
+def measure(section_name: str, data, max_tokens: int) -> dict:
+    before = chunk_section([{section_name: data}], max_tokens=max_tokens)
+    after = chunk_section([{section_name: project_section(data)}], max_tokens=max_tokens)
+    return {
+        "tokens_before": sum(count_tokens(c) for c in before),
+        "tokens_after": sum(count_tokens(c) for c in after),
+        "chunks_before": len(before),
+        "chunks_after": len(after),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--max-tokens", type=int, default=FHIR_CHUNK_MAX_TOKENS)
+    args = parser.parse_args()
+
+    header = f"{'file':<32} {'tokens':>8} {'projected':>10} {'saved':>7} {'chunks':>7} {'projected':>10}"
+    print(header)
+    print("-" * len(header))
+    totals = {"tokens_before": 0, "tokens_after": 0, "chunks_before": 0, "chunks_after": 0}
+    for path in args.files:
+        data = json.loads(path.read_text())
+        items = data if isinstance(data, list) else [data]
+        row = {k: 0 for k in totals}
+        for item in items:
+            for k, v in measure(path.stem, item, args.max_tokens).items():
+                row[k] += v
+        for k in totals:
+            totals[k] += row[k]
+        _print_row(path.name, row)
+    if len(args.files) > 1:
+        print("-" * len(header))
+        _print_row("total", totals)
+    return 0
+
+
+def _print_row(label: str, row: dict) -> None:
+    saved = 1 - row["tokens_after"] / row["tokens_before"] if row["tokens_before"] else 0.0
+    print(
+        f"{label[:32]:<32} {row['tokens_before']:>8} {row['tokens_after']:>10} {saved:>7.0%}"
+        f" {row['chunks_before']:>7} {row['chunks_after']:>10}"
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
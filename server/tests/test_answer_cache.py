@@ -0,0 +1,53 @@
+from app.routes import run_crew as run_crew_route
+from app.services import ingestion_jobs as jobs_module
+from app.services.answer_cache import AnswerCache, index_version
+from app.services.ingestion_jobs import IngestionJobRegistry
+
+
+def test_answers_are_versioned_by_indexed_section_hashes():
+    cache = AnswerCache(max_entries=2)
+    v1 = index_version({"medications": {"section_hash": "a"}, "labs": {"section_hash": "b"}})
+    v2 = index_version({"medications": {"section_hash": "c"}, "labs": {"section_hash": "b"}})
+
+    cache.put("practice", "p1", v1, "Current  meds?", "Metformin")
+    assert cache.get("practice", "p1", v1, "current meds?") == "Metformin"
+    assert cache.get("practice", "p1", v2, "current meds?") is None
+    assert cache.get("practice", "p2", v1, "current meds?") is None
+
+    cache.put("practice", "p1", v1, "last psa?", "4.1")
+    cache.put("practice", "p2", v1, "allergies?", "NKDA")
+    assert cache.invalidate_patient("practice", "p1") == 1  # "current meds?" was evicted (size 2)
+    assert cache.get("practice", "p2", v1, "allergies?") == "NKDA"
+
+    cache.put("practice", "p3", frozenset(), "anything", "not cached without an index")
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"], stats["evicted"], stats["invalidated"]) == (1, 2, 2, 1, 1)
+
+
+def test_run_crew_serves_repeat_questions_until_the_index_changes(monkeypatch, authenticated_client):
+    monkeypatch.setattr(jobs_module, "ingestion_jobs", IngestionJobRegistry())
+    monkeypatch.setattr(run_crew_route, "ingestion_jobs", jobs_module.ingestion_jobs)
+    monkeypatch.setattr(run_crew_route, "answer_cache", AnswerCache())
+
+    async def fake_get_patient_info(patient_id, progress=None, **kwargs):
+        return True
+
+    manifest = {"medications": {"section_hash": "h1"}}
+    runs = []
+
+    def fake_run(query, patient_id, practice_url, tool):
+        runs.append(query)
+        return f"answer {len(runs)}"
+
+    monkeypatch.setattr(jobs_module, "get_patient_info", fake_get_patient_info)
+    monkeypatch.setattr(run_crew_route, "load_patient_manifest", lambda practice, patient_id: dict(manifest))
+    monkeypatch.setattr(run_crew_route, "run", fake_run)
+
+    def ask(query):
+        return authenticated_client.post("/run_crew", json={"query": query, "id": "p-1"}).json()["result"]
+
+    assert ask("Current meds?") == "answer 1"
+    assert ask("current   meds?") == "answer 1"
+    manifest["medications"] = {"section_hash": "h2"}
+    assert ask("current meds?") == "answer 2"
+    assert runs == ["Current meds?", "current meds?"]
@@ -0,0 +1,50 @@
+from app.services.ccda_extractor import extract_ccda_text
+
+CCDA = """<?xml version="1.0" encoding="UTF-8"?>
+<ClinicalDocument xmlns="urn:hl7-org:v3" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <templateId root="2.16.840.1.113883.10.20.22.1.1"/>
+  <title>Continuity of Care Document</title>
+  <component><structuredBody>
+    <component><section>
+      <templateId root="2.16.840.1.113883.10.20.22.2.5.1"/>
+      <code code="11450-4" codeSystem="2.16.840.1.113883.6.1"/>
+      <title>Problem List</title>
+      <text><table><thead><tr><th>Problem</th><th>Status</th></tr></thead>
+        <tbody><tr><td><content ID="p1">Type 2   diabetes</content></td><td>Active</td></tr></tbody></table></text>
+      <entry><act classCode="ACT" moodCode="EVN"><id root="abc"/><code code="CONC"/></act></entry>
+    </section></component>
+    <component><section>
+      <code code="10160-0"/>
+      <text><list><item>Metformin 500 mg twice daily</item><item>Lisinopril 10 mg</item></list></text>
+    </section></component>
+    <component><section>
+      <code code="51847-2"/>
+      <title>Assessment and Plan</title>
+      <text>Patient is <content styleCode="Bold">stable</content>.<br/>Follow up in 3 months.
+        <paragraph>Continue current regimen.</paragraph></text>
+    </section></component>
+    <component><section>
+      <code code="48768-6"/>
+      <title>Payers</title>
+      <text>Medicare Part B</text>
+    </section></component>
+  </structuredBody></component>
+</ClinicalDocument>
+"""
+
+
+def test_extracts_only_clinical_narratives():
+    text = extract_ccda_text(CCDA.encode("utf-8"))
+
+    assert text.split("\n\n") == [
+        "PROBLEM LIST\nProblem | Status\nType 2 diabetes | Active",
+        "MEDICATIONS\n- Metformin 500 mg twice daily\n- Lisinopril 10 mg",
+        "ASSESSMENT AND PLAN\nPatient is stable.\nFollow up in 3 months.\nContinue current regimen.",
+    ]
+    assert "2.16.840" not in text and "CONC" not in text
+
+
+def test_all_sections_and_non_ccda_input():
+    assert "PAYERS\nMedicare Part B" in extract_ccda_text(CCDA, all_sections=True)
+    assert extract_ccda_text("<root><item>ok</item></root>") is None
+    assert extract_ccda_text(b"<ClinicalDocument><unclosed>") is None
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.routes import run_crew as run_crew_route
+from app.services import ingestion_jobs as jobs_module
+from app.services.crew_pool import CrewPool
+from app.services.ingestion_jobs import IngestionJobRegistry
+
+
+async def test_caps_queue_and_release_order():
+    pool = CrewPool(workers=1, max_queue=1, max_per_user=1, max_per_practice=2, max_queue_wait=5, retry_after=7)
+    gate = threading.Event()
+    order = []
+
+    def crew(name):
+        gate.wait(5)
+        order.append(name)
+        return name
+
+    first = asyncio.ensure_future(pool.run("u1", "practice", crew, "first"))
+    await asyncio.sleep(0)
+    queued = asyncio.ensure_future(pool.run("u2", "practice", crew, "queued"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as user_cap:
+        await pool.run("u1", "practice", crew, "again")
+    assert user_cap.value.status_code == 429 and user_cap.value.headers == {"Retry-After": "7"}
+    with pytest.raises(HTTPException) as practice_cap:
+        await pool.run("u3", "practice", crew, "third")
+    assert practice_cap.value.status_code == 429
+    with pytest.raises(HTTPException) as queue_full:
+        await pool.run("u3", "other-practice", crew, "overflow")
+    assert queue_full.value.status_code == 503
+
+    stats = pool.stats()
+    assert (stats["running"], stats["queued"]) == (1, 1)
+    gate.set()
+    await asyncio.gather(first, queued)
+    assert order == ["first", "queued"]
+    await asyncio.sleep(0.01)  # slot release is posted back from the crew thread
+
+    stats = pool.stats()
+    assert (stats["running"], stats["queued"], stats["completed"], stats["started"]) == (0, 0, 2, 2)
+    assert (stats["rejected_user"], stats["rejected_queue_full"], stats["rejected_practice"]) == (1, 1, 1)
+    pool.shutdown()
+
+
+async def test_queue_wait_timeout_and_abandoned_runs_keep_their_slot():
+    pool = CrewPool(workers=1, max_queue=4, max_queue_wait=0.05)
+    gate = threading.Event()
+
+    running = asyncio.ensure_future(pool.run("u1", "practice", gate.wait, 5))
+    await asyncio.sleep(0.01)
+    with pytest.raises(HTTPException) as timed_out:
+        await pool.run("u2", "practice", lambda: "never")
+    assert timed_out.value.status_code == 503 and "Retry-After" in timed_out.value.headers
+
+    # The caller goes away, but the thread still holds the slot until it returns.
+    running.cancel()
+    await asyncio.sleep(0.01)
+    assert pool.stats()["running"] == 1
+    gate.set()
+    await asyncio.sleep(0.05)
+    assert pool.stats()["running"] == 0
+    assert await pool.run("u2", "practice", lambda: "ok") == "ok"
+    pool.shutdown()
+
+
+def test_run_crew_passes_pool_rejections_through(monkeypatch, authenticated_client):
+    monkeypatch.setattr(jobs_module, "ingestion_jobs", IngestionJobRegistry())
+    monkeypatch.setattr(run_crew_route, "ingestion_jobs", jobs_module.ingestion_jobs)
+    monkeypatch.setattr(run_crew_route, "load_patient_manifest", lambda practice, patient_id: {})
+
+    async def fake_get_patient_info(patient_id, progress=None, **kwargs):
+        return True
+
+    async def saturated(*args, **kwargs):
+        raise HTTPException(status_code=429, detail="busy", headers={"Retry-After": "5"})
+
+    monkeypatch.setattr(jobs_module, "get_patient_info", fake_get_patient_info)
+    monkeypatch.setattr(run_crew_route, "crew_pool", SimpleNamespace(run=saturated))
+
+    response = authenticated_client.post("/run_crew", json={"query": "meds?", "id": "p-1"})
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "5"
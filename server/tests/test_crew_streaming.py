@@ -0,0 +1,118 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+
+import litellm
+import pytest
+from crewai.utilities.events import LLMCallStartedEvent, LLMStreamChunkEvent, crewai_event_bus
+
+from app.crew import crew as crew_module
+from app.routes import run_crew as run_crew_route
+from app.services import ingestion_jobs as jobs_module
+from app.services.answer_cache import AnswerCache
+from app.services.crew_streaming import CrewCancelled, CrewTokenStream, stream_crew_run, token_sink
+from app.services.ingestion_jobs import IngestionJobRegistry
+
+
+def _chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+def _react_run(stream):
+    """What the agent's two LLM calls look like: a tool call, then the final answer."""
+    stream.begin_call()
+    for text in ("Thought: look up meds\nAct", "ion: QdrantVectorSearchTool\nAction Input: {}"):
+        stream.feed(text)
+    stream.begin_call()
+    for text in ("Thought: I now know\nFinal Ans", "wer:  ", "\nMetformin", " 500 mg"):
+        stream.feed(text)
+    return "Metformin 500 mg"
+
+
+async def test_only_final_answer_tokens_are_forwarded():
+    stream = CrewTokenStream(asyncio.get_running_loop())
+    events = [e async for e in stream_crew_run(asyncio.to_thread(_react_run, stream), stream)]
+
+    assert events == [
+        ("status", {"stage": "searching"}),
+        ("token", {"text": "Metformin"}),
+        ("token", {"text": " 500 mg"}),
+        ("result", {"text": "Metformin 500 mg"}),
+    ]
+
+
+async def test_disconnect_stops_generation_mid_stream(monkeypatch):
+    produced = []
+    release = threading.Event()
+    stopped = threading.Event()
+
+    def completion(**params):
+        assert params["stream"] is True
+        try:
+            for i in range(1000):
+                if i == 1:
+                    release.wait(5)  # hold generation until the client has gone
+                produced.append(i)
+                yield _chunk("Final Answer: Metformin" if i == 0 else f" t{i}")
+        finally:
+            stopped.set()
+
+    monkeypatch.setattr(litellm, "completion", completion)
+    llm = crew_module.PatchedBedrockLLM(model="bedrock/test")
+    stream = CrewTokenStream(asyncio.get_running_loop())
+    calls = []
+
+    def run():
+        token_sink.set(stream)
+        return llm.call("q")
+
+    with crewai_event_bus.scoped_handlers():
+        crewai_event_bus.register_handler(LLMStreamChunkEvent, crew_module._forward_stream_chunk)
+        crewai_event_bus.register_handler(LLMCallStartedEvent, lambda source, event: calls.append(event.messages))
+
+        events = stream_crew_run(asyncio.to_thread(run), stream)
+        assert await events.__anext__() == ("token", {"text": "Metformin"})
+        await events.aclose()
+        assert stream.cancelled
+
+        release.set()
+        assert await asyncio.to_thread(stopped.wait, 5)
+    assert produced == [0, 1]
+    assert calls == [[{"role": "user", "content": "q"}]]  # went through crewai's LLM.call
+    assert llm.stream is False  # the shared LLM is left non-streaming
+    with pytest.raises(CrewCancelled):
+        stream.begin_call()
+
+
+def test_run_crew_stream_route(monkeypatch, authenticated_client):
+    monkeypatch.setattr(jobs_module, "ingestion_jobs", IngestionJobRegistry())
+    monkeypatch.setattr(run_crew_route, "ingestion_jobs", jobs_module.ingestion_jobs)
+    monkeypatch.setattr(run_crew_route, "answer_cache", AnswerCache())
+    monkeypatch.setattr(run_crew_route, "load_patient_manifest", lambda practice, patient_id: {"meds": {"section_hash": "h"}})
+
+    async def fake_get_patient_info(patient_id, progress=None, **kwargs):
+        return True
+
+    monkeypatch.setattr(jobs_module, "get_patient_info", fake_get_patient_info)
+    monkeypatch.setattr(
+        run_crew_route, "run", lambda query, patient_id, practice_url, tool, token_stream: _react_run(token_stream)
+    )
+
+    def stream(query):
+        response = authenticated_client.post("/run_crew/stream", json={"query": query, "id": "p-1"})
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = []
+        for block in response.text.strip().split("\n\n"):
+            fields = dict(line.split(": ", 1) for line in block.split("\n"))
+            events.append((fields["event"], json.loads(fields["data"])))
+        return events
+
+    events = stream("current meds?")
+    assert [name for name, _ in events] == ["status", "status", "status", "token", "token", "done"]
+    assert [data.get("stage") for _, data in events[:3]] == ["ingest", "thinking", "searching"]
+    assert events[-1][1]["result"] == "Metformin 500 mg" and events[-1][1]["cached"] is False
+
+    repeat = stream("Current meds?")
+    assert [name for name, _ in repeat] == ["status", "done"]
+    assert repeat[-1][1]["cached"] is True
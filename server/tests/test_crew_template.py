@@ -0,0 +1,37 @@
+from crewai.tools import BaseTool
+
+from app.crew import crew as crew_module
+from app.crew.crew import ClinicalCrewTemplate
+
+
+class _SearchTool(BaseTool):
+    name: str = "QdrantVectorSearchTool"
+    description: str = "test search"
+
+    def _run(self, query: str) -> str:
+        return "[]"
+
+
+def test_template_parses_config_once_and_builds_fresh_crews(monkeypatch):
+    loads = []
+    real_load = crew_module._load_yaml
+
+    def counting_load(path):
+        loads.append(path.name)
+        return real_load(path)
+
+    monkeypatch.setattr(crew_module, "_load_yaml", counting_load)
+    template = ClinicalCrewTemplate()
+    tool = _SearchTool()
+
+    first = template.build(tool)
+    second = template.build()
+
+    assert loads == ["agents.yaml", "tasks.yaml"]
+    agent, task = first.agents[0], first.tasks[0]
+    assert agent.role.strip() == "Clinical Assistant Specialist"
+    assert agent.llm is template.llm
+    assert [t.name for t in agent.tools] == ["QdrantVectorSearchTool"]
+    assert task.agent is agent and "{query}" in task.description
+    assert second.agents[0] is not agent and second.agents[0].tools == []
+    assert second.tasks[0] is not task
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from app.services.embedding_batcher import BatcherClosedError, EmbeddingMicroBatcher
+
+
+class _StubBackend:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def embed_batch(self, texts):
+        with self.lock:
+            self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("backend down")
+        return [[float(len(t))] for t in texts]
+
+
+def test_concurrent_callers_share_one_deduplicated_batch():
+    backend = _StubBackend()
+    batcher = EmbeddingMicroBatcher(backend, max_batch_items=100, max_wait_ms=200)
+    try:
+        results = {}
+
+        def caller(name, texts):
+            results[name] = batcher.embed_many(texts)
+
+        threads = [
+            threading.Thread(target=caller, args=("a", ["x", "yy"])),
+            threading.Thread(target=caller, args=("b", ["yy", "zzz"])),
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert results == {"a": [[1.0], [2.0]], "b": [[2.0], [3.0]]}
+        assert len(backend.batches) == 1
+        assert sorted(backend.batches[0]) == ["x", "yy", "zzz"]
+        stats = batcher.stats()
+        assert stats["items"] == 4
+        assert stats["dedup_saved"] == 1
+    finally:
+        batcher.shutdown()
+
+
+def test_batches_flush_at_max_items():
+    backend = _StubBackend()
+    batcher = EmbeddingMicroBatcher(backend, max_batch_items=2, max_wait_ms=1000)
+    try:
+        assert batcher.embed_many(["a", "b", "c", "d"]) == [[1.0]] * 4
+        assert all(len(b) <= 2 for b in backend.batches)
+    finally:
+        batcher.shutdown()
+
+
+def test_backend_failure_resolves_empty_vectors():
+    batcher = EmbeddingMicroBatcher(_StubBackend(fail=True), max_wait_ms=0)
+    try:
+        assert batcher.embed_many(["a", "b"]) == [[], []]
+        assert batcher.stats()["failed_batches"] >= 1
+    finally:
+        batcher.shutdown()
+
+
+def test_shutdown_fails_pending_callers_and_rejects_new_ones():
+    started, release = threading.Event(), threading.Event()
+
+    class _BlockingBackend:
+        def embed_batch(self, texts):
+            started.set()
+            release.wait(5)
+            return [[1.0] for _ in texts]
+
+    batcher = EmbeddingMicroBatcher(_BlockingBackend(), max_batch_items=1, max_wait_ms=0, max_concurrent_batches=1)
+    running = batcher.submit("a")
+    assert started.wait(1)
+    waiting = [batcher.submit(text) for text in ("b", "c", "d")]
+    time.sleep(0.05)  # let the collector hand some of them to the busy dispatch pool
+
+    batcher.shutdown()
+    for future in waiting:
+        assert isinstance(future.exception(timeout=1), BatcherClosedError)
+    with pytest.raises(BatcherClosedError):
+        batcher.submit("e")
+
+    release.set()
+    assert running.result(timeout=1) == [1.0]
@@ -0,0 +1,108 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import embedding_cache, embedding_manifest_store
+from app.services.patient_embedder import PatientDataEmbedder
+
+
+@pytest.fixture(autouse=True)
+def local_stores(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_ENABLED", True)
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_SQLITE_PATH", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(embedding_manifest_store, "EMBEDDING_MANIFEST_DYNAMODB_TABLE", "")
+    monkeypatch.setattr(
+        embedding_manifest_store, "EMBEDDING_MANIFEST_SQLITE_PATH", str(tmp_path / "manifest.sqlite3")
+    )
+
+
+class _FakeQdrant:
+    def __init__(self):
+        self.upserts = []
+
+    def upsert(self, collection_name, points):
+        self.upserts.append(points)
+
+
+def _embedder(calls):
+    embedder = PatientDataEmbedder.__new__(PatientDataEmbedder)
+    embedder.qdrant_client = _FakeQdrant()
+    embedder.chunk_max_tokens = 12
+    embedder.embedding_model = "test-model"
+    embedder.embedding_dimensions = 4
+
+    def fake_embed_many(texts, max_retries=5):
+        calls.extend(texts)
+        return [[0.5, -0.25, 0.125, 1.0] for _ in texts]
+
+    embedder.embedding_service = SimpleNamespace(embed_many=fake_embed_many)
+    return embedder
+
+
+def test_vectors_round_trip_as_float16():
+    vector = [0.1, -0.5, 0.3333, 1.0]
+    assert len(embedding_cache.pack_vector(vector)) == 8
+    embedding_cache.put_cached_embeddings("m", 4, {"chunk text": vector})
+
+    hits = embedding_cache.get_cached_embeddings("m", 4, ["chunk text", "unseen"])
+    assert set(hits) == {embedding_cache.text_digest("chunk text")}
+    assert hits[embedding_cache.text_digest("chunk text")] == pytest.approx(vector, abs=1e-3)
+    assert embedding_cache.get_cached_embeddings("m", 8, ["chunk text"]) == {}
+    assert embedding_cache.get_cached_embeddings("other", 4, ["chunk text"]) == {}
+
+
+def test_disabled_cache_is_a_no_op(monkeypatch):
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_ENABLED", False)
+    embedding_cache.put_cached_embeddings("m", 4, {"chunk text": [1.0]})
+    assert embedding_cache.get_cached_embeddings("m", 4, ["chunk text"]) == {}
+
+
+def test_least_recently_used_vectors_are_pruned_over_the_limit(monkeypatch):
+    clock = iter(range(1, 100))
+    monkeypatch.setattr(embedding_cache, "time", SimpleNamespace(time=lambda: next(clock)))
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_MAX_ROWS", 10)
+    texts = [f"chunk {c}" for c in "abcdefghij"]
+    for text in texts:
+        embedding_cache.put_cached_embeddings("m", 2, {text: [0.5, 0.5]})
+    assert len(embedding_cache.get_cached_embeddings("m", 2, [texts[0]])) == 1  # "a" is used again
+
+    embedding_cache.put_cached_embeddings("m", 2, {"chunk k": [0.5, 0.5]})  # 11 rows: prune to 9
+    cached = embedding_cache.get_cached_embeddings("m", 2, texts + ["chunk k"])
+    assert len(cached) == 9
+    gone = {embedding_cache.text_digest(t) for t in ("chunk b", "chunk c")}
+    assert not gone & set(cached) and embedding_cache.text_digest("chunk a") in cached
+
+
+def test_cache_created_before_eviction_is_migrated(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE embedding_cache (model TEXT NOT NULL, dimensions INTEGER NOT NULL, text_sha256 TEXT NOT NULL, "
+        "vector BLOB NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (model, dimensions, text_sha256))"
+    )
+    conn.execute(
+        "INSERT INTO embedding_cache VALUES ('m', 2, ?, ?, 5)",
+        (embedding_cache.text_digest("old"), embedding_cache.pack_vector([0.5, 0.5])),
+    )
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_SQLITE_PATH", path)
+
+    assert embedding_cache.get_cached_embeddings("m", 2, ["old"]) == {embedding_cache.text_digest("old"): [0.5, 0.5]}
+    embedding_cache.put_cached_embeddings("m", 2, {"new": [0.5, 0.5]})
+    assert len(embedding_cache.get_cached_embeddings("m", 2, ["old", "new"])) == 2
+
+
+def test_chunk_and_embed_only_embeds_unseen_chunks():
+    calls = []
+    embedder = _embedder(calls)
+    section = [{"medications": [{"medication": "Tamsulosin 0.4 mg daily"}]}]
+    assert embedder.chunk_and_embed(section, "medications", "p1", "h1", "practice") > 0
+    first_calls = len(calls)
+    assert first_calls > 0
+
+    grown = [{"medications": [{"medication": "Tamsulosin 0.4 mg daily"}, {"medication": "Finasteride 5 mg"}]}]
+    embedder.chunk_and_embed(grown, "medications", "p1", "h2", "practice")
+    new_texts = calls[first_calls:]
+    assert new_texts and all("Finasteride" in t for t in new_texts)
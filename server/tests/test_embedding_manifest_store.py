@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import embedding_manifest_store
+from app.services.embedding_manifest_reconcile import reconcile_practice_manifest
+
+
+@pytest.fixture(autouse=True)
+def sqlite_manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_manifest_store, "EMBEDDING_MANIFEST_DYNAMODB_TABLE", "")
+    monkeypatch.setattr(
+        embedding_manifest_store, "EMBEDDING_MANIFEST_SQLITE_PATH", str(tmp_path / "manifest.sqlite3")
+    )
+
+
+class _FakeQdrant:
+    """Scroll over in-memory payloads, two pages at a time."""
+
+    def __init__(self, payloads):
+        self.points = [SimpleNamespace(payload=p) for p in payloads]
+
+    def scroll(self, collection_name, limit, offset=None, with_payload=None, with_vectors=None):
+        start = offset or 0
+        end = start + 2
+        return self.points[start:end], (end if end < len(self.points) else None)
+
+
+def test_manifest_round_trip_and_delete():
+    embedding_manifest_store.save_section_manifest("practice", "p1", "medications", "h1", 3, embedded_at=10.0)
+    embedding_manifest_store.save_section_manifest("practice", "p1", "encounters", "h2", 7)
+    embedding_manifest_store.save_section_manifest("practice", "p2", "medications", "h3", 1)
+
+    manifest = embedding_manifest_store.load_patient_manifest("practice", "p1")
+    assert manifest["medications"] == {"section_hash": "h1", "point_count": 3, "embedded_at": 10.0}
+    assert manifest["encounters"]["point_count"] == 7
+    assert embedding_manifest_store.load_patient_manifest("other", "p1") == {}
+
+    embedding_manifest_store.save_section_manifest("practice", "p1", "medications", "h9", 4)
+    embedding_manifest_store.delete_section_manifest("practice", "p1", "encounters")
+    manifest = embedding_manifest_store.load_patient_manifest("practice", "p1")
+    assert set(manifest) == {"medications"}
+    assert manifest["medications"]["section_hash"] == "h9"
+
+
+def test_reconcile_repairs_drifted_rows():
+    embedding_manifest_store.save_section_manifest("practice", "p1", "medications", "stale", 1)
+    embedding_manifest_store.save_section_manifest("practice", "p1", "gone", "h0", 2)
+    qdrant = _FakeQdrant(
+        [
+            {"patient_id": "p1", "section_name": "medications", "patient_hash": "h1"},
+            {"patient_id": "p1", "section_name": "medications", "patient_hash": "h1"},
+            {"patient_id": "p1", "section_name": "encounters", "patient_hash": "h2"},
+            {"patient_id": "p2", "section_name": "tasks", "patient_hash": "a"},
+            {"patient_id": "p2", "section_name": "tasks", "patient_hash": "b"},
+        ]
+    )
+
+    summary = reconcile_practice_manifest(qdrant, "practice")
+
+    assert summary == {"unchanged": 0, "added": 2, "updated": 1, "removed": 1, "mixed": 1}
+    p1 = embedding_manifest_store.load_patient_manifest("practice", "p1")
+    assert p1["medications"]["section_hash"] == "h1"
+    assert p1["medications"]["point_count"] == 2
+    assert "gone" not in p1
+    assert embedding_manifest_store.load_patient_manifest("practice", "p2")["tasks"]["section_hash"] == ""
+
+    assert reconcile_practice_manifest(qdrant, "practice", dry_run=True)["unchanged"] == 3
@@ -0,0 +1,64 @@
+import io
+import json
+
+from botocore.exceptions import ClientError
+
+from app.services.embedding_service import AdaptiveConcurrencyLimiter, EmbeddingService
+
+
+class _FakeBedrock:
+    """Throttles the first `throttle_first` calls, then returns a fixed vector."""
+
+    def __init__(self, throttle_first=0):
+        self.throttle_first = throttle_first
+        self.calls = 0
+
+    def invoke_model(self, modelId, body, contentType, accept):
+        self.calls += 1
+        if self.calls <= self.throttle_first:
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "slow down"}}, "InvokeModel")
+        text = json.loads(body)["inputText"]
+        return {"body": io.BytesIO(json.dumps({"embedding": [float(len(text)), 1.0]}).encode())}
+
+
+def test_limiter_halves_on_throttle_and_recovers():
+    limiter = AdaptiveConcurrencyLimiter(initial=8, minimum=2, maximum=10, increase_after=2)
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 4
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release()
+    assert limiter.limit == 6
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(throttled=True)
+    assert limiter.limit == 2
+    assert limiter.in_flight == 0
+
+
+def test_service_retries_throttled_calls_and_reports_stats(monkeypatch):
+    monkeypatch.setattr("app.services.embedding_service.time.sleep", lambda _s: None)
+    service = EmbeddingService(
+        bedrock_client=_FakeBedrock(throttle_first=2), max_workers=4, initial_concurrency=4, min_concurrency=1
+    )
+    try:
+        assert service.embed_many(["ab", "abcd"]) == [[2.0, 1.0], [4.0, 1.0]]
+        stats = service.stats()
+        assert stats["throttled"] == 2
+        assert stats["requests"] == 4
+        assert stats["failed"] == 0
+        assert stats["queue_depth"] == 0
+        assert stats["concurrency_limit"] == 1
+    finally:
+        service.shutdown()
+
+
+def test_service_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr("app.services.embedding_service.time.sleep", lambda _s: None)
+    service = EmbeddingService(bedrock_client=_FakeBedrock(throttle_first=10), max_workers=2)
+    try:
+        assert service.embed("text", max_retries=3) == []
+        assert service.stats()["failed"] == 1
+    finally:
+        service.shutdown()
@@ -0,0 +1,119 @@
+from app.routes import run_crew as run_crew_route
+from app.services import ingestion_jobs as jobs_module
+from app.services.answer_cache import AnswerCache
+from app.services.fast_path import FastPath, classify, render
+from app.services.fhir_projection import project_section
+from app.services.ingestion_jobs import IngestionJobRegistry
+from app.services.structured_sections import StructuredSectionCache
+
+
+def _bundle(*resources):
+    return {"resourceType": "Bundle", "entry": [{"resource": r} for r in resources]}
+
+
+def _concept(text):
+    return {"coding": [{"system": "http://snomed.info/sct", "code": "0", "display": text}]}
+
+
+MEDICATIONS = _bundle(
+    {"resourceType": "MedicationStatement", "status": "active", "medicationCodeableConcept": _concept("Tamsulosin 0.4 mg"),
+     "dosage": [{"text": "1 capsule daily"}], "effectiveDateTime": "2024-02-01T10:00:00Z"},
+    {"resourceType": "MedicationStatement", "status": "stopped", "medicationCodeableConcept": _concept("Finasteride 5 mg")},
+)
+ALLERGIES = _bundle(
+    {"resourceType": "AllergyIntolerance", "clinicalStatus": _concept("Active"), "code": _concept("Penicillin"),
+     "criticality": "high", "reaction": [{"manifestation": [_concept("Hives")]}]},
+    {"resourceType": "AllergyIntolerance", "verificationStatus": _concept("Refuted"), "code": _concept("Latex")},
+)
+CONDITIONS = _bundle(
+    {"resourceType": "Condition", "clinicalStatus": _concept("active"), "code": _concept("BPH"), "onsetDateTime": "2021-05-03"},
+    {"resourceType": "Condition", "code": _concept("UTI"), "abatementDateTime": "2023-01-10"},
+)
+RECALLS = _bundle(
+    {"resourceType": "Task", "status": "requested", "description": "PSA recall",
+     "restriction": {"period": {"end": "2026-03-01"}}},
+    {"resourceType": "Task", "status": "requested", "description": "Cystoscopy recall", "executionPeriod": {"start": "2025-12-01"}},
+    {"resourceType": "Task", "status": "completed", "description": "Renal ultrasound recall"},
+)
+
+
+def test_classifier_only_takes_plain_lookups():
+    assert classify("What are the patient's current meds?").intents == ("medications",)
+    assert classify("allergies and active problems").intents == ("allergies", "problems")
+    assert classify("Any upcoming recalls due?").confidence == 1.0
+    assert classify("is he on tamsulosin?").intents == ()
+    assert classify("meds for his BPH").confidence < 0.75
+    assert classify("summarise the last visit").intents == ()
+
+
+def test_renderers_list_only_entries_in_force_from_projected_sections():
+    assert render("medications", project_section(MEDICATIONS)) == (
+        "Active medications (1):\n- Tamsulosin 0.4 mg — 1 capsule daily (since 2024-02-01)"
+    )
+    assert render("allergies", project_section(ALLERGIES)) == "Allergies (1):\n- Penicillin: Hives (high criticality)"
+    assert render("problems", project_section(CONDITIONS)) == "Active problems (1):\n- BPH (since 2021-05-03)"
+    assert render("recalls", project_section(RECALLS)) == (
+        "Open recalls (2):\n- Cystoscopy recall — due 2025-12-01\n- PSA recall — due 2026-03-01"
+    )
+    assert render("allergies", _bundle()) == "No active allergies recorded."
+
+
+def test_falls_back_unless_every_section_matches_the_indexed_hash():
+    sections = StructuredSectionCache()
+    fast = FastPath(sections, min_confidence=0.75, enabled=True)
+    sections.put("practice", "p-1", "medications", "h1", project_section(MEDICATIONS))
+    manifest = {"medications": {"section_hash": "h1"}, "allergies": {"section_hash": "a1"}}
+
+    assert fast.answer("practice", "p-1", manifest, "current meds?").startswith("Active medications (1)")
+    assert fast.answer("practice", "p-1", {"medications": {"section_hash": "h2"}}, "current meds?") is None  # stale
+    assert fast.answer("practice", "p-1", manifest, "meds and allergies") is None  # allergies not cached
+    assert fast.answer("practice", "p-1", manifest, "why was tamsulosin started?") is None
+    assert fast.answer("practice", "p-1", manifest, "meds for his BPH") is None
+
+    stats = fast.stats()
+    assert (stats["questions"], stats["answered"], stats["section_unavailable"], stats["no_intent"], stats["low_confidence"]) == (
+        5, 1, 2, 1, 1
+    )
+    assert stats["hit_rate"] == 0.2 and stats["sections"]["stale"] == 1
+
+
+def test_incompletely_fetched_sections_are_not_answered_from():
+    sections = StructuredSectionCache()
+    fast = FastPath(sections, min_confidence=0.75, enabled=True)
+    manifest = {"allergies": {"section_hash": "a1"}}
+    sections.put("practice", "p-1", "allergies", "a1", project_section(ALLERGIES))
+    assert fast.answer("practice", "p-1", manifest, "allergies?") is not None
+
+    # A later fetch hit the page cap: a partial list must not become "no active allergies".
+    sections.put("practice", "p-1", "allergies", "a1", project_section(_bundle()), complete=False)
+    assert fast.answer("practice", "p-1", manifest, "allergies?") is None
+    assert sections.stats()["incomplete"] == 1
+
+
+def test_run_crew_answers_plain_lookups_without_the_crew(monkeypatch, authenticated_client):
+    sections = StructuredSectionCache()
+    monkeypatch.setattr(jobs_module, "ingestion_jobs", IngestionJobRegistry())
+    monkeypatch.setattr(run_crew_route, "ingestion_jobs", jobs_module.ingestion_jobs)
+    monkeypatch.setattr(run_crew_route, "answer_cache", AnswerCache())
+    monkeypatch.setattr(run_crew_route, "fast_path", FastPath(sections, min_confidence=0.75, enabled=True))
+
+    async def fake_get_patient_info(patient_id, progress=None, **kwargs):
+        sections.put("demo-practice", patient_id, "conditions", "c1", project_section(CONDITIONS))
+        return True
+
+    runs = []
+
+    def fake_run(query, patient_id, practice_url, tool):
+        runs.append(query)
+        return "crew answer"
+
+    monkeypatch.setattr(jobs_module, "get_patient_info", fake_get_patient_info)
+    monkeypatch.setattr(run_crew_route, "load_patient_manifest", lambda practice, patient_id: {"conditions": {"section_hash": "c1"}})
+    monkeypatch.setattr(run_crew_route, "run", fake_run)
+
+    body = authenticated_client.post("/run_crew", json={"query": "Problem list?", "id": "p-1"}).json()
+    assert body["fast_path"] is True and body["result"] == "Active problems (1):\n- BPH (since 2021-05-03)"
+    assert authenticated_client.post("/run_crew", json={"query": "when was BPH diagnosed?", "id": "p-1"}).json()["result"] == (
+        "crew answer"
+    )
+    assert runs == ["when was BPH diagnosed?"]
@@ -0,0 +1,223 @@
+import threading
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from app.services import embedding_manifest_store, patient_info_service, source_checkpoint_store
+from app.services.fast_path import FastPath
+from app.services.structured_sections import StructuredSectionCache
+from app.services.fhir_change_detection import checkpoint_since, count_url, precheck_source
+
+
+def _response(body, status_code=200):
+    return SimpleNamespace(status_code=status_code, json=lambda: body)
+
+
+@pytest.fixture(autouse=True)
+def sqlite_stores(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_manifest_store, "EMBEDDING_MANIFEST_DYNAMODB_TABLE", "")
+    monkeypatch.setattr(embedding_manifest_store, "EMBEDDING_MANIFEST_SQLITE_PATH", str(tmp_path / "manifest.sqlite3"))
+    monkeypatch.setattr(source_checkpoint_store, "SOURCE_CHECKPOINT_DYNAMODB_TABLE", "")
+    monkeypatch.setattr(source_checkpoint_store, "SOURCE_CHECKPOINT_SQLITE_PATH", str(tmp_path / "checkpoints.sqlite3"))
+
+
+def test_count_url_and_checkpoint_since():
+    url = count_url("https://fhir.example/Task?code=PMRECALL&patient=1&_sort=-_lastUpdated&_count=100", "2024-05-01T00:00:00Z")
+    assert parse_qs(urlsplit(url).query) == {
+        "code": ["PMRECALL"], "patient": ["1"], "_summary": ["count"], "_lastUpdated": ["gt2024-05-01T00:00:00Z"],
+    }
+    assert checkpoint_since(1714521900, skew_seconds=300) == "2024-05-01T00:00:00Z"
+
+
+async def test_precheck_reasons():
+    checkpoint = {"checked_since": "2024-05-01T00:00:00Z", "total": 3}
+
+    def server(updated, total, status_code=200):
+        async def get(url, headers=None):
+            query = parse_qs(urlsplit(url).query)
+            return _response({"resourceType": "Bundle", "total": updated if "_lastUpdated" in query else total}, status_code)
+        return get
+
+    url = "https://fhir.example/Condition?patient=1"
+    assert await precheck_source(server(0, 3), url, None, checkpoint, True) == (True, "unchanged")
+    assert await precheck_source(server(1, 4), url, None, checkpoint, True) == (False, "updated:1")
+    assert await precheck_source(server(0, 2), url, None, checkpoint, True) == (False, "count_changed:3->2")
+    assert await precheck_source(server(0, 3, 400), url, None, checkpoint, True) == (False, "precheck_failed")
+    assert await precheck_source(server(0, 3), url, None, checkpoint, False) == (False, "not_indexed")
+    assert await precheck_source(server(0, 3), url, None, None, True) == (False, "no_checkpoint")
+
+
+class FakeModMed:
+    """Every search returns one resource; ``updated`` marks sections edited since the checkpoint."""
+
+    def __init__(self):
+        self.updated = set()
+        self.requests = []
+
+    async def get(self, client, url, headers=None):
+        self.requests.append(url)
+        parts = urlsplit(url)
+        query = parse_qs(parts.query)
+        resource_type = parts.path.rsplit("/", 1)[-1]
+        if parts.path.endswith("/Patient/1"):
+            return _response({"resourceType": "Patient", "id": "1", "name": [{"family": "Doe"}]})
+        if query.get("_summary") == ["count"]:
+            changed = "_lastUpdated" in query and resource_type in self.updated
+            total = 1 if resource_type != "DocumentReference" else 0
+            return _response({"resourceType": "Bundle", "total": int(changed) if "_lastUpdated" in query else total})
+        if resource_type == "DocumentReference":
+            return _response({"resourceType": "Bundle", "total": 0, "entry": []})
+        status = "amended" if resource_type in self.updated else "final"
+        return _response({
+            "resourceType": "Bundle",
+            "total": 1,
+            "entry": [{"resource": {"resourceType": resource_type, "status": status}}],
+        })
+
+    def full_fetches(self):
+        return sorted(
+            urlsplit(u).path.rsplit("/", 1)[-1] for u in self.requests if "_summary=count" not in u
+        )
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.embedded = []
+        self.failing = set()
+        self.empty = set()
+
+    def chunk_and_embed(self, section_list, name, patient_id, section_hash, practice_url, replace_existing=False, stats=None):
+        if name in self.failing:
+            return 0  # what the embedder returns when the upsert or every embedding fails
+        if name in self.empty:
+            stats["chunks"] = 0  # an empty Bundle: stored as a section with no points
+            embedding_manifest_store.save_section_manifest(practice_url, patient_id, name, section_hash, 0)
+            return 0
+        self.embedded.append(name)
+        embedding_manifest_store.save_section_manifest(practice_url, patient_id, name, section_hash, 1)
+        return 1
+
+
+async def test_returning_patient_reingest_collapses_to_count_requests(monkeypatch):
+    modmed = FakeModMed()
+    embedder = FakeEmbedder()
+    monkeypatch.setattr(patient_info_service, "limited_get", modmed.get)
+    monkeypatch.setattr(patient_info_service, "get_patient_embedder", lambda: embedder)
+    qdrant_tool = SimpleNamespace(find_section_hash=lambda *a: None, count_section_points=lambda *a: 0)
+
+    async def ingest():
+        modmed.requests.clear()
+        embedder.embedded.clear()
+        await patient_info_service.get_patient_info(
+            "1", modmed_token="t", practice_url="practice", practice_api_key="k", user_qdrant_tool=qdrant_tool
+        )
+
+    await ingest()
+    assert len(modmed.full_fetches()) == 9
+    assert "encounters" in embedder.embedded
+
+    await ingest()
+    assert modmed.full_fetches() == []
+    assert all("_summary=count" in u for u in modmed.requests)
+    assert embedder.embedded == []
+
+    modmed.updated.add("Encounter")
+    await ingest()
+    assert modmed.full_fetches() == ["Encounter"]
+    assert embedder.embedded == ["encounters"]
+
+
+async def test_sections_that_failed_to_embed_are_not_checkpointed(monkeypatch):
+    modmed = FakeModMed()
+    embedder = FakeEmbedder()
+    embedder.failing.add("encounters")
+    monkeypatch.setattr(patient_info_service, "limited_get", modmed.get)
+    monkeypatch.setattr(patient_info_service, "get_patient_embedder", lambda: embedder)
+    qdrant_tool = SimpleNamespace(find_section_hash=lambda *a: None, count_section_points=lambda *a: 0)
+
+    async def ingest():
+        modmed.requests.clear()
+        await patient_info_service.get_patient_info(
+            "1", modmed_token="t", practice_url="practice", practice_api_key="k", user_qdrant_tool=qdrant_tool
+        )
+
+    await ingest()
+    checkpoints = source_checkpoint_store.load_source_checkpoints("practice", "1")
+    assert "encounters" not in checkpoints and "medications" in checkpoints
+
+    await ingest()
+    assert modmed.full_fetches() == ["Encounter"]
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("bedrock down")
+
+    monkeypatch.setattr(embedder, "chunk_and_embed", broken)
+    modmed.updated.add("Condition")
+    with pytest.raises(Exception):
+        await ingest()
+    assert source_checkpoint_store.load_source_checkpoints("practice", "1") == checkpoints
+
+
+async def test_qdrant_backfill_lookups_run_off_the_event_loop(monkeypatch):
+    modmed = FakeModMed()
+    monkeypatch.setattr(patient_info_service, "limited_get", modmed.get)
+    monkeypatch.setattr(patient_info_service, "get_patient_embedder", lambda: FakeEmbedder())
+    threads = set()
+
+    def find_section_hash(patient_id, section_name):
+        threads.add(threading.current_thread())
+        return None
+
+    qdrant_tool = SimpleNamespace(find_section_hash=find_section_hash, count_section_points=lambda *a: 0)
+    await patient_info_service.get_patient_info(
+        "1", modmed_token="t", practice_url="practice", practice_api_key="k", user_qdrant_tool=qdrant_tool
+    )
+    assert threads and threading.main_thread() not in threads
+
+
+async def test_sections_with_no_chunks_are_checkpointed(monkeypatch):
+    modmed = FakeModMed()
+    embedder = FakeEmbedder()
+    embedder.empty.add("allergies")
+    monkeypatch.setattr(patient_info_service, "limited_get", modmed.get)
+    monkeypatch.setattr(patient_info_service, "get_patient_embedder", lambda: embedder)
+    qdrant_tool = SimpleNamespace(find_section_hash=lambda *a: None, count_section_points=lambda *a: 0)
+
+    await patient_info_service.get_patient_info(
+        "1", modmed_token="t", practice_url="practice", practice_api_key="k", user_qdrant_tool=qdrant_tool
+    )
+    assert "allergies" in source_checkpoint_store.load_source_checkpoints("practice", "1")
+    assert embedding_manifest_store.load_patient_manifest("practice", "1")["allergies"]["point_count"] == 0
+
+
+async def test_unchanged_list_sections_refill_an_empty_structured_cache(monkeypatch):
+    modmed = FakeModMed()
+    embedder = FakeEmbedder()
+    sections = StructuredSectionCache()
+    monkeypatch.setattr(patient_info_service, "limited_get", modmed.get)
+    monkeypatch.setattr(patient_info_service, "get_patient_embedder", lambda: embedder)
+    monkeypatch.setattr(patient_info_service, "structured_sections", sections)
+    monkeypatch.setattr(patient_info_service, "fast_path", FastPath(sections, enabled=True))
+    qdrant_tool = SimpleNamespace(find_section_hash=lambda *a: None, count_section_points=lambda *a: 0)
+
+    async def ingest():
+        modmed.requests.clear()
+        embedder.embedded.clear()
+        await patient_info_service.get_patient_info(
+            "1", modmed_token="t", practice_url="practice", practice_api_key="k", user_qdrant_tool=qdrant_tool
+        )
+
+    await ingest()
+    await ingest()
+    assert modmed.full_fetches() == []  # everything unchanged and cached on this worker
+
+    sections._entries.clear()  # worker restart / eviction
+    await ingest()
+    assert modmed.full_fetches() == ["AllergyIntolerance", "Condition", "MedicationStatement", "Task"]
+    assert embedder.embedded == []  # same hashes: nothing re-embedded
+    manifest = embedding_manifest_store.load_patient_manifest("practice", "1")
+    assert all(
+        sections.has("practice", "1", name, manifest[name]["section_hash"])
+        for name in ("medications", "allergies", "conditions", "tasks")
+    )
@@ -0,0 +1,66 @@
+from app.services.fhir_chunker import chunk_section, count_tokens
+
+
+def _bundle(*resources):
+    return {"resourceType": "Bundle", "entry": [{"resource": r} for r in resources]}
+
+
+def _encounter(i, note_words=3):
+    return {"resourceType": "Encounter", "status": "finished", "reasonCode": [{"text": " ".join(["cystoscopy"] * note_words)}], "period": {"start": f"2024-01-0{i}"}}
+
+
+def test_small_resources_are_packed_without_splitting_or_overlap():
+    encounters = [_encounter(i) for i in range(1, 7)]
+    chunks = chunk_section([{"encounters": _bundle(*encounters)}], max_tokens=45)
+
+    assert 1 < len(chunks) < len(encounters)
+    assert all(count_tokens(c) <= 45 for c in chunks)
+    # Every encounter lands whole in exactly one chunk.
+    for i in range(1, 7):
+        assert sum(f"Start: 2024-01-0{i}" in c for c in chunks) == 1
+    for c in chunks:
+        assert c.count("Resourcetype: Encounter") == c.count("Status: finished") == c.count("Start:")
+
+
+def test_new_record_at_the_head_keeps_most_chunk_ids():
+    # Bundles arrive newest first; a new encounter is prepended.
+    encounters = [_encounter(i % 9 + 1, note_words=3 + (i * 7) % 13) for i in range(60)]
+    before = chunk_section([{"encounters": _bundle(*encounters)}], max_tokens=120)
+    new = dict(_encounter(1, note_words=11), period={"start": "2025-06-01"})
+    after = chunk_section([{"encounters": _bundle(new, *encounters)}], max_tokens=120)
+
+    assert len(before) >= 10
+    assert len(set(before) - set(after)) <= 1
+    # Text keeps bundle order: the new encounter opens the first chunk.
+    assert after[0].index("Start: 2025-06-01") == after[0].index("Start:")
+
+
+def test_oversized_resource_is_split_on_lines_with_heading():
+    big = {"resourceType": "Condition", "note": [{"text": f"line {i} " + "word " * 8} for i in range(10)]}
+    chunks = chunk_section([{"conditions": _bundle(big)}], max_tokens=25)
+
+    assert len(chunks) > 1
+    assert all(c.startswith("CONDITIONS") and count_tokens(c) <= 25 for c in chunks)
+
+
+def test_document_chunks_repeat_title_and_pack_paragraphs():
+    doc = {
+        "title": "Operative note",
+        "creation": "2024-02-01",
+        "content_text": "Procedure: cystoscopy.\n\nFindings: normal bladder.\n\n" + "Plan " * 40,
+    }
+    chunks = chunk_section([{"Operative note": doc}], max_tokens=20)
+
+    assert "Procedure: cystoscopy." in chunks[0] and "Findings: normal bladder." in chunks[0]
+    assert all(c.startswith("OPERATIVE NOTE\n  Title: Operative note\n  Creation: 2024-02-01") for c in chunks)
+    assert all(count_tokens(c) <= 20 for c in chunks)
+
+
+def test_chunking_is_deterministic():
+    data = [{"medications": _bundle({"resourceType": "MedicationStatement", "medication": "Tamsulosin"})}]
+    assert chunk_section(data) == chunk_section(data)
+
+
+def test_empty_bundle_yields_no_chunks():
+    assert chunk_section([{"allergies": {"resourceType": "Bundle", "type": "searchset", "total": 0}}]) == []
+    assert chunk_section([{"allergies": {"resourceType": "Bundle", "entry": []}}]) == []
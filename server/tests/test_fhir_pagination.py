@@ -0,0 +1,150 @@
+import asyncio
+from datetime import date, timedelta
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+from app.services import fhir_pagination
+from app.services.fhir_pagination import fetch_all_pages, search_url
+
+BASE = "https://fhir.example/Encounter?patient=1"
+
+
+def _response(body, status_code=200):
+    return SimpleNamespace(status_code=status_code, json=lambda: body)
+
+
+def _entry(n, day):
+    return {"resource": {"resourceType": "Encounter", "id": str(n), "period": {"start": day}}}
+
+
+class FakeServer:
+    """Serves offset pages of ``entries`` and tracks requests in flight."""
+
+    def __init__(self, entries, page_size=2, with_total=True, param="_getpagesoffset"):
+        self.entries = entries
+        self.page_size = page_size
+        self.with_total = with_total
+        self.param = param
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get(self, url, headers=None):
+        self.requests.append(url)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        offset = int(parse_qs(urlsplit(url).query).get(self.param, ["0"])[0])
+        body = {"resourceType": "Bundle", "entry": self.entries[offset:offset + self.page_size]}
+        if self.with_total:
+            body["total"] = len(self.entries)
+        if offset + self.page_size < len(self.entries):
+            body["link"] = [{"relation": "next", "url": f"{BASE}&_getpages=abc&{self.param}={offset + self.page_size}"}]
+        return _response(body)
+
+
+def test_search_url_adds_sort_and_count_once():
+    url = search_url("https://fhir.example/Task?code=PMRECALL&patient=1", page_size=50)
+    query = parse_qs(urlsplit(url).query)
+    assert query == {"code": ["PMRECALL"], "patient": ["1"], "_sort": ["-_lastUpdated"], "_count": ["50"]}
+    assert search_url(url, page_size=10) == url
+
+
+async def test_fetches_derived_pages_concurrently_and_orders_newest_first():
+    entries = [_entry(n, f"2020-01-{n + 1:02d}") for n in range(9)]
+    server = FakeServer(entries)
+
+    merged = await fetch_all_pages(server.get, BASE, None, "encounters", max_pages=10, concurrency=3, lookback_days=0)
+
+    assert len(server.requests) == 5
+    assert server.max_in_flight == 3
+    assert [e["resource"]["id"] for e in merged["entry"]] == [str(n) for n in range(8, -1, -1)]
+    assert "link" not in merged
+
+
+async def test_follows_next_links_without_total_up_to_cap(caplog):
+    server = FakeServer([_entry(n, "2020-01-01") for n in range(10)], with_total=False)
+
+    merged = await fetch_all_pages(server.get, BASE, None, "encounters", max_pages=3, lookback_days=0)
+
+    assert len(server.requests) == 3
+    assert len(merged["entry"]) == 6
+    assert "truncated" in caplog.text
+
+
+async def test_stops_at_lookback_horizon():
+    recent = (date.today() - timedelta(days=5)).isoformat()
+    entries = [_entry(0, recent), _entry(1, recent), _entry(2, "2001-01-01"), _entry(3, "2001-01-01"),
+               _entry(4, "2000-01-01")]
+    server = FakeServer(entries, with_total=False)
+
+    merged = await fetch_all_pages(server.get, BASE, None, "encounters", max_pages=10, lookback_days=365)
+
+    assert len(server.requests) == 2
+    assert [e["resource"]["id"] for e in merged["entry"]] == ["0", "1"]
+
+
+async def test_list_sections_ignore_the_lookback(monkeypatch):
+    monkeypatch.setattr(fhir_pagination, "FHIR_LOOKBACK_DAYS", 365)
+    old = [_entry(n, "2009-01-01") for n in range(4)]
+
+    server = FakeServer(old, with_total=False)
+    assert len((await fetch_all_pages(server.get, BASE, None, "allergies", max_pages=10))["entry"]) == 4
+    server = FakeServer(old, with_total=False)
+    assert len((await fetch_all_pages(server.get, BASE, None, "encounters", max_pages=10))["entry"]) == 2  # first page only
+
+
+async def test_partial_pages_kept_when_a_later_page_fails():
+    server = FakeServer([_entry(n, "2020-01-01") for n in range(6)])
+    real_get = server.get
+
+    async def flaky_get(url, headers=None):
+        if "_getpagesoffset=4" in url:
+            return RuntimeError("boom")
+        return await real_get(url, headers)
+
+    merged = await fetch_all_pages(flaky_get, BASE, None, "encounters", max_pages=10, lookback_days=0)
+    assert len(merged["entry"]) == 4
+
+
+async def test_non_bundle_and_failed_first_page_pass_through(monkeypatch):
+    monkeypatch.setattr(fhir_pagination, "FHIR_SECTION_MAX_PAGES", {"patient": 1})
+    patient = {"resourceType": "Patient", "id": "1"}
+
+    async def get_patient(url, headers=None):
+        return _response(patient)
+
+    async def get_error(url, headers=None):
+        return _response({}, status_code=503)
+
+    assert await fetch_all_pages(get_patient, "https://fhir.example/Patient/1", None, "patient") == patient
+    failed = await fetch_all_pages(get_error, BASE, None, "encounters")
+    assert failed.status_code == 503
+
+
+async def test_rejected_sort_falls_back_to_the_plain_search(caplog):
+    server = FakeServer([_entry(n, "2015-01-01") for n in range(3)])
+    real_get = server.get
+
+    async def no_sort(url, headers=None):
+        if "_sort" in parse_qs(urlsplit(url).query):
+            server.requests.append(url)
+            return _response({"resourceType": "OperationOutcome"}, status_code=400)
+        return await real_get(url, headers)
+
+    outcome = {}
+    merged = await fetch_all_pages(no_sort, search_url(BASE), None, "encounters", lookback_days=30,
+                                   outcome=outcome, plain_url=BASE)
+    assert len(merged["entry"]) == 3  # old entries kept: an unsorted searchset ignores the lookback
+    assert server.requests[:2] == [search_url(BASE), BASE]
+    assert outcome["stopped"] is None
+    assert "retrying the plain search" in caplog.text
+
+    async def unauthorized(url, headers=None):
+        server.requests.append(url)
+        return _response({}, status_code=401)
+
+    server.requests.clear()
+    failed = await fetch_all_pages(unauthorized, search_url(BASE), None, "encounters", plain_url=BASE)
+    assert failed.status_code == 401 and server.requests == [search_url(BASE)]
@@ -0,0 +1,96 @@
+from app.services import fhir_projection
+from app.services.fhir_chunker import chunk_section, count_tokens
+from app.services.fhir_projection import project_section
+
+MEDICATION = {
+    "resourceType": "MedicationStatement",
+    "id": "ms-1",
+    "meta": {"lastUpdated": "2024-05-01T10:00:00Z", "versionId": "3"},
+    "extension": [{"url": "http://modmed.com/fhir/ext/source", "valueString": "EMA"}],
+    "text": {"status": "generated", "div": "<div xmlns=\"http://www.w3.org/1999/xhtml\">Tamsulosin</div>"},
+    "status": "active",
+    "medicationCodeableConcept": {
+        "coding": [{"system": "http://www.nlm.nih.gov/research/umls/rxnorm", "code": "863669", "display": "tamsulosin 0.4 MG Oral Capsule"}],
+        "text": "Tamsulosin 0.4 mg capsule",
+    },
+    "subject": {"reference": "Patient/123"},
+    "informationSource": {"reference": "Practitioner/9", "display": "Dr. Smith"},
+    "effectivePeriod": {"start": "2024-01-10"},
+    "dosage": [{
+        "text": "1 capsule nightly",
+        "doseAndRate": [{"doseQuantity": {"value": 0.4, "unit": "mg", "system": "http://unitsofmeasure.org", "code": "mg"}}],
+    }],
+}
+
+
+def _bundle(*resources):
+    return {"resourceType": "Bundle", "type": "searchset", "total": len(resources),
+            "link": [{"relation": "self", "url": "https://example/fhir/MedicationStatement"}],
+            "entry": [{"fullUrl": f"https://example/fhir/x/{i}", "resource": r, "search": {"mode": "match"}}
+                      for i, r in enumerate(resources)]}
+
+
+def test_projection_keeps_clinical_fields_and_drops_boilerplate():
+    projected = project_section(_bundle(MEDICATION))["entry"][0]["resource"]
+
+    assert projected["resourceType"] == "MedicationStatement"
+    assert projected["status"] == "active"
+    assert projected["medicationCodeableConcept"] == {
+        "coding": [{"display": "tamsulosin 0.4 MG Oral Capsule"}],
+        "text": "Tamsulosin 0.4 mg capsule",
+    }
+    assert projected["effectivePeriod"] == {"start": "2024-01-10"}
+    # Quantities keep their value and unit.
+    assert projected["dosage"][0]["doseAndRate"][0]["doseQuantity"] == {"value": 0.4, "unit": "mg", "code": "mg"}
+    for dropped in ("id", "meta", "extension", "text", "subject", "informationSource"):
+        assert dropped not in projected
+
+
+def test_resource_metadata_is_dropped_at_the_root_only():
+    patient = {
+        "resourceType": "Patient",
+        "id": "123",
+        "language": "en-US",
+        "implicitRules": "http://example/rules",
+        "meta": {"versionId": "2"},
+        "gender": "male",
+        "communication": [{
+            "language": {"coding": [{"system": "urn:ietf:bcp:47", "code": "es", "display": "Spanish"}], "text": "Spanish"},
+            "preferred": True,
+        }],
+    }
+    projected = project_section(patient)
+
+    assert projected["communication"] == [
+        {"language": {"coding": [{"display": "Spanish"}], "text": "Spanish"}, "preferred": True}
+    ]
+    for dropped in ("id", "language", "implicitRules", "meta"):
+        assert dropped not in projected
+
+
+def test_projection_reduces_embedded_tokens():
+    bundle = _bundle(*[dict(MEDICATION, id=f"ms-{i}") for i in range(20)])
+    before = sum(count_tokens(c) for c in chunk_section([{"medications": bundle}]))
+    after = sum(count_tokens(c) for c in chunk_section([{"medications": project_section(bundle)}]))
+    assert after < before * 0.6
+
+
+def test_projection_config_override_and_disable(tmp_path, monkeypatch):
+    config = tmp_path / "projection.json"
+    config.write_text('{"MedicationStatement": ["status"]}')
+    monkeypatch.setattr(fhir_projection, "FHIR_PROJECTION_CONFIG_PATH", str(config))
+    monkeypatch.setattr(fhir_projection, "_resource_fields", None)
+    assert project_section(MEDICATION) == {"resourceType": "MedicationStatement", "status": "active"}
+
+    monkeypatch.setattr(fhir_projection, "FHIR_PROJECTION_ENABLED", False)
+    assert project_section(MEDICATION) is MEDICATION
+
+
+def test_ccda_projection_drops_schema_attributes():
+    doc = {"title": "ccda.xml", "content_xml": {"ClinicalDocument": {
+        "@xmlns": "urn:hl7-org:v3",
+        "templateId": [{"@root": "2.16.840.1.113883.10.20.22.1.1"}],
+        "code": {"@code": "34133-9", "@codeSystem": "2.16.840.1.113883.6.1", "@displayName": "Summary of episode note"},
+    }}}
+    projected = project_section(doc)["content_xml"]["ClinicalDocument"]
+    assert projected == {"code": {"@code": "34133-9", "@displayName": "Summary of episode note"}}
@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+from fastapi import HTTPException
+
+from app.routes import run_crew as run_crew_route
+from app.services import ingestion_jobs as jobs_module
+from app.services.ingestion_jobs import IngestionJobRegistry, stream_job_events
+
+
+async def test_registry_joins_active_job_and_records_progress():
+    registry = IngestionJobRegistry()
+    release = asyncio.Event()
+    calls = []
+
+    async def runner(job):
+        calls.append(job.job_id)
+        job("sections_queued", sections_total=2, sections_done=0)
+        job("section_embedded", section="medications", seconds=0.5, points=3)
+        await release.wait()
+
+    first = registry.start("practice", "p1", runner)
+    second = registry.start("practice", "p1", runner)
+    assert second is first
+    assert registry.start("practice", "p2", runner) is not first
+
+    assert await registry.wait(first, timeout=0.01) is False
+    release.set()
+    assert await registry.wait(first) is True
+
+    assert len(calls) == 2
+    assert first.status == "succeeded"
+    assert first.progress["sections_done"] == 1
+    assert first.section_timings == {"medications": 0.5}
+    assert registry.active_for("practice", "p1") is None
+    assert registry.start("practice", "p1", runner) is not first
+
+
+async def test_registry_keeps_http_error_status():
+    registry = IngestionJobRegistry()
+
+    async def runner(job):
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    job = registry.start("practice", "p1", runner)
+    await registry.wait(job)
+    assert (job.status, job.error_status, job.error) == ("failed", 404, "Patient not found")
+
+
+def test_ingest_routes_and_run_crew_attach(monkeypatch, authenticated_client):
+    monkeypatch.setattr(jobs_module, "ingestion_jobs", IngestionJobRegistry())
+    monkeypatch.setattr(run_crew_route, "ingestion_jobs", jobs_module.ingestion_jobs)
+
+    async def fake_get_patient_info(patient_id, progress=None, **kwargs):
+        progress("sections_queued", sections_total=1, sections_done=0)
+        progress("section_embedded", section="conditions", seconds=0.1, points=2)
+
+    monkeypatch.setattr(jobs_module, "get_patient_info", fake_get_patient_info)
+    monkeypatch.setattr(run_crew_route, "run", lambda query, patient_id, practice_url, tool: "answer")
+
+    started = authenticated_client.post("/ingest", json={"id": "p-1"})
+    assert started.status_code == 202
+    job_id = started.json()["job_id"]
+
+    response = authenticated_client.post(
+        "/run_crew", json={"query": "meds?", "id": "p-1", "ingest_job_id": job_id}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"result": "answer", "ingest": {"job_id": job_id, "status": "succeeded"}}
+
+    status = authenticated_client.get(f"/ingest/{job_id}").json()
+    assert status["section_timings"] == {"conditions": 0.1}
+    assert authenticated_client.get("/ingest/unknown").status_code == 404
+    mismatch = authenticated_client.post(
+        "/run_crew", json={"query": "meds?", "id": "p-2", "ingest_job_id": job_id}
+    )
+    assert mismatch.status_code == 400
+
+
+async def test_stream_job_events_follows_progress_until_done():
+    registry = IngestionJobRegistry()
+    step = asyncio.Event()
+
+    async def runner(job):
+        job("sections_fetched", sections_fetched=2, seconds=0.2)
+        await step.wait()
+        job("section_embedded", section="conditions", seconds=0.1, points=2, chunks=3, embedded=1, upserted=2)
+
+    job = registry.start("practice", "p1", runner)
+    received = []
+
+    async def consume():
+        async for message in stream_job_events(job, heartbeat=0.01):
+            received.append(message)
+
+    consumer = asyncio.create_task(consume())
+    await asyncio.sleep(0.05)
+    assert any(m.startswith("id: 0\nevent: progress") for m in received)
+    assert any(m.startswith(": keep-alive") for m in received)
+    step.set()
+    await asyncio.wait_for(consumer, timeout=1)
+
+    frames = [m for m in received if m.startswith("id:")]
+    assert [f.split("\n")[1] for f in frames] == ["event: progress", "event: progress", "event: done"]
+    done = json.loads(frames[-1].split("data: ", 1)[1])
+    assert done["status"] == "succeeded"
+    assert done["progress"]["chunks"] == 3 and done["progress"]["upserted"] == 2
+
+
+def test_ingest_events_route_resumes_after_last_event_id(monkeypatch, authenticated_client):
+    monkeypatch.setattr(jobs_module, "ingestion_jobs", IngestionJobRegistry())
+
+    async def fake_get_patient_info(patient_id, progress=None, **kwargs):
+        progress("sections_fetched", sections_fetched=1, seconds=0.1)
+        progress("section_embedded", section="conditions", seconds=0.1, points=2)
+
+    monkeypatch.setattr(jobs_module, "get_patient_info", fake_get_patient_info)
+    job_id = authenticated_client.post("/ingest", json={"id": "p-1"}).json()["job_id"]
+
+    response = authenticated_client.get(f"/ingest/{job_id}/events")
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.count("event: progress") == 2
+    assert "event: done" in response.text
+
+    resumed = authenticated_client.get(f"/ingest/{job_id}/events", headers={"Last-Event-ID": "0"})
+    assert resumed.text.startswith("id: 1\nevent: progress")
+    assert authenticated_client.get("/ingest/unknown/events").status_code == 404
@@ -0,0 +1,125 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import embedding_cache, embedding_manifest_store
+from app.services import patient_embedder as patient_embedder_module
+from app.services.patient_embedder import PatientDataEmbedder, chunk_point_id
+from app.services.sparse_vectors import SPARSE_VECTOR_NAME
+
+
+@pytest.fixture(autouse=True)
+def local_stores(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_ENABLED", False)
+    monkeypatch.setattr(embedding_manifest_store, "EMBEDDING_MANIFEST_DYNAMODB_TABLE", "")
+    monkeypatch.setattr(
+        embedding_manifest_store, "EMBEDDING_MANIFEST_SQLITE_PATH", str(tmp_path / "manifest.sqlite3")
+    )
+
+
+class _FakeQdrant:
+    """Tracks points by id for one section; records every write call."""
+
+    def __init__(self):
+        self.points = {}
+        self.upserted = []
+        self.deleted = []
+        self.payload_updates = []
+
+    def scroll(self, collection_name, scroll_filter, limit, offset=None, with_payload=None, with_vectors=None):
+        return [SimpleNamespace(id=pid) for pid in self.points], None
+
+    def upsert(self, collection_name, points):
+        self.upserted.extend(p.id for p in points)
+        self.points.update({p.id: p.payload for p in points})
+
+    def delete(self, collection_name, points_selector):
+        self.deleted.extend(points_selector.points)
+        for pid in points_selector.points:
+            self.points.pop(pid, None)
+
+    def batch_update_points(self, collection_name, update_operations):
+        for op in update_operations:
+            for pid in op.set_payload.points:
+                self.payload_updates.append(pid)
+                self.points[pid].update(op.set_payload.payload)
+
+
+def _embedder():
+    embedder = PatientDataEmbedder.__new__(PatientDataEmbedder)
+    embedder.qdrant_client = _FakeQdrant()
+    embedder.chunk_max_tokens = 12
+    embedder.embedding_model = "test-model"
+    embedder.embedding_dimensions = 2
+    embedder.embedding_service = SimpleNamespace(
+        embed_many=lambda texts, max_retries=5: [[1.0, 0.0] for _ in texts]
+    )
+    return embedder
+
+
+def test_chunk_point_id_is_deterministic():
+    first = chunk_point_id("p1", "medications", "Tamsulosin")
+    assert first == chunk_point_id("p1", "medications", "Tamsulosin")
+    assert first != chunk_point_id("p2", "medications", "Tamsulosin")
+    assert first != chunk_point_id("p1", "conditions", "Tamsulosin")
+
+
+def _medications(*names):
+    return [{"medications": {
+        "resourceType": "Bundle",
+        "entry": [{"resource": {"resourceType": "MedicationStatement", "medication": name}} for name in names],
+    }}]
+
+
+def test_changed_section_only_touches_changed_chunks():
+    embedder = _embedder()
+    qdrant = embedder.qdrant_client
+    original = _medications("Tamsulosin 0.4 mg daily", "Oxybutynin 5 mg")
+    assert embedder.chunk_and_embed(original, "medications", "p1", "h1", "practice") == len(qdrant.points)
+    before = set(qdrant.points)
+    qdrant.upserted.clear()
+
+    changed = _medications("Tamsulosin 0.4 mg daily", "Finasteride 5 mg")
+    stats = {}
+    count = embedder.chunk_and_embed(changed, "medications", "p1", "h2", "practice", replace_existing=True, stats=stats)
+
+    assert count == len(qdrant.points) == 2
+    assert (stats["chunks"], stats["upserted"], stats["removed"]) == (2, 1, 1)
+    assert {"chunk_s", "embed_s", "upsert_s"} <= set(stats)
+    assert len(qdrant.upserted) == 1
+    assert all("Finasteride" in qdrant.points[pid]["patient_text"] for pid in qdrant.upserted)
+    assert all(pid in before for pid in qdrant.deleted)
+    assert not any("Oxybutynin" in p["patient_text"] for p in qdrant.points.values())
+    assert {p["patient_hash"] for p in qdrant.points.values()} == {"h2"}
+    manifest = embedding_manifest_store.load_patient_manifest("practice", "p1")
+    assert manifest["medications"] == {**manifest["medications"], "section_hash": "h2", "point_count": count}
+
+
+def test_sparse_vector_stored_when_collection_has_it(monkeypatch):
+    embedder = _embedder()
+    stored = []
+    embedder.qdrant_client.upsert = lambda collection_name, points: stored.extend(points)
+
+    # The fake client has no get_collection: dense-only, as for collections without the sparse vector.
+    embedder.chunk_and_embed(_medications("Tamsulosin 0.4 mg daily"), "medications", "p1", "h1", "practice")
+    assert stored[0].vector == [1.0, 0.0]
+
+    stored.clear()
+    monkeypatch.setattr(patient_embedder_module, "collection_has_sparse", lambda client, name: True)
+    embedder.chunk_and_embed(_medications("Tamsulosin 0.4 mg daily"), "medications", "p2", "h1", "practice")
+    assert stored[0].vector[""] == [1.0, 0.0]
+    assert stored[0].vector[SPARSE_VECTOR_NAME].indices
+
+
+def test_section_that_becomes_empty_drops_its_points():
+    embedder = _embedder()
+    qdrant = embedder.qdrant_client
+    assert embedder.chunk_and_embed(_medications("Penicillin V 250 mg"), "medications", "p1", "h1", "practice") == 1
+
+    stats = {}
+    empty = [{"medications": {"resourceType": "Bundle", "type": "searchset", "total": 0}}]  # no "entry" at all
+    assert embedder.chunk_and_embed(empty, "medications", "p1", "h2", "practice", replace_existing=True, stats=stats) == 0
+    assert stats["chunks"] == 0
+    assert qdrant.points == {}
+    manifest = embedding_manifest_store.load_patient_manifest("practice", "p1")["medications"]
+    assert (manifest["section_hash"], manifest["point_count"]) == ("h2", 0)
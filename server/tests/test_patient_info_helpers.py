@@ -1,3 +1,9 @@
+import copy
+import hashlib
+import json
+
+from app.services import patient_info_service
+from app.services.fhir_projection import project_section
 from app.services.patient_info_service import clean_patient_data, hash_patient_data, parse_xml_blocking
 
 
@@ -41,3 +47,57 @@ def test_parse_xml_blocking_returns_dict_or_input():
     assert parsed["root"]["item"] == "ok"
     bad = parse_xml_blocking("<not-xml")
     assert bad == "<not-xml"
+
+
+def _legacy_hash(payload):
+    cleaned = clean_patient_data(payload)
+    text = "[" + ",".join(json.dumps(obj, sort_keys=True, separators=(",", ":")) for obj in cleaned) + "]"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def test_hash_patient_data_matches_clean_and_dumps_output():
+    bundle = {
+        "resourceType": "Bundle",
+        "id": "b1",
+        "link": [{"relation": "next", "url": "https://x"}],
+        "total": 2,
+        "entry": [
+            {"fullUrl": "u1", "search": {"mode": "match"}, "resource": {
+                "resourceType": "Observation", "id": "o1", "meta": {"v": 1},
+                "valueQuantity": {"value": 98.6, "unit": "°F"}, "note": [{"text": "naïve \"quoted\"\n"}],
+            }},
+            {"fullUrl": "u2"},
+            {"resource": {"resourceType": "Condition", "code": {"text": "日本"}, "active": True, "x": None}},
+        ],
+        "zeta": [1, 2.5e-10, False],
+    }
+    cases = [
+        [],
+        [{"resourceType": "Patient", "id": "p", "meta": {}, "name": [{"family": "Doe"}]}],
+        [{"medications": bundle}],
+        [bundle, {"resourceType": "Bundle", "entry": []}, {"resourceType": "Bundle"}],
+        [{"Visit Note": {"title": "Note", "content_xml": {"a": {"@b": "1", "#text": "é"}}}}],
+    ]
+    for payload in cases:
+        snapshot = copy.deepcopy(payload)
+        assert hash_patient_data(payload) == _legacy_hash(payload)
+        assert payload == snapshot  # inputs are never mutated
+
+
+def test_queued_section_shape_is_hashed_entry_by_entry(monkeypatch):
+    bundle = {
+        "resourceType": "Bundle", "id": "b1", "meta": {"v": 1}, "type": "searchset", "total": 2,
+        "entry": [
+            {"fullUrl": "u1", "resource": {"resourceType": "MedicationStatement", "id": "m1", "status": "active",
+                                           "medicationCodeableConcept": {"text": "Tamsulosin 0.4 mg"}}},
+            {"fullUrl": "u2", "resource": {"resourceType": "MedicationStatement", "id": "m2", "status": "stopped"}},
+        ],
+    }
+    queued = [{"medications": project_section(bundle)}]  # what get_patient_info hashes
+    encoded = []
+    real_encode = patient_info_service._canonical_json
+    monkeypatch.setattr(patient_info_service, "_canonical_json", lambda obj: encoded.append(obj) or real_encode(obj))
+
+    assert hash_patient_data(queued) == _legacy_hash(queued)
+    assert queued[0] not in encoded and queued[0]["medications"] not in encoded  # never encoded whole
+    assert queued[0]["medications"]["entry"][0] in encoded
@@ -0,0 +1,79 @@
+import json
+from types import SimpleNamespace
+
+from qdrant_client.http import models
+
+from app.crew.tools import tools as tools_module
+from app.services import qdrant_collection_profiles
+from app.services.qdrant_collection_profiles import verify_search_indexes
+from app.services.section_router import SectionRouter
+
+
+class _FakeClient:
+    def __init__(self, schema=None):
+        self.schema = dict(schema or {})
+        self.searches = []
+        self.created = []
+
+    def get_collection(self, name):
+        return SimpleNamespace(payload_schema=self.schema)
+
+    def create_payload_index(self, collection_name, field_name, field_schema, wait):
+        self.created.append((field_name, field_schema.is_tenant))
+        self.schema[field_name] = field_schema
+
+    def search(self, **kwargs):
+        self.searches.append(kwargs)
+        return [SimpleNamespace(payload={"patient_text": "Tamsulosin 0.4 mg", "section_name": "medications"}, score=0.8)]
+
+
+def _tool(client, monkeypatch, **fields):
+    monkeypatch.setattr(tools_module, "collection_has_sparse", lambda client, name: False)
+    monkeypatch.setattr(tools_module, "embed_query", lambda query: [0.1, 0.2])
+    monkeypatch.setattr(tools_module, "section_router", SectionRouter(enabled=False))
+    return tools_module.QdrantVectorSearchTool.model_construct(
+        collection_name="ocua", qdrant_url="https://qdrant", score_threshold=0.2, client=client, **fields
+    )
+
+
+def _conditions(search):
+    return {(c.key, c.match.value) for c in search["query_filter"].must}
+
+
+def test_bound_tool_always_filters_on_its_patient(monkeypatch):
+    client = _FakeClient({"patient_id": object(), "section_name": object()})
+    shared = _tool(client, monkeypatch)
+    tool = shared.for_patient("p-1")
+    assert tool.client is shared.client and shared.patient_id is None
+
+    assert json.loads(tool._run("meds"))[0]["context"] == "Tamsulosin 0.4 mg"
+    assert _conditions(client.searches[-1]) == {("patient_id", "p-1")}
+
+    tool._run("meds", section_name="medications")
+    assert _conditions(client.searches[-1]) == {("patient_id", "p-1"), ("section_name", "medications")}
+
+    # The agent cannot widen or move the scope through the legacy filter arguments.
+    tool._run("meds", filter_by="patient_id", filter_value="p-2")
+    assert _conditions(client.searches[-1]) == {("patient_id", "p-1")}
+
+
+def test_unbound_tool_refuses_unscoped_search(monkeypatch):
+    client = _FakeClient({"patient_id": object(), "section_name": object()})
+    tool = _tool(client, monkeypatch)
+
+    assert tool._run("meds") == "[]"
+    assert client.searches == []
+
+    tool._run("meds", filter_by="patient_id", filter_value="p-3")
+    assert _conditions(client.searches[-1]) == {("patient_id", "p-3")}
+
+
+def test_missing_search_indexes_are_created_once(monkeypatch):
+    monkeypatch.setattr(qdrant_collection_profiles, "_verified", set())
+    client = _FakeClient({"section_name": models.PayloadIndexInfo(data_type="keyword", points=0)})
+
+    assert verify_search_indexes(client, "ocua") == ["patient_id"]
+    assert client.created == [("patient_id", True)]
+
+    client.schema.clear()
+    assert verify_search_indexes(client, "ocua") == []  # checked once per process
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import date, datetime
+
+import pytz
+
+from app.models import SessionUser
+from app.services import pre_ingestion
+from app.services.ingestion_jobs import IngestionJobRegistry
+
+PACIFIC = pytz.timezone("US/Pacific")
+
+
+def _appt(start, patient_id, appointment_type="9449"):
+    return {"start": start, "patient_id": patient_id, "appointment_type": appointment_type}
+
+
+APPOINTMENTS = [
+    _appt("2026-03-11T16:00:00Z", "p-late"),
+    _appt("2026-03-11T15:00:00Z", "p-early"),
+    _appt("2026-03-11T17:00:00Z", "p-early"),
+    _appt("2026-03-11T18:00:00Z", "p-clinic", appointment_type="100"),
+    _appt("2026-03-14T15:00:00Z", "p-later-week"),
+    _appt("2026-03-11T15:00:00Z", None),
+]
+
+
+def test_select_patient_ids_surgery_only_earliest_first():
+    ids = pre_ingestion.select_patient_ids(APPOINTMENTS, "2026-03-10", "2026-03-11")
+    assert ids == ["p-early", "p-late"]
+    with_all = pre_ingestion.select_patient_ids(APPOINTMENTS, "2026-03-10", "2026-03-11", include_all=True)
+    assert with_all == ["p-early", "p-late", "p-clinic"]
+    not_before = PACIFIC.localize(datetime(2026, 3, 11, 8, 30))
+    assert pre_ingestion.select_patient_ids(APPOINTMENTS, "2026-03-10", "2026-03-11", not_before=not_before) == ["p-late", "p-early"]
+
+
+def test_seconds_until_next_run_rolls_to_next_day():
+    now = PACIFIC.localize(datetime(2026, 3, 10, 3, 0))
+    assert pre_ingestion.seconds_until_next_run(2, now=now) == 23 * 3600
+    assert pre_ingestion.seconds_until_next_run(4, now=now) == 3600
+
+
+async def test_pre_ingest_practice_uses_cache_and_budget(monkeypatch):
+    user = SessionUser(
+        username="service:demo",
+        practice_url="demo",
+        auth_method="service",
+        modmed_access_token="t",
+        practice_api_key="k",
+        created_at=datetime(2026, 3, 10),
+        expires_at=datetime(2026, 3, 10),
+    )
+    monkeypatch.setattr(
+        pre_ingestion,
+        "load_schedule_cache_entry",
+        lambda base_url: {"window_start": "2026-03-08", "window_end": "2026-04-04",
+                          "appointments": APPOINTMENTS, "cached_at": 0},
+    )
+
+    async def no_modmed(*args, **kwargs):
+        raise AssertionError("cache covers the window")
+
+    monkeypatch.setattr(pre_ingestion, "get_appointments_by_date", no_modmed)
+    monkeypatch.setattr(pre_ingestion, "datetime", type("Frozen", (datetime,), {
+        "now": classmethod(lambda cls, tz=None: PACIFIC.localize(datetime(2026, 3, 10, 2, 0)))
+    }))
+
+    registry = IngestionJobRegistry()
+    monkeypatch.setattr(pre_ingestion, "ingestion_jobs", registry)
+    running, peak, ingested = 0, 0, []
+
+    async def runner(job):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        ingested.append(job.patient_id)
+
+    monkeypatch.setattr(
+        pre_ingestion,
+        "start_patient_ingestion",
+        lambda current_user, patient_id: registry.start(current_user.practice_url, patient_id, runner),
+    )
+
+    summary = await pre_ingestion.pre_ingest_practice(
+        user, days_ahead=1, concurrency=1, min_interval=0, today=date(2026, 3, 10)
+    )
+
+    assert sorted(ingested) == ["p-early", "p-late"]
+    assert peak == 1
+    assert (summary["patients"], summary["succeeded"], summary["failed"]) == (2, 2, 0)
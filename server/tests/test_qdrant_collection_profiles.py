@@ -0,0 +1,180 @@
+from types import SimpleNamespace
+
+import pytest
+from qdrant_client.http import models
+
+from app.crew.tools import tools as tools_module
+from app.services import embedding_manifest_store, source_checkpoint_store
+from app.services.qdrant_collection_profiles import (
+    PROFILES,
+    collection_search_params,
+    ensure_payload_indexes,
+    get_profile,
+    migrate_collection,
+    rebuild_collection,
+)
+
+
+@pytest.fixture(autouse=True)
+def sqlite_stores(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_manifest_store, "EMBEDDING_MANIFEST_DYNAMODB_TABLE", "")
+    monkeypatch.setattr(embedding_manifest_store, "EMBEDDING_MANIFEST_SQLITE_PATH", str(tmp_path / "manifest.sqlite3"))
+    monkeypatch.setattr(source_checkpoint_store, "SOURCE_CHECKPOINT_DYNAMODB_TABLE", "")
+    monkeypatch.setattr(source_checkpoint_store, "SOURCE_CHECKPOINT_SQLITE_PATH", str(tmp_path / "checkpoints.sqlite3"))
+
+
+class _FakeQdrant:
+    def __init__(self, payload_schema=None, points=()):
+        self.collections = {"ocua": {"schema": dict(payload_schema or {}), "points": list(points)}}
+        self.aliases = {}
+        self.calls = []
+
+    def _name(self, name):
+        return self.aliases.get(name, name)
+
+    def get_collection(self, name):
+        collection = self.collections[self._name(name)]
+        return SimpleNamespace(
+            payload_schema=collection["schema"],
+            config=SimpleNamespace(
+                quantization_config=collection.get("quantization"), params=SimpleNamespace(sparse_vectors=None)
+            ),
+        )
+
+    def update_collection(self, collection_name, **kwargs):
+        self.calls.append(("update", collection_name, kwargs))
+
+    def collection_exists(self, name):
+        return name in self.collections
+
+    def create_collection(self, collection_name, **kwargs):
+        self.calls.append(("create", collection_name, kwargs))
+        self.collections[collection_name] = {"schema": {}, "points": []}
+
+    def delete_collection(self, name):
+        self.calls.append(("delete", name))
+        self.collections.pop(name)
+
+    def create_payload_index(self, collection_name, field_name, field_schema, wait):
+        self.calls.append(("create_index", field_name))
+        self.collections[self._name(collection_name)]["schema"][field_name] = models.PayloadIndexInfo(
+            data_type=models.PayloadSchemaType.KEYWORD, params=field_schema, points=0
+        )
+
+    def delete_payload_index(self, collection_name, field_name, wait):
+        self.calls.append(("delete_index", field_name))
+        self.collections[self._name(collection_name)]["schema"].pop(field_name)
+
+    def scroll(self, collection_name, limit, offset, with_payload, with_vectors):
+        points = self.collections[self._name(collection_name)]["points"]
+        start = offset or 0
+        end = start + limit
+        return points[start:end], (end if end < len(points) else None)
+
+    def upsert(self, collection_name, points, wait):
+        self.collections[collection_name]["points"].extend(points)
+
+    def get_aliases(self):
+        return SimpleNamespace(
+            aliases=[SimpleNamespace(alias_name=a, collection_name=c) for a, c in self.aliases.items()]
+        )
+
+    def update_collection_aliases(self, change_aliases_operations):
+        for op in change_aliases_operations:
+            if isinstance(op, models.DeleteAliasOperation):
+                self.aliases.pop(op.delete_alias.alias_name)
+            else:
+                self.aliases[op.create_alias.alias_name] = op.create_alias.collection_name
+
+
+def _plain_keyword():
+    return models.PayloadIndexInfo(data_type=models.PayloadSchemaType.KEYWORD, points=0)
+
+
+def test_unknown_profile_lists_choices():
+    with pytest.raises(ValueError, match="baseline"):
+        get_profile("fast")
+
+
+def test_ensure_payload_indexes_upgrades_patient_id_to_tenant():
+    client = _FakeQdrant({"patient_id": _plain_keyword(), "patient_hash": _plain_keyword()})
+
+    changed = ensure_payload_indexes(client, "ocua", PROFILES["tenant"])
+
+    assert changed == ["patient_id", "section_name"]
+    assert ("delete_index", "patient_id") in client.calls
+    assert client.collections["ocua"]["schema"]["patient_id"].params.is_tenant is True
+    assert ensure_payload_indexes(client, "ocua", PROFILES["tenant"]) == []
+
+
+def test_rebuild_copies_points_and_switches_alias():
+    points = [SimpleNamespace(id=i, vector=[0.1, 0.2], payload={"patient_id": "p"}) for i in range(5)]
+    client = _FakeQdrant(points=points)
+
+    first = rebuild_collection(client, "ocua", PROFILES["tenant-sq"], batch_size=2)
+    assert first["points"] == 5
+    assert client.aliases == {"ocua": first["target"]}
+    assert "ocua" not in client.collections
+    create_kwargs = next(c[2] for c in client.calls if c[0] == "create")
+    assert create_kwargs["vectors_config"].on_disk is True
+    assert isinstance(create_kwargs["quantization_config"], models.ScalarQuantization)
+
+    client.calls.clear()
+    second = rebuild_collection(client, "ocua", PROFILES["tenant"], batch_size=2)
+    assert second["source"] == first["target"] != second["target"]
+    assert second["points"] == 5
+    assert ("delete", first["target"]) in client.calls
+    assert client.aliases == {"ocua": second["target"]}
+
+
+def test_migrate_leaves_hnsw_alone_unless_the_profile_sets_it():
+    client = _FakeQdrant()
+
+    migrate_collection(client, "ocua", PROFILES["baseline"])
+    migrate_collection(client, "ocua", PROFILES["tenant-sq"])
+    baseline, tenant_sq = (c[2] for c in client.calls if c[0] == "update")
+    assert baseline["hnsw_config"] is None
+    assert baseline["quantization_config"] == models.Disabled.DISABLED
+    assert (tenant_sq["hnsw_config"].m, tenant_sq["hnsw_config"].payload_m) == (0, 16)
+
+
+def test_searches_rescore_quantized_collections(monkeypatch):
+    client = _FakeQdrant()
+    client.collections["ocua"]["quantization"] = PROFILES["tenant-bq"].quantization_config()
+    client.collections["plain"] = {"schema": {}, "points": []}
+    assert collection_search_params(client, "ocua") == PROFILES["tenant-bq"].search_params()
+    assert collection_search_params(client, "ocua").quantization.oversampling == 2.0
+    assert collection_search_params(client, "plain") is None
+
+    searches = []
+    client.search = lambda **kwargs: searches.append(kwargs) or []
+    client.query_points = lambda **kwargs: searches.append(kwargs) or SimpleNamespace(points=[])
+    tool = tools_module.QdrantVectorSearchTool.model_construct(collection_name="ocua", score_threshold=0.2, client=client)
+    for sparse in (False, True):
+        monkeypatch.setattr(tools_module, "collection_has_sparse", lambda client, name: sparse)
+        tool._search("ocua", "psa", [0.1], None)
+    dense, hybrid = searches
+    assert dense["search_params"].quantization.rescore is True
+    assert hybrid["prefetch"][0].params == dense["search_params"]
+
+
+def test_rebuild_resyncs_manifest_and_checkpoints_with_the_new_collection():
+    # The copy passed p-1's medications before an ingest re-embedded them in the old collection:
+    # the manifest says h-new, the rebuilt collection still has the h-old point.
+    points = [SimpleNamespace(id=1, vector=[0.1, 0.2], payload={
+        "patient_id": "p-1", "section_name": "medications", "patient_hash": "h-old"})]
+    client = _FakeQdrant(points=points)
+    embedding_manifest_store.save_section_manifest("ocua", "p-1", "medications", "h-new", 2)
+    embedding_manifest_store.save_section_manifest("ocua", "p-1", "allergies", "a1", 1)
+    source_checkpoint_store.save_source_checkpoint("ocua", "p-1", "medications", "2024-05-01T00:00:00Z", 2)
+    source_checkpoint_store.save_source_checkpoint("other", "p-9", "medications", "2024-05-01T00:00:00Z", 1)
+
+    result = rebuild_collection(client, "ocua", PROFILES["tenant"])
+
+    manifest = embedding_manifest_store.load_patient_manifest("ocua", "p-1")
+    assert list(manifest) == ["medications"]
+    assert (manifest["medications"]["section_hash"], manifest["medications"]["point_count"]) == ("h-old", 1)
+    assert source_checkpoint_store.load_source_checkpoints("ocua", "p-1") == {}
+    assert source_checkpoint_store.load_source_checkpoints("other", "p-9")  # other practices untouched
+    assert (result["ingest_state"]["updated"], result["ingest_state"]["removed"]) == (1, 1)
+    assert result["ingest_state"]["checkpoints_cleared"] == 1
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+from app.services import query_embedding_cache as cache_module
+from app.services.query_embedding_cache import QueryEmbeddingCache, embed_query
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_and_ttl_expiry():
+    clock = _Clock()
+    cache = QueryEmbeddingCache(max_entries=2, ttl_seconds=10, clock=clock)
+    cache.put(("m", 4, "a"), [1.0])
+    cache.put(("m", 4, "b"), [2.0])
+    assert cache.get(("m", 4, "a")) == [1.0]  # a is now most recent
+    cache.put(("m", 4, "c"), [3.0])
+    assert cache.get(("m", 4, "b")) is None
+
+    clock.now = 11
+    assert cache.get(("m", 4, "a")) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evicted"], stats["expired"]) == (1, 2, 1, 1)
+    assert stats["hit_rate"] == round(1 / 3, 4)
+
+
+def test_embed_query_normalizes_and_skips_failed_vectors(monkeypatch):
+    calls = []
+
+    def embed(text):
+        calls.append(text)
+        return [] if text == "broken" else [0.5, 0.5]
+
+    service = SimpleNamespace(model="titan", dimensions=2, embed=embed)
+    monkeypatch.setattr(cache_module, "get_embedding_service", lambda: service)
+    cache = QueryEmbeddingCache(max_entries=8, ttl_seconds=60)
+
+    assert embed_query("Current  Medications", cache=cache) == [0.5, 0.5]
+    assert embed_query(" current medications\n", cache=cache) == [0.5, 0.5]
+    assert embed_query("broken", cache=cache) == []
+    assert embed_query("broken", cache=cache) == []
+
+    assert calls == ["current medications", "broken", "broken"]
+    assert cache.stats()["hits"] == 1
+
+
+def test_metrics_reports_query_cache(monkeypatch, authenticated_client):
+    from app.routes import metrics
+
+    monkeypatch.setattr(metrics, "get_embedding_service", lambda: SimpleNamespace(stats=lambda: {}))
+    monkeypatch.setattr(metrics, "query_embedding_cache", QueryEmbeddingCache(max_entries=4))
+
+    response = authenticated_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.json()["query_embedding_cache"]["max_entries"] == 4
@@ -0,0 +1,54 @@
+import json
+from types import SimpleNamespace
+
+from app.services.search_results import format_results, select_results
+
+
+def _hit(text, score, section="observations", token_count=None):
+    payload = {"patient_text": text, "section_name": section}
+    if token_count is not None:
+        payload["token_count"] = token_count
+    return SimpleNamespace(payload=payload, score=score)
+
+
+PSA_2024 = "OBSERVATION PSA 4.1 ng/mL effective 2024-03-02 status final"
+PSA_2024_REPEAT = "OBSERVATION PSA 4.3 ng/mL effective 2024-09-14 status final"
+PSA_2025 = "OBSERVATION PSA 6.8 ng/mL effective 2025-01-11 status final"
+
+
+def test_contained_and_repeated_hits_are_dropped():
+    hits = [
+        _hit(PSA_2024 + " OBSERVATION Creatinine 1.1 mg/dL", 0.9),
+        _hit(PSA_2024, 0.8),  # wholly inside the better hit
+        _hit(PSA_2024 + " OBSERVATION Creatinine 1.1 mg/dL", 0.7),  # same text again
+        _hit(PSA_2025, 0.6),
+    ]
+    results = select_results(hits, mmr_lambda=1.0)
+    assert [r["score"] for r in results] == [0.9, 0.6]
+
+
+def test_mmr_promotes_a_different_topic_over_a_near_repeat():
+    hits = [
+        _hit(PSA_2024, 0.90),
+        _hit(PSA_2024_REPEAT, 0.88),
+        _hit("MEDICATIONSTATEMENT Tamsulosin 0.4 mg daily status active", 0.80, section="medications"),
+    ]
+    assert [r["section"] for r in select_results(hits, mmr_lambda=1.0)] == ["observations"] * 2 + ["medications"]
+    assert [r["section"] for r in select_results(hits, mmr_lambda=0.5)] == ["observations", "medications", "observations"]
+
+
+def test_packing_respects_token_budget_and_max_results():
+    hits = [_hit(f"chunk {i} unique{i}", 1 - i / 10, token_count=count) for i, count in enumerate((300, 250, 100, 50))]
+    assert [r["context"] for r in select_results(hits, token_budget=450, mmr_lambda=1.0)] == [
+        "chunk 0 unique0", "chunk 2 unique2", "chunk 3 unique3",
+    ]
+    assert len(select_results(hits, token_budget=450, max_results=2, mmr_lambda=1.0)) == 2
+    # The best hit is returned even when it alone exceeds the budget.
+    assert len(select_results(hits[:1], token_budget=10)) == 1
+
+
+def test_compact_json_by_default():
+    results = [{"section": "medications", "context": "Tamsulosin 0.4 mg", "score": 0.81}]
+    compact = format_results(results)
+    assert "\n" not in compact and ", " not in compact
+    assert json.loads(compact) == json.loads(format_results(results, pretty=True)) == results
@@ -0,0 +1,116 @@
+from types import SimpleNamespace
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from app.crew.tools import tools as tools_module
+from app.services.section_router import SectionRouter
+
+
+class _FakeClient:
+    def __init__(self, hits_by_scope, probe_score=0.6):
+        self.hits_by_scope = hits_by_scope
+        self.probe_score = probe_score
+        self.searches = []
+
+    def get_collection(self, name):
+        return SimpleNamespace(payload_schema={"patient_id": object(), "section_name": object()})
+
+    def search(self, **kwargs):
+        self.searches.append(kwargs)
+        return self.hits_by_scope["routed" if kwargs["query_filter"].should else "patient"]
+
+    def query_points(self, **kwargs):
+        return SimpleNamespace(points=[SimpleNamespace(score=self.probe_score)])
+
+
+def _hits(n, score):
+    return [
+        SimpleNamespace(payload={"patient_text": f"MEDICATIONSTATEMENT drug{i} 5 mg", "section_name": "medications"}, score=score)
+        for i in range(n)
+    ]
+
+
+def _tool(client, monkeypatch, router, sparse=False):
+    monkeypatch.setattr(tools_module, "collection_has_sparse", lambda client, name: sparse)
+    monkeypatch.setattr(tools_module, "embed_query", lambda query: [0.1, 0.2])
+    monkeypatch.setattr(tools_module, "section_router", router)
+    return tools_module.QdrantVectorSearchTool.model_construct(
+        collection_name="ocua", qdrant_url="https://qdrant", score_threshold=0.2, client=client, patient_id="p-1"
+    )
+
+
+def _routed(search):
+    flt = search["query_filter"]
+    return [c.match.any for c in flt.should or [] if isinstance(c, models.FieldCondition)]
+
+
+def test_router_predicts_sections_from_specific_keywords_only():
+    router = SectionRouter(enabled=True)
+    assert router.route("What dose of tamsulosin?") == ("medications",)
+    assert router.route("PSA trend and biopsy") == ("diagnostic_reports",)
+    assert router.route("allergies or family history of prostate cancer") == ("allergies", "family_history")
+    assert router.route("is he still taking it? any recent results or reports?") == ()
+    assert SectionRouter(enabled=False).route("current meds") == ()
+    stats = router.stats()
+    assert (stats["queries"], stats["routed"], stats["unrouted"]) == (4, 3, 1)
+
+
+def test_routed_search_is_kept_when_it_finds_enough_good_hits(monkeypatch):
+    client = _FakeClient({"routed": _hits(3, 0.6), "patient": _hits(5, 0.7)})
+    router = SectionRouter(enabled=True, min_hits=3, min_score=0.35)
+    tool = _tool(client, monkeypatch, router)
+
+    tool._run("what dose of tamsulosin")
+    assert [_routed(s) for s in client.searches] == [[["medications"]]]
+    assert router.stats()["fallbacks"] == 0
+
+
+def test_weak_routed_search_falls_back_to_the_whole_chart(monkeypatch):
+    router = SectionRouter(enabled=True, min_hits=3, min_score=0.35)
+    for routed in (_hits(2, 0.9), _hits(4, 0.3)):  # too few hits / best cosine too low
+        client = _FakeClient({"routed": routed, "patient": _hits(5, 0.7)})
+        _tool(client, monkeypatch, router)._run("what dose of tamsulosin")
+        assert [_routed(s) for s in client.searches] == [[["medications"]], []]
+    assert router.stats()["fallback_rate"] == 1.0
+
+
+def test_hybrid_routed_search_is_gated_on_a_dense_probe(monkeypatch):
+    router = SectionRouter(enabled=True, min_hits=3, min_score=0.35)
+    fused = []
+
+    def fake_hybrid_query(client, collection_name, query, vector, query_filter, **kwargs):
+        fused.append(bool(query_filter.should))
+        return _hits(10, 0.03)  # RRF scores: plenty of sparse matches, scores not similarities
+
+    monkeypatch.setattr(tools_module, "hybrid_query", fake_hybrid_query)
+    _tool(_FakeClient({}, probe_score=0.2), monkeypatch, router, sparse=True)._run("what dose of tamsulosin")
+    assert fused == [True, False]
+    fused.clear()
+    _tool(_FakeClient({}, probe_score=0.5), monkeypatch, router, sparse=True)._run("what dose of tamsulosin")
+    assert fused == [True]
+
+
+def test_routed_filter_keeps_documents_in_scope(monkeypatch):
+    client = QdrantClient(location=":memory:")
+    client.create_collection("ocua", vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE))
+    sections = ["medications", "encounters", "Pathology report 2024-03-02", "allergies"]
+    client.upsert("ocua", [
+        models.PointStruct(id=i, vector=[1.0, i / 10], payload={"patient_id": "p-1", "section_name": name})
+        for i, name in enumerate(sections)
+    ])
+    tool = _tool(client, monkeypatch, SectionRouter(enabled=True, min_hits=1, min_score=0.0))
+
+    hits = tool._routed_search("ocua", "dose", [1.0, 0.0], tool._search_filter(None, None, None), ("medications",))
+    assert sorted(h.payload["section_name"] for h in hits) == ["Pathology report 2024-03-02", "medications"]
+
+
+def test_agent_chosen_section_is_not_rerouted(monkeypatch):
+    client = _FakeClient({"routed": _hits(5, 0.7), "patient": _hits(5, 0.7)})
+    router = SectionRouter(enabled=True)
+    tool = _tool(client, monkeypatch, router)
+
+    tool._run("psa result", section_name="document_references")
+    assert len(client.searches) == 1
+    assert [c.match.value for c in client.searches[0]["query_filter"].must] == ["p-1", "document_references"]
+    assert router.stats()["queries"] == 0
@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from app.services import embedding_manifest_store, source_checkpoint_store, sparse_vectors
+from app.services.qdrant_collection_profiles import PROFILES, create_collection, rebuild_collection
+from app.services.sparse_vectors import (
+    SPARSE_VECTOR_NAME,
+    collection_has_sparse,
+    document_sparse_vector,
+    hybrid_query,
+    query_sparse_vector,
+    token_index,
+    tokenize,
+)
+
+
+@pytest.fixture(autouse=True)
+def sqlite_stores(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_manifest_store, "EMBEDDING_MANIFEST_DYNAMODB_TABLE", "")
+    monkeypatch.setattr(embedding_manifest_store, "EMBEDDING_MANIFEST_SQLITE_PATH", str(tmp_path / "manifest.sqlite3"))
+    monkeypatch.setattr(source_checkpoint_store, "SOURCE_CHECKPOINT_DYNAMODB_TABLE", "")
+    monkeypatch.setattr(source_checkpoint_store, "SOURCE_CHECKPOINT_SQLITE_PATH", str(tmp_path / "checkpoints.sqlite3"))
+
+
+def test_tokenize_keeps_codes_and_drops_stop_words():
+    assert tokenize("Is E11.9 on the problem list? CPT 52000, PSA 4.2 ng/mL") == [
+        "e11.9", "problem", "list", "cpt", "52000", "psa", "4.2", "ng", "ml",
+    ]
+
+
+def test_document_weights_saturate_with_term_frequency():
+    vector = document_sparse_vector("psa psa psa psa creatinine")
+    weights = dict(zip(vector.indices, vector.values))
+    assert weights[token_index("psa")] > weights[token_index("creatinine")]
+    assert weights[token_index("psa")] < 4 * weights[token_index("creatinine")]
+    assert vector.indices == sorted(vector.indices)
+
+    query = query_sparse_vector("PSA psa trend")
+    assert sorted(query.indices) == sorted({token_index("psa"), token_index("trend")})
+    assert set(query.values) == {1.0}
+
+
+def _collection(texts):
+    client = QdrantClient(location=":memory:")
+    create_collection(client, "ocua", PROFILES["tenant"])
+    # Dense vectors all point the same way, so only the sparse side can tell the chunks apart.
+    client.upsert(
+        collection_name="ocua",
+        points=[
+            models.PointStruct(
+                id=i,
+                vector={"": [1.0] + [0.0] * 1023, SPARSE_VECTOR_NAME: document_sparse_vector(text)},
+                payload={"patient_id": "p1" if i < len(texts) - 1 else "p2", "patient_text": text},
+            )
+            for i, text in enumerate(texts)
+        ],
+    )
+    return client
+
+
+def test_hybrid_query_ranks_exact_code_first_within_patient():
+    client = _collection([
+        "CONDITION code N40.1 Benign prostatic hyperplasia",
+        "CONDITION code E11.9 Type 2 diabetes mellitus",
+        "PROCEDURE code 52000 Cystourethroscopy",
+        "CONDITION code E11.9 Type 2 diabetes mellitus",  # another patient
+    ])
+    patient = models.Filter(must=[models.FieldCondition(key="patient_id", match=models.MatchValue(value="p1"))])
+
+    assert collection_has_sparse(client, "ocua")
+    hits = hybrid_query(client, "ocua", "Is E11.9 on the problem list?", [1.0] + [0.0] * 1023, patient, limit=3)
+    assert [h.id for h in hits][0] == 1
+    assert {h.id for h in hits} == {0, 1, 2}
+
+    # No sparse tokens at all: plain dense search.
+    assert len(hybrid_query(client, "ocua", "what is the", [1.0] + [0.0] * 1023, patient, limit=5)) == 3
+
+
+def test_rebuild_adds_sparse_vectors_from_patient_text(monkeypatch):
+    client = QdrantClient(location=":memory:")
+    create_collection(client, "ocua", PROFILES["baseline"])
+    client.upsert(
+        collection_name="ocua",
+        points=[models.PointStruct(id=1, vector=[1.0] + [0.0] * 1023, payload={"patient_text": "PSA 4.2 ng/mL"})],
+    )
+    assert not collection_has_sparse(client, "ocua")
+
+    monkeypatch.setattr(sparse_vectors, "_support", {})
+    rebuild_collection(client, "ocua", PROFILES["tenant"])
+    point = client.retrieve("ocua", ids=[1], with_vectors=True)[0]
+    assert collection_has_sparse(client, "ocua")
+    assert point.vector[SPARSE_VECTOR_NAME].indices == document_sparse_vector("PSA 4.2 ng/mL").indices
+
+
+def test_tool_falls_back_to_dense_search_without_sparse_vector(monkeypatch):
+    from app.crew.tools import tools as tools_module
+
+    calls = []
+    tool = tools_module.QdrantVectorSearchTool.model_construct(
+        collection_name="ocua", score_threshold=0.2,
+        client=SimpleNamespace(search=lambda **kwargs: calls.append(kwargs) or []),
+    )
+    monkeypatch.setattr(tools_module, "collection_has_sparse", lambda client, name: False)
+    assert tool._search("ocua", "psa", [0.1], None) == []
+    assert calls[0]["limit"] == 100
+    assert calls[0]["with_payload"] == ["patient_text", "section_name", "token_count"]
+
+    monkeypatch.setattr(tools_module, "collection_has_sparse", lambda client, name: True)
+    monkeypatch.setattr(tools_module, "hybrid_query", lambda *args, **kwargs: ["fused"])
+    assert tool._search("ocua", "psa", [0.1], None) == ["fused"]